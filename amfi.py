@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from providers import MarketDataProvider, get_provider
+
+# ---------- AMFI NAV FETCHER (mfapi.in) ----------
+# All unique scheme codes are requested concurrently over the provider's pooled
+# HTTP session, under a single overall deadline, so MF refresh latency is
+# set by the slowest scheme rather than the sum of all of them.
+
+MFAPI_BASE_URL = "https://api.mfapi.in/mf"
+# Per-request connect/read timeout (seconds)
+NAV_REQUEST_TIMEOUT_S = 5.0
+# Wall-clock budget for the whole batch; codes still in flight are reported as errors
+NAV_BATCH_DEADLINE_S = 8.0
+NAV_MAX_WORKERS = 8
+
+@dataclass
+class NavFetchResult:
+    navs: dict[str, float] = field(default_factory=dict)
+    dates: dict[str, date] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    # Full (date, nav) series per code, only filled when requested
+    history: dict[str, list[tuple[date, float]]] = field(default_factory=dict)
+
+
+def _parse_mfapi_date(value: str) -> date | None:
+    try:
+        return datetime.strptime(value, "%d-%m-%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_mfapi_history(data: list[dict]) -> list[tuple[date, float]]:
+    history = []
+    for point in data:
+        nav_date = _parse_mfapi_date(point.get("date"))
+        try:
+            nav = float(point["nav"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if nav_date is not None and nav > 0:
+            history.append((nav_date, nav))
+    return history
+
+
+def _fetch_one(
+    provider: MarketDataProvider, base_url: str, code: str, timeout: float, with_history: bool
+) -> tuple[float, date | None, list[tuple[date, float]] | None]:
+    data = provider.get_json(f"{base_url}/{code}", timeout=timeout).get("data") or []
+    if not data:
+        raise ValueError("no NAV data")
+    # AMFI returns string NAV, newest first. The full series is in the same
+    # payload, so returning it costs no extra request.
+    history = _parse_mfapi_history(data) if with_history else None
+    return float(data[0]["nav"]), _parse_mfapi_date(data[0].get("date")), history
+
+
+def fetch_latest_navs(
+    codes: list[str],
+    base_url: str = MFAPI_BASE_URL,
+    provider: MarketDataProvider | None = None,
+    timeout: float = NAV_REQUEST_TIMEOUT_S,
+    deadline: float = NAV_BATCH_DEADLINE_S,
+    max_workers: int = NAV_MAX_WORKERS,
+    with_history: bool = False,
+) -> NavFetchResult:
+    """Latest NAV for each unique code, fetched concurrently.
+
+    Every code ends up in exactly one of `navs` or `errors`. `base_url` can
+    point at a local HTTP stand-in for testing. With `with_history`, the full
+    NAV series from each response is kept in `history`.
+    """
+    result = NavFetchResult()
+    unique_codes = sorted(set(codes))
+    if not unique_codes:
+        return result
+
+    provider = provider or get_provider()
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(unique_codes)), thread_name_prefix="amfi")
+    try:
+        futures = {pool.submit(_fetch_one, provider, base_url, code, timeout, with_history): code for code in unique_codes}
+        done, pending = wait(futures, timeout=deadline)
+        for future in done:
+            code = futures[future]
+            try:
+                nav, nav_date, history = future.result()
+            except Exception as exc:
+                result.errors[code] = f"{type(exc).__name__}: {exc}"
+                continue
+            result.navs[code] = nav
+            if nav_date is not None:
+                result.dates[code] = nav_date
+            if history is not None:
+                result.history[code] = history
+        for future in pending:
+            result.errors[futures[future]] = f"deadline of {deadline:.1f}s exceeded"
+    finally:
+        # Don't hold the caller hostage to stragglers past the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+    return result
+
+# ---------- AMFI NAVAll.txt BULK INGESTION ----------
+# AMFI publishes one semicolon-separated file with the latest NAV of every
+# scheme. One download + one streaming parse covers any number of funds:
+#   Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date
+# interleaved with blank lines and fund-house / category header lines.
+
+NAVALL_URL = "https://portal.amfiindia.com/spages/NAVAll.txt"
+NAVALL_TIMEOUT_S = 15.0
+
+
+class NavIndex:
+    """Compact scheme-code -> (NAV, date) lookup built from NAVAll.txt."""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self, entries: dict[str, tuple[float, date]]):
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._entries
+
+    def get(self, code: str) -> tuple[float, date] | None:
+        return self._entries.get(code)
+
+    def lookup(self, codes: list[str]) -> NavFetchResult:
+        """Same shape as fetch_latest_navs, so callers can swap sources."""
+        result = NavFetchResult()
+        for code in sorted(set(codes)):
+            entry = self._entries.get(code)
+            if entry is None:
+                result.errors[code] = "not in NAVAll index"
+                continue
+            result.navs[code], result.dates[code] = entry
+        return result
+
+
+def parse_navall(lines, wanted: set[str] | None = None) -> dict[str, tuple[float, date]]:
+    """Stream-parse NAVAll.txt lines into {code: (nav, date)}.
+
+    Header, blank and malformed lines are skipped, as are "N.A." NAVs. With
+    `wanted`, only those codes are kept (the rest of the file is still read
+    once, but nothing else is retained).
+    """
+    entries: dict[str, tuple[float, date]] = {}
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        parts = line.rstrip("\r\n").split(";")
+        if len(parts) < 6:
+            continue
+        code = parts[0].strip()
+        if not code.isdigit() or (wanted is not None and code not in wanted):
+            continue
+        try:
+            nav = float(parts[4])
+            nav_date = datetime.strptime(parts[5].strip(), "%d-%b-%Y").date()
+        except ValueError:
+            continue
+        entries[code] = (nav, nav_date)
+    return entries
+
+
+def load_navall_index(
+    source: str | None = None,
+    wanted: set[str] | None = None,
+    provider: MarketDataProvider | None = None,
+    timeout: float = NAVALL_TIMEOUT_S,
+) -> NavIndex:
+    """Build a NavIndex from a local NAVAll.txt path, or download it.
+
+    `source` may be a filesystem path or an http(s) URL; None means the
+    official AMFI URL. Network errors propagate to the caller.
+    """
+    source = source or NAVALL_URL
+    if source.startswith(("http://", "https://")):
+        provider = provider or get_provider()
+        return NavIndex(parse_navall(provider.get_lines(source, timeout=timeout), wanted))
+    with open(source, encoding="utf-8", errors="replace") as fh:
+        return NavIndex(parse_navall(fh, wanted))
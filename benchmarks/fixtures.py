@@ -0,0 +1,178 @@
+"""Benchmark fixtures: deterministic market data recorded in replay format.
+
+SyntheticProvider answers every provider primitive with yfinance/AMFI-shaped
+data (seeded random walks per symbol), so the fixture set can be generated for
+any portfolio size without network access. build_fixtures() runs the real
+fetchers once through RecordingProvider, producing a directory that
+providers.ReplayProvider serves during the benchmark run. Recordings made
+against the live APIs (MARKET_DATA_PROVIDER=record) can be used instead for
+the 1x scale.
+"""
+import sys
+import tempfile
+import zlib
+from datetime import date, datetime, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from holdings import load_holdings, load_mf_holdings  # noqa: E402
+from market_data import (  # noqa: E402
+    fetch_fx_history,
+    fetch_fx_rates,
+    fetch_last_prices_batched,
+    fetch_market_indices_change,
+    fetch_mf_nav_quotes,
+    fetch_prices_close,
+    fetch_quote_book,
+    quote_symbols,
+    sync_price_store,
+)
+from price_store import PriceStore  # noqa: E402
+from providers import MarketDataProvider, RecordingProvider, set_provider  # noqa: E402
+from risk import RISK_BENCHMARK  # noqa: E402
+
+FIXTURE_END = date(2026, 10, 16)
+FIXTURE_DAYS = 520          # ~2 years of business days per symbol
+# Bump when the recorded calls or the replay key change; older fixture
+# directories are then rebuilt by the benchmark scripts (fixtures_current)
+FIXTURE_VERSION = 2
+VERSION_FILE = "VERSION"
+US_TZ = "America/New_York"
+
+
+def scaled_portfolio(scale: int) -> list[dict]:
+    """The holdings file repeated `scale` times with distinct tickers per copy."""
+    base = load_holdings().to_dict("records")
+    rows = []
+    for copy in range(scale):
+        for item in base:
+            row = dict(item)
+            if copy:
+                row["Ticker"] = f"{item['Ticker']}-{copy}"
+                row["Name"] = f"{item['Name']} #{copy}"
+            rows.append(row)
+    return rows
+
+
+def scaled_mf_config(scale: int) -> list[dict]:
+    base = load_mf_holdings().to_dict("records")
+    rows = []
+    for copy in range(scale):
+        for entry in base:
+            row = dict(entry)
+            if copy:
+                row["AMFICode"] = f"{entry['AMFICode']}{copy:03d}"
+                row["Scheme"] = f"{entry['Scheme']} #{copy}"
+            rows.append(row)
+    return rows
+
+
+class SyntheticProvider(MarketDataProvider):
+    name = "synthetic"
+
+    def __init__(self, nav_codes: list[str], end: date = FIXTURE_END, days: int = FIXTURE_DAYS):
+        self.nav_codes = sorted(set(nav_codes))
+        self.index = pd.bdate_range(end=pd.Timestamp(end), periods=days, name="Date")
+
+    @staticmethod
+    def _rng(symbol: str) -> np.random.Generator:
+        return np.random.default_rng(zlib.crc32(symbol.encode()))
+
+    def _daily(self, symbol: str) -> pd.Series:
+        rng = self._rng(symbol)
+        start = rng.uniform(20, 600)
+        steps = rng.normal(0.0004, 0.018, len(self.index))
+        return pd.Series(start * np.exp(np.cumsum(steps)), index=self.index)
+
+    def _minutes(self, symbol: str) -> pd.Series:
+        session = self.index[-1].date()
+        idx = pd.date_range(
+            datetime.combine(session, time(4, 0)), periods=16 * 60, freq="1min", tz=US_TZ, name="Datetime"
+        )
+        last_close = self._daily(symbol).iloc[-2]
+        steps = self._rng(symbol + "@1m").normal(0, 0.0008, len(idx))
+        return pd.Series(last_close * np.exp(np.cumsum(steps)), index=idx)
+
+    def _frame(self, close: pd.Series) -> pd.DataFrame:
+        return pd.DataFrame({"Open": close.shift(1).fillna(close), "Close": close})
+
+    def _bars(self, symbol: str, interval: str, period: str | None, start: str | None) -> pd.DataFrame:
+        if interval == "1m":
+            return self._frame(self._minutes(symbol))
+        close = self._daily(symbol)
+        if start is not None:
+            close = close[close.index >= pd.Timestamp(start)]
+        elif period and period.endswith("d"):
+            close = close.tail(int(period[:-1]))
+        return self._frame(close)
+
+    def download(self, tickers: list[str], interval: str = "1d", period: str | None = None,
+                 start: str | None = None, **kwargs) -> pd.DataFrame:
+        frames = {t: self._bars(t, interval, period, start) for t in tickers}
+        return pd.concat(frames, axis=1)
+
+    def history(self, ticker: str, period: str = "1mo", interval: str = "1d", **kwargs) -> pd.DataFrame:
+        return self._bars(ticker, interval, period, None)
+
+    def _nav_series(self, code: str) -> pd.Series:
+        return self._daily(f"NAV:{code}") / 10.0
+
+    def get_json(self, url: str, timeout: float):
+        code = url.rstrip("/").rsplit("/", 1)[-1]
+        navs = self._nav_series(code)[::-1]
+        return {"data": [{"date": d.strftime("%d-%m-%Y"), "nav": f"{v:.4f}"} for d, v in navs.items()]}
+
+    def get_lines(self, url: str, timeout: float):
+        yield "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date"
+        yield ""
+        for code in self.nav_codes:
+            nav = self._nav_series(code)
+            yield f"{code};INF000000000;-;Synthetic scheme {code};{nav.iloc[-1]:.4f};{nav.index[-1]:%d-%b-%Y}"
+
+
+def fixtures_current(directory: Path) -> bool:
+    """True if directory holds fixtures recorded at FIXTURE_VERSION."""
+    try:
+        return (directory / VERSION_FILE).read_text().strip() == str(FIXTURE_VERSION)
+    except OSError:
+        return False
+
+
+def build_fixtures(directory: Path, scales: list[int]) -> None:
+    """Record every fetch the benchmark replays, for each portfolio scale.
+
+    Recordings from an earlier build are removed first, so stale keys cannot
+    be replayed.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.pkl"):
+        stale.unlink()
+    all_codes = [e["AMFICode"] for e in scaled_mf_config(max(scales))]
+    recorder = RecordingProvider(SyntheticProvider(all_codes), directory)
+    previous = set_provider(recorder)
+    try:
+        fetch_market_indices_change()
+        fetch_fx_rates()
+        for scale in scales:
+            tickers = sorted({row["Ticker"] for row in scaled_portfolio(scale)})
+            codes = sorted({row["AMFICode"] for row in scaled_mf_config(scale)})
+            with tempfile.TemporaryDirectory() as tmp:
+                store = PriceStore(Path(tmp) / "prices.sqlite")
+                fetch_prices_close(store, tickers)   # cold backfill
+                fetch_prices_close(store, tickers)   # incremental refresh
+                fetch_fx_history(store)              # dated FX: backfill, then incremental
+                fetch_fx_history(store)
+                sync_price_store(store, [RISK_BENCHMARK])   # risk benchmark: backfill, then incremental
+                sync_price_store(store, [RISK_BENCHMARK])
+                fetch_last_prices_batched(tickers)
+                fetch_quote_book(quote_symbols(tickers))
+                fetch_mf_nav_quotes(store, codes)    # seeds NAV history
+                fetch_mf_nav_quotes(store, codes)    # steady state
+    finally:
+        set_provider(previous)
+    (directory / VERSION_FILE).write_text(f"{FIXTURE_VERSION}\n")
+
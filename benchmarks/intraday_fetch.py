@@ -0,0 +1,43 @@
+"""Before/after latency of the intraday last-price fetch.
+
+Times the legacy per-ticker loop against the single bulk request for the
+tickers in the portfolio (or a custom list) and prints median/min/max.
+
+    python benchmarks/intraday_fetch.py
+    python benchmarks/intraday_fetch.py --runs 5 --tickers AAPL MSFT NVDA
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from holdings import holdings_tickers, load_holdings  # noqa: E402
+from market_data import fetch_last_prices_batched, fetch_last_prices_loop  # noqa: E402
+from timing import time_call  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--tickers", nargs="+", default=holdings_tickers(load_holdings()))
+    args = parser.parse_args()
+
+    rows = []
+    for label, fn in (("loop", fetch_last_prices_loop), ("batched", fetch_last_prices_batched)):
+        timings, result = time_call(fn, args.tickers, runs=args.runs)
+        rows.append((label, [ms / 1000.0 for ms in timings], len(result)))
+
+    print(f"{len(args.tickers)} tickers, {args.runs} runs each")
+    print(f"{'path':<8} {'median s':>9} {'min s':>7} {'max s':>7} {'prices':>7}")
+    for label, timings, n in rows:
+        print(f"{label:<8} {statistics.median(timings):>9.2f} {min(timings):>7.2f} {max(timings):>7.2f} {n:>7}")
+
+    loop_med, batch_med = statistics.median(rows[0][1]), statistics.median(rows[1][1])
+    if batch_med > 0:
+        print(f"speedup: {loop_med / batch_med:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
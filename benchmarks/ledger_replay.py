@@ -0,0 +1,104 @@
+"""Cost of deriving positions from the transaction ledger, with and without snapshots.
+
+Builds a synthetic ledger (default 100k BUY / SELL / DIVIDEND rows across the
+scaled portfolio), then times:
+  cold      full replay into an empty snapshot store
+  append    the same ledger plus --append new rows, resumed from the last snapshot
+  unchanged a rerun with the file untouched (memo hit)
+and checks that the resumed result equals a from-scratch replay.
+
+    python benchmarks/ledger_replay.py
+    python benchmarks/ledger_replay.py --rows 500000 --append 20
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fixtures import scaled_portfolio  # noqa: E402
+from ledger import LedgerEngine, LedgerStore, load_transactions  # noqa: E402
+from timing import stopwatch  # noqa: E402
+
+
+def synthetic_ledger(rows: int, seed: int = 11) -> pd.DataFrame:
+    """Mostly buys, with sells that never exceed the units held and some dividends."""
+    rng = np.random.default_rng(seed)
+    lines = scaled_portfolio(10)
+    held = np.zeros(len(lines))
+    picks = rng.integers(0, len(lines), rows)
+    kinds = rng.random(rows)
+    sizes = rng.integers(1, 20, rows).astype(float)
+    prices = rng.uniform(50, 2000, rows)
+    types, units = [], np.zeros(rows)
+    for i, line in enumerate(picks):
+        if kinds[i] < 0.15 and held[line] > 0:
+            types.append("SELL")
+            units[i] = min(sizes[i], held[line])
+            held[line] -= units[i]
+        elif kinds[i] < 0.22:
+            types.append("DIVIDEND")
+        else:
+            types.append("BUY")
+            units[i] = sizes[i]
+            held[line] += units[i]
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(np.arange(rows) // 40, unit="D")
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Owner": [lines[j]["Owner"] for j in picks],
+        "Kind": "US",
+        "Symbol": [lines[j]["Ticker"] for j in picks],
+        "Name": [lines[j]["Name"] for j in picks],
+        "Sector": [lines[j]["Sector"] for j in picks],
+        "Type": types,
+        "Units": units,
+        "Amount": np.round(units * prices + (np.array(types) == "DIVIDEND") * prices, 2),
+    })
+
+
+def timed_books(engine: LedgerEngine, path: Path):
+    """(parse ms, build ms, books); parsing is the mtime-cached CSV read, building is the replay."""
+    parse_ms, build_ms = [], []
+    with stopwatch(parse_ms):
+        tx = load_transactions(path)
+    with stopwatch(build_ms):
+        books = engine.books(tx)
+    return parse_ms[0], build_ms[0], books
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--append", type=int, default=50)
+    args = parser.parse_args()
+
+    full = synthetic_ledger(args.rows + args.append)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        path = tmp / "transactions.csv"
+        full.iloc[: args.rows].to_csv(path, index=False)
+        engine = LedgerEngine(LedgerStore(tmp / "ledger.sqlite"))
+
+        cold = timed_books(engine, path)
+        full.to_csv(path, index=False)
+        append = timed_books(engine, path)
+        unchanged = timed_books(engine, path)
+
+        *_, scratch = timed_books(LedgerEngine(LedgerStore(tmp / "scratch.sqlite")), path)
+        resumed = append[2]
+        pd.testing.assert_frame_equal(resumed.holdings, scratch.holdings, check_exact=False, rtol=1e-9)
+        pd.testing.assert_frame_equal(resumed.closed, scratch.closed, check_exact=False, rtol=1e-9)
+
+    print(f"{args.rows:,} transactions (+{args.append} appended), {len(resumed.holdings)} open lines (matches full replay)")
+    print(f"{'run':<10} {'parse ms':>9} {'build ms':>9} {'replayed':>9}")
+    for label, (parse_ms, build_ms, books) in (("cold", cold), ("append", append), ("unchanged", unchanged)):
+        replayed = books.replayed if label != "unchanged" else 0
+        print(f"{label:<10} {parse_ms:>9.1f} {build_ms:>9.1f} {replayed:>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Before/after cost of the position builder at large portfolio sizes.
+
+Times the legacy per-row loop (kept here as the reference implementation)
+against the vectorized build_positions_from_prices on a synthetic portfolio,
+checks that both produce the same frame, and prints median/min/max. The
+positions are then spread across --owners family members to time the
+per-owner heatmap roll-up.
+
+    python benchmarks/positions_engine.py                 # 10k positions, 40 owners
+    python benchmarks/positions_engine.py --rows 50000 --owners 80 --runs 5
+"""
+import argparse
+import math
+import statistics
+import sys
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fixtures import scaled_portfolio  # noqa: E402
+from holdings import load_holdings  # noqa: E402
+from market_data import DEFAULT_USD_AED  # noqa: E402
+from portfolio import aggregate_for_heatmap, build_positions_from_prices  # noqa: E402
+from timing import time_call  # noqa: E402
+
+
+def build_positions_rowwise(prices_close, prices_intraday, usd_to_aed_rate, config):
+    """The pre-vectorization builder, one Python iteration per position."""
+    rows = []
+    for item in config:
+        t = item["Ticker"]
+        units = float(item["Units"])
+        purchase = float(item["PurchaseValAED"])
+
+        live_price = 0.0
+        if prices_intraday is not None:
+            live_price = float(prices_intraday.get(t, 0.0))
+        if live_price == 0 and not prices_close.empty:
+            live_price = float(prices_close.iloc[-1].get(t, 0.0))
+
+        prev_close_price = 0.0
+        if not prices_close.empty:
+            last_date = prices_close.index[-1].date()
+            today_date = datetime.now(ZoneInfo("America/New_York")).date()
+            col_data = prices_close[t]
+            if len(col_data) >= 2:
+                if last_date == today_date:
+                    prev_close_price = float(col_data.iloc[-2])
+                else:
+                    prev_close_price = float(col_data.iloc[-1])
+            elif len(col_data) == 1:
+                prev_close_price = float(col_data.iloc[-1])
+
+        if live_price <= 0:
+            value_aed, day_pct, day_pl_aed, total_pl_aed, total_pct, price_usd = purchase, 0.0, 0.0, 0.0, 0.0, 0.0
+        else:
+            price_usd = live_price
+            value_aed = price_usd * usd_to_aed_rate * units
+            day_pct = (price_usd / prev_close_price - 1.0) * 100.0 if prev_close_price > 0 else 0.0
+            day_pl_aed = value_aed * (day_pct / 100.0)
+            total_pl_aed = value_aed - purchase
+            total_pct = (total_pl_aed / purchase) * 100.0 if purchase > 0 else 0.0
+
+        rows.append({
+            "Name": item["Name"], "Ticker": t, "Owner": item["Owner"], "Sector": item["Sector"],
+            "Units": units, "PriceUSD": price_usd, "ValueAED": value_aed, "PurchaseAED": purchase,
+            "DayPct": day_pct, "DayPLAED": day_pl_aed, "TotalPct": total_pct, "TotalPLAED": total_pl_aed,
+        })
+
+    df = pd.DataFrame(rows)
+    total_val = df["ValueAED"].sum()
+    df["WeightPct"] = df["ValueAED"] / total_val * 100.0 if total_val > 0 else 0.0
+    return df
+
+
+def synthetic_prices(tickers: list[str], today_bar: bool, seed: int = 7):
+    """Five daily closes per ticker plus intraday prices for ~90% of them."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(datetime.now(ZoneInfo("America/New_York")).date())
+    if not today_bar:
+        end -= pd.Timedelta(days=1)
+    index = pd.date_range(end=end, periods=5, freq="D", name="Date")
+    closes = pd.DataFrame(rng.uniform(20, 600, (5, len(tickers))), index=index, columns=tickers)
+    live = closes.iloc[-1] * rng.normal(1.0, 0.01, len(tickers))
+    return closes, live[rng.random(len(tickers)) < 0.9]
+
+
+def assert_same_positions(vec_df: pd.DataFrame, loop_df: pd.DataFrame) -> None:
+    # The vectorized frame keeps the holdings dtypes (categorical / string); compare values
+    text_cols = ["Name", "Ticker", "Owner", "Sector"]
+    pd.testing.assert_frame_equal(
+        vec_df.astype({c: object for c in text_cols}),
+        loop_df.astype({c: object for c in text_cols}),
+        check_exact=False,
+        rtol=1e-12,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--owners", type=int, default=40)
+    args = parser.parse_args()
+
+    config = scaled_portfolio(math.ceil(args.rows / len(load_holdings())))[: args.rows]
+    tickers = sorted({row["Ticker"] for row in config})
+
+    rows = []
+    for today_bar in (False, True):
+        closes, live = synthetic_prices(tickers, today_bar)
+        call_args = (closes, live, DEFAULT_USD_AED, config)
+        loop_t, loop_df = time_call(build_positions_rowwise, *call_args, runs=args.runs)
+        vec_t, vec_df = time_call(build_positions_from_prices, *call_args, runs=args.runs)
+        assert_same_positions(vec_df, loop_df)
+        label = "today-bar" if today_bar else "prior-bar"
+        rows += [(f"loop/{label}", loop_t), (f"vector/{label}", vec_t)]
+
+    print(f"{len(config)} positions, {len(tickers)} tickers, {args.runs} runs each (outputs match)")
+    print(f"{'path':<18} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for label, timings in rows:
+        print(f"{label:<18} {statistics.median(timings):>10.1f} {min(timings):>8.1f} {max(timings):>8.1f}")
+
+    for i in range(0, len(rows), 2):
+        loop_med, vec_med = statistics.median(rows[i][1]), statistics.median(rows[i + 1][1])
+        if vec_med > 0:
+            print(f"speedup ({rows[i][0].split('/')[1]}): {loop_med / vec_med:.0f}x")
+
+    family = [dict(row, Owner=f"F{i % args.owners:02d}") for i, row in enumerate(config)]
+    positions = build_positions_from_prices(*call_args[:3], family)
+    agg_t, agg = time_call(aggregate_for_heatmap, positions, runs=args.runs)
+    print(f"owner roll-up: {args.owners} owners -> {len(agg)} tiles, median {statistics.median(agg_t):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Round-trips and latency of one quote refresh: per-source fetchers vs one QuoteBook.
+
+Replays the benchmark fixtures with a simulated upstream latency and compares
+the old refresh (batched intraday prices, then the index strip and FX rates
+with their per-symbol history calls) against a single fetch_quote_book()
+fanned out to the same three outputs, checking that the outputs agree.
+
+    python benchmarks/quote_refresh.py                   # 250 ms per request
+    python benchmarks/quote_refresh.py --latency-ms 600 --scale 10
+"""
+import argparse
+import statistics
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fixtures import build_fixtures, fixtures_current, scaled_portfolio  # noqa: E402
+from market_data import (  # noqa: E402
+    fetch_fx_rates,
+    fetch_last_prices_batched,
+    fetch_market_indices_change,
+    fetch_quote_book,
+    fx_matrix_from,
+    index_strip_from,
+    last_prices_from,
+    quote_symbols,
+)
+from providers import MarketDataProvider, ReplayProvider, set_provider  # noqa: E402
+from timing import stopwatch  # noqa: E402
+
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parents[1] / "data" / "bench-fixtures"
+
+
+class CountingProvider(MarketDataProvider):
+    """Counts upstream requests made through the wrapped provider."""
+
+    def __init__(self, inner: MarketDataProvider):
+        self.inner = inner
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def download(self, tickers, **kwargs):
+        self._count()
+        return self.inner.download(tickers, **kwargs)
+
+    def history(self, ticker, **kwargs):
+        self._count()
+        return self.inner.history(ticker, **kwargs)
+
+    def get_json(self, url, timeout):
+        self._count()
+        return self.inner.get_json(url, timeout)
+
+    def get_lines(self, url, timeout):
+        self._count()
+        return self.inner.get_lines(url, timeout)
+
+
+def legacy_refresh(tickers):
+    return fetch_last_prices_batched(tickers), fetch_market_indices_change(), fetch_fx_rates()
+
+
+def unified_refresh(tickers):
+    book = fetch_quote_book(quote_symbols(tickers))
+    return last_prices_from(book, tickers), index_strip_from(book), fx_matrix_from(book)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=250.0)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if not fixtures_current(args.fixtures):
+        print(f"building fixtures in {args.fixtures} ...")
+        build_fixtures(args.fixtures, sorted({1, 10, 100, args.scale}))
+
+    tickers = sorted({row["Ticker"] for row in scaled_portfolio(args.scale)})
+    counter = CountingProvider(ReplayProvider(args.fixtures, latency=args.latency_ms / 1000.0, strict=True))
+    set_provider(counter)
+
+    rows, outputs = [], {}
+    for label, fn in (("per-source", legacy_refresh), ("quote book", unified_refresh)):
+        timings = []
+        for _ in range(args.runs):
+            counter.calls = 0
+            with stopwatch(timings):
+                outputs[label] = fn(tickers)
+        rows.append((label, counter.calls, [ms / 1000.0 for ms in timings]))
+
+    legacy, unified = outputs["per-source"], outputs["quote book"]
+    assert legacy[1] == unified[1]
+    for (src, dst), rate in zip((("USD", "AED"), ("AED", "INR")), (legacy[2]["USD_AED"], legacy[2]["AED_INR"])):
+        assert abs(unified[2].rate(src, dst) / rate - 1.0) < 1e-12
+    assert (legacy[0].sort_index() - unified[0].sort_index()).abs().max() < 1e-9
+
+    print(f"{len(tickers)} holdings tickers, {args.latency_ms:.0f} ms simulated latency (outputs match)")
+    print(f"{'refresh':<11} {'requests':>8} {'median s':>9}")
+    for label, calls, timings in rows:
+        print(f"{label:<11} {calls:>8} {statistics.median(timings):>9.2f}")
+    before, after = statistics.median(rows[0][2]), statistics.median(rows[1][2])
+    if after > 0:
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cost of keeping the Risk tab current (risk.py).
+
+Generates --days of closes for --symbols correlated random walks plus the
+benchmark, then times
+  rebuild     RollingRisk.from_history over the whole history plus a snapshot
+  pandas      the same statistics recomputed from scratch with pandas
+  new bar     push() of one completed bar plus a snapshot
+  tick        snapshot() with a provisional live bar (state untouched)
+and checks the incremental state against pandas.
+
+    python benchmarks/rolling_risk.py
+    python benchmarks/rolling_risk.py --symbols 500 --days 2000
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from risk import RISK_BENCHMARK, RISK_MIN_BARS, RISK_WINDOW, TRADING_DAYS, RollingRisk  # noqa: E402
+from timing import median_ms, stopwatch  # noqa: E402
+
+
+def correlated_closes(symbols: int, days: int, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.012, days)
+    returns = rng.uniform(0.5, 1.5, symbols) * market[:, None] + rng.normal(0.0, 0.01, (days, symbols))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days, name="Date")
+    columns = [f"S{i}" for i in range(symbols)] + [RISK_BENCHMARK]
+    return pd.DataFrame(100.0 * np.exp(np.cumsum(np.c_[returns, market], axis=0)), index=index, columns=columns)
+
+
+def pandas_stats(closes: pd.DataFrame) -> pd.DataFrame:
+    returns = closes.pct_change(fill_method=None).tail(RISK_WINDOW)
+    cov = returns.cov(min_periods=RISK_MIN_BARS)
+    returns.corr(min_periods=RISK_MIN_BARS)
+    return pd.DataFrame({
+        "VolPct": np.sqrt(np.diag(cov) * TRADING_DAYS) * 100.0,
+        "Beta": cov[RISK_BENCHMARK] / cov.at[RISK_BENCHMARK, RISK_BENCHMARK],
+    }, index=closes.columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=150)
+    parser.add_argument("--days", type=int, default=520)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    closes = correlated_closes(args.symbols, args.days + 1)
+    history, bar = closes.iloc[:-1], closes.iloc[-1]
+    tick = (bar * 1.01).to_numpy()
+
+    risk = RollingRisk.from_history(history)
+    rows = [
+        ("rebuild", median_ms(lambda: RollingRisk.from_history(history).snapshot(), runs=args.runs)),
+        ("pandas", median_ms(lambda: pandas_stats(history), runs=args.runs)),
+        ("tick", median_ms(lambda: risk.snapshot(tick), runs=args.runs)),
+    ]
+
+    new_bar = []
+    for _ in range(args.runs):
+        state = RollingRisk.from_history(history)
+        with stopwatch(new_bar):
+            state.push(bar.name, bar.to_numpy())
+            state.snapshot()
+    rows.insert(2, ("new bar", statistics.median(new_bar)))
+
+    print(f"{args.days:,} days x {args.symbols} symbols (+{RISK_BENCHMARK}), window {RISK_WINDOW}")
+    print(f"{'stage':<8} {'median ms':>10}")
+    for label, ms in rows:
+        print(f"{label:<8} {ms:>10.2f}")
+
+    risk.push(bar.name, bar.to_numpy())
+    got, want = risk.snapshot().stats, pandas_stats(closes)
+    diff = max(np.nanmax(np.abs(got[c] - want[c])) for c in want.columns)
+    print(f"max |incremental - pandas| {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Loader- and builder-level benchmark suite.
+
+Runs each dashboard stage against replayed fixture data at several multiples
+of today's portfolio size, reports p50/p95 wall time and peak traced memory,
+and fails (exit code 1) when a stage's p95 regresses past the stored baseline.
+
+    python benchmarks/run.py                      # 1x, 10x, 100x vs baseline.json
+    python benchmarks/run.py --scales 1 10 --repeat 30
+    python benchmarks/run.py --update-baseline    # record new baseline numbers
+    python benchmarks/run.py --json results.json  # also dump raw results
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from charts import build_overview_heatmap_frame, overview_treemap  # noqa: E402
+from fixtures import build_fixtures, fixtures_current, scaled_portfolio  # noqa: E402
+from market_data import (  # noqa: E402
+    DEFAULT_USD_AED,
+    fetch_prices_close,
+    fetch_quote_book,
+    index_strip_from,
+    last_prices_from,
+    quote_symbols,
+)
+from portfolio import aggregate_for_heatmap, build_positions_from_prices  # noqa: E402
+from price_store import PriceStore  # noqa: E402
+from providers import ReplayProvider, set_provider  # noqa: E402
+from timing import time_call  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+DEFAULT_FIXTURES_DIR = BENCH_DIR.parent / "data" / "bench-fixtures"
+DEFAULT_SCALES = [1, 10, 100]
+
+# A stage fails when p95 > baseline_p95 * (1 + TOLERANCE) + SLACK_MS
+TOLERANCE = 0.5
+SLACK_MS = 5.0
+
+
+class StageInputs:
+    """Replayed inputs for one scale, built once and shared by the stages."""
+
+    def __init__(self, scale: int, workdir: Path):
+        self.config = scaled_portfolio(scale)
+        self.tickers = sorted({row["Ticker"] for row in self.config})
+        self.store = PriceStore(workdir / f"prices-{scale}x.sqlite")
+        # Cold backfill outside the timed region; the stage measures steady-state refreshes
+        fetch_prices_close(self.store, self.tickers)
+        self.prices_close = fetch_prices_close(self.store, self.tickers)
+        self.book = fetch_quote_book(quote_symbols(self.tickers))
+        self.prices_intraday = last_prices_from(self.book, self.tickers)
+        self.positions = build_positions_from_prices(
+            self.prices_close, self.prices_intraday, DEFAULT_USD_AED, self.config
+        )
+        self.agg = aggregate_for_heatmap(self.positions)
+
+
+def _treemap(inp: StageInputs):
+    hm = build_overview_heatmap_frame(inp.agg, 24.5, 0.0, 0.0, 0.0)
+    # Time a full build, not a hit in the figure memo
+    overview_treemap.clear()
+    return overview_treemap(hm)
+
+
+STAGES = {
+    "load_prices_close": lambda inp: fetch_prices_close(inp.store, inp.tickers),
+    # The live refresh path: one bulk quote book, fanned out to prices and the index strip
+    "load_quote_book": lambda inp: fetch_quote_book(quote_symbols(inp.tickers)),
+    "last_prices_from": lambda inp: last_prices_from(inp.book, inp.tickers),
+    "index_strip_from": lambda inp: index_strip_from(inp.book),
+    "build_positions_from_prices": lambda inp: build_positions_from_prices(
+        inp.prices_close, inp.prices_intraday, DEFAULT_USD_AED, inp.config
+    ),
+    "aggregate_for_heatmap": lambda inp: aggregate_for_heatmap(inp.positions),
+    "overview_treemap": _treemap,
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(pos), min(int(pos) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def measure(fn, inp: StageInputs, repeat: int) -> dict:
+    fn(inp)  # warm-up (imports, plotly templates, sqlite page cache)
+    timings, _ = time_call(fn, inp, runs=repeat)
+    # Peak memory in a separate, traced run so tracing overhead doesn't skew timings
+    tracemalloc.start()
+    fn(inp)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "peak_kib": round(peak / 1024.0, 1),
+    }
+
+
+def check_regressions(results: dict, baseline: dict) -> list[str]:
+    failures = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = base["p95_ms"] * (1 + TOLERANCE) + SLACK_MS
+        if res["p95_ms"] > limit:
+            failures.append(f"{key}: p95 {res['p95_ms']:.1f} ms > limit {limit:.1f} ms (baseline {base['p95_ms']:.1f} ms)")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--regen-fixtures", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", type=Path, help="write raw results to this file")
+    args = parser.parse_args()
+
+    if args.regen_fixtures or not fixtures_current(args.fixtures):
+        print(f"building fixtures in {args.fixtures} ...")
+        build_fixtures(args.fixtures, sorted(set(args.scales) | set(DEFAULT_SCALES)))
+
+    set_provider(ReplayProvider(args.fixtures, strict=True))
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            inp = StageInputs(scale, Path(tmp))
+            for stage in args.stages:
+                results[f"{stage}@{scale}x"] = measure(STAGES[stage], inp, args.repeat)
+
+    print(f"{'stage':<40} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>10}")
+    for key, res in results.items():
+        print(f"{key:<40} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f} {res['peak_kib']:>10.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline updated: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("no baseline stored; run with --update-baseline to create one")
+        return 0
+    failures = check_regressions(results, json.loads(args.baseline.read_text()))
+    for line in failures:
+        print(f"REGRESSION {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Cost of one streamed tick batch against a full positions rebuild (streaming.py).
+
+Builds positions for a --scale x portfolio, then replays --ticks batches of
+--batch random symbol moves through a QuoteTable and times
+  rebuild   build_positions_from_prices with the new prices, plus the sums
+            the KPI cards read (what a refresh costs without streaming)
+  tick      QuoteTable.push + changed_since + PositionStream.apply + totals
+and checks the streamed totals against a rebuild at the final prices.
+
+    python benchmarks/stream_ticks.py
+    python benchmarks/stream_ticks.py --scale 100 --batch 20
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fixtures import scaled_portfolio  # noqa: E402
+from holdings import HOLDINGS_SCHEMA, coerce  # noqa: E402
+from portfolio import build_positions_from_prices, reference_closes  # noqa: E402
+from streaming import PositionStream, QuoteTable  # noqa: E402
+from timing import stopwatch  # noqa: E402
+
+USD_TO_AED = 3.6725
+
+
+def kpi_sums(positions: pd.DataFrame) -> dict[str, float]:
+    return {
+        "value": positions["ValueAED"].sum(),
+        "purchase": positions["PurchaseAED"].sum(),
+        "day_pl": positions["DayPLAED"].sum(),
+        "total_pl": positions["TotalPLAED"].sum(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=5, help="symbols per tick batch")
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    holdings = coerce(pd.DataFrame(scaled_portfolio(args.scale)), HOLDINGS_SCHEMA)
+    tickers = sorted(set(holdings["Ticker"]))
+    rng = np.random.default_rng(3)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=5)
+    closes = pd.DataFrame(rng.uniform(50.0, 300.0, (len(index), len(tickers))), index=index, columns=tickers)
+    prices = closes.iloc[-1].copy()
+
+    positions = build_positions_from_prices(closes, prices, USD_TO_AED, holdings)
+    _, prev_close = reference_closes(closes, positions["Ticker"])
+    book = PositionStream(positions, prev_close, USD_TO_AED)
+    table = QuoteTable()
+    seen = 0
+
+    batches = []
+    for _ in range(args.ticks):
+        picked = rng.choice(len(tickers), min(args.batch, len(tickers)), replace=False)
+        batches.append({tickers[i]: float(prices.iloc[i] * rng.uniform(0.99, 1.01)) for i in picked})
+
+    rebuild_ms, tick_ms = [], []
+    for ticks in batches:
+        prices.update(pd.Series(ticks))
+        with stopwatch(rebuild_ms):
+            kpi_sums(build_positions_from_prices(closes, prices, USD_TO_AED, holdings))
+
+        with stopwatch(tick_ms):
+            table.push(ticks)
+            seen, changed = table.changed_since(seen)
+            book.apply(changed)
+            book.totals()
+
+    expected = kpi_sums(build_positions_from_prices(closes, prices, USD_TO_AED, holdings))
+    streamed = book.totals()
+    worst = max(abs(streamed[k] - expected[k]) / max(1.0, abs(expected[k])) for k in expected)
+
+    print(f"{len(positions):,} positions, {len(tickers)} tickers ({args.scale}x), "
+          f"{args.ticks} batches of {args.batch} symbols")
+    print(f"{'path':<8} {'median ms':>10}")
+    print(f"{'rebuild':<8} {statistics.median(rebuild_ms):>10.3f}")
+    print(f"{'tick':<8} {statistics.median(tick_ms):>10.3f}")
+    print(f"speedup {statistics.median(rebuild_ms) / statistics.median(tick_ms):.1f}x, "
+          f"max relative diff {worst:.1e}")
+    if worst > 1e-9:
+        sys.exit("streamed totals diverged from a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Wall-clock timing helpers shared by the benchmark scripts (milliseconds throughout)."""
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def time_call(fn, *args, runs: int = 1) -> tuple[list[float], object]:
+    """(ms per run, last result) of fn(*args) called runs times."""
+    timings, result = [], None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    return timings, result
+
+
+def median_ms(fn, *args, runs: int = 1) -> float:
+    return statistics.median(time_call(fn, *args, runs=runs)[0])
+
+
+@contextmanager
+def stopwatch(timings: list[float]):
+    """Append the block's wall time in ms to timings, for loops with per-run setup."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((time.perf_counter() - t0) * 1000.0)
@@ -0,0 +1,93 @@
+"""Cost of building the daily portfolio value series (history.py).
+
+Generates --years of business-day closes, NAVs and FX for the scaled portfolio,
+then times build_value_history plus the owner / sector / kind breakdowns for
+  flat    today's holdings held over the whole window (no ledger)
+  ledger  units replayed from a synthetic ledger of --ledger-rows transactions
+
+    python benchmarks/value_history.py
+    python benchmarks/value_history.py --years 20 --scale 100 --ledger-rows 500000
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fixtures import scaled_mf_config, scaled_portfolio  # noqa: E402
+from fx import fx_matrix  # noqa: E402
+from history import build_value_history  # noqa: E402
+from holdings import HOLDINGS_SCHEMA, MF_SCHEMA, coerce  # noqa: E402
+from timing import time_call  # noqa: E402
+
+
+def random_walks(index: pd.DatetimeIndex, columns: list[str], start: float, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0003, 0.015, (len(index), len(columns)))
+    return pd.DataFrame(start * np.exp(np.cumsum(steps, axis=0)), index=index, columns=columns)
+
+
+def synthetic_ledger(holdings: pd.DataFrame, mf_holdings: pd.DataFrame, index: pd.DatetimeIndex,
+                     rows: int, seed: int = 5) -> pd.DataFrame:
+    """Buys spread over the window, with one-unit sells mixed in after each line's first buy."""
+    rng = np.random.default_rng(seed)
+    lines = pd.concat([
+        pd.DataFrame({"Owner": holdings["Owner"].astype(str), "Kind": "US", "Symbol": holdings["Ticker"],
+                      "Name": holdings["Name"], "Sector": holdings["Sector"].astype(str)}),
+        pd.DataFrame({"Owner": "MF", "Kind": "MF", "Symbol": mf_holdings["AMFICode"],
+                      "Name": mf_holdings["Scheme"], "Sector": mf_holdings["Category"].astype(str)}),
+    ], ignore_index=True)
+    picks = rng.integers(0, len(lines), rows)
+    days = np.sort(rng.integers(0, len(index), rows))
+    units = rng.integers(1, 20, rows).astype(float)
+    # Every line's first transaction is a buy; later ones are sells 20% of the time
+    first = ~pd.Series(picks).duplicated().to_numpy()
+    is_sell = (rng.random(rows) < 0.2) & ~first
+    units[is_sell] = np.minimum(units[is_sell], 1.0)
+    tx = lines.iloc[picks].reset_index(drop=True)
+    tx.insert(0, "Date", index[days])
+    tx["Type"] = np.where(is_sell, "SELL", "BUY")
+    tx["Units"] = units
+    tx["Amount"] = units * 100.0
+    return tx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--ledger-rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    holdings = coerce(pd.DataFrame(scaled_portfolio(args.scale)), HOLDINGS_SCHEMA)
+    mf_holdings = coerce(pd.DataFrame(scaled_mf_config(args.scale)), MF_SCHEMA)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=args.years * 261, name="Date")
+    tickers = sorted(set(holdings["Ticker"]))
+    codes = sorted(set(mf_holdings["AMFICode"]))
+    closes = random_walks(index, tickers, 150.0, 1)
+    navs = random_walks(index, codes, 40.0, 2)
+    fx = fx_matrix(random_walks(index, ["AEDINR=X"], 22.0, 3).assign(**{"USDAED=X": 3.6725}))
+    tx = synthetic_ledger(holdings, mf_holdings, index, args.ledger_rows)
+
+    def run(transactions):
+        history = build_value_history(
+            holdings, mf_holdings, closes, navs, fx, index[0].date(), transactions
+        )
+        for column in ("Owner", "Sector", "Kind"):
+            history.by(column)
+        return history
+
+    print(f"{len(index):,} days x {len(tickers)} tickers + {len(codes)} schemes ({args.years}y, {args.scale}x)")
+    print(f"{'units':<8} {'lines':>6} {'median ms':>10}")
+    for label, transactions in (("flat", None), ("ledger", tx)):
+        timings, history = time_call(run, transactions, runs=args.runs)
+        print(f"{label:<8} {history.values.shape[1]:>6} {statistics.median(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Batched XIRR (returns.py) against a per-series scalar solver.
+
+Generates --series random cash-flow series (a few to --max-flows dated
+outflows each, plus a terminal value) and times
+  batched  every series solved together by returns.xirr
+  scalar   one bisection loop per series in plain Python
+
+    python benchmarks/xirr.py
+    python benchmarks/xirr.py --series 5000 --max-flows 200
+"""
+import argparse
+import math
+import statistics
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from returns import XIRR_X_BOUNDS, xirr  # noqa: E402
+from timing import time_call  # noqa: E402
+
+
+def random_flows(n_series: int, max_flows: int, seed: int = 3):
+    """(series, years, amounts): outflows over the last 8 years, then a value today."""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, max_flows, n_series)
+    series = np.repeat(np.arange(n_series), counts + 1)
+    years = np.empty(len(series))
+    amounts = np.empty(len(series))
+    ends = np.cumsum(counts + 1)
+    for s, (count, end) in enumerate(zip(counts, ends)):
+        start = end - count - 1
+        years[start:end - 1] = np.sort(rng.uniform(-8.0, -0.01, count))
+        amounts[start:end - 1] = -rng.uniform(1e3, 1e5, count)
+        years[end - 1] = 0.0
+        amounts[end - 1] = -amounts[start:end - 1].sum() * rng.uniform(0.3, 4.0)
+    return series, years, amounts
+
+
+def scalar_xirr(years: np.ndarray, amounts: np.ndarray) -> float:
+    """Bisection on the same log(1 + rate) bracket, one series at a time."""
+    def npv(x: float) -> float:
+        return sum(a * math.exp(-x * t) for t, a in zip(years, amounts))
+
+    lo, hi = XIRR_X_BOUNDS
+    f_lo = npv(lo)
+    if f_lo * npv(hi) >= 0:
+        return math.nan
+    while hi - lo > 1e-10:
+        mid = 0.5 * (lo + hi)
+        f_mid = npv(mid)
+        if (f_mid > 0) == (f_lo > 0):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+    return math.expm1(0.5 * (lo + hi))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, default=500)
+    parser.add_argument("--max-flows", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    series, years, amounts = random_flows(args.series, args.max_flows)
+    starts = np.flatnonzero(np.r_[True, series[1:] != series[:-1]])
+    bounds = list(zip(starts, np.r_[starts[1:], len(series)]))
+
+    timings, batched = time_call(xirr, series, years, amounts, args.series, runs=args.runs)
+    batched_ms = statistics.median(timings)
+
+    (scalar_ms,), scalar = time_call(
+        lambda: np.array([scalar_xirr(years[a:b], amounts[a:b]) for a, b in bounds])
+    )
+
+    both = ~np.isnan(batched) & ~np.isnan(scalar)
+    print(f"{args.series:,} series, {len(series):,} flows")
+    print(f"{'solver':<8} {'ms':>10}")
+    print(f"{'batched':<8} {batched_ms:>10.1f}")
+    print(f"{'scalar':<8} {scalar_ms:>10.1f}")
+    print(f"max |rate diff| {np.abs(batched[both] - scalar[both]).max():.2e}, "
+          f"NaN rows agree: {bool((np.isnan(batched) == np.isnan(scalar)).all())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Build the self-hosted font under static/fonts.
+
+Downloads the Space Grotesk variable font (SIL OFL) from the google/fonts
+repository, pins its weight axis to the 300-700 range the theme uses, subsets
+it to the characters the dashboard renders (Latin, Latin-1, dashes, quotes,
+bullet, rupee sign) and writes one WOFF2 file that static/dashboard.css loads
+with font-display: swap. Run once per checkout or deploy; needs network access
+and fonttools with WOFF2 support:
+
+    pip install "fonttools[woff]"
+    python build_static.py
+"""
+import io
+import sys
+import urllib.request
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+FONT_PATH = STATIC_DIR / "fonts" / "space-grotesk-latin.woff2"
+FONT_URL = "https://github.com/google/fonts/raw/main/ofl/spacegrotesk/SpaceGrotesk%5Bwght%5D.ttf"
+
+# Keep in sync with the unicode-range of the @font-face in static/dashboard.css
+UNICODES = "U+0020-007E,U+00A0-00FF,U+2013-2014,U+2018-201D,U+2022,U+2026,U+20B9"
+WEIGHT_RANGE = (300, 700)
+
+
+def parse_unicodes(spec: str) -> list[int]:
+    codes = []
+    for part in spec.split(","):
+        lo, _, hi = part.strip().removeprefix("U+").partition("-")
+        codes.extend(range(int(lo, 16), int(hi or lo, 16) + 1))
+    return codes
+
+
+def build_font(dest: Path = FONT_PATH) -> int:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+
+    with urllib.request.urlopen(FONT_URL, timeout=60) as resp:
+        font = TTFont(io.BytesIO(resp.read()))
+    font = instancer.instantiateVariableFont(font, {"wght": WEIGHT_RANGE})
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["kern", "liga", "tnum"]
+    options.name_IDs = ["*"]
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=parse_unicodes(UNICODES))
+    subsetter.subset(font)
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    font.flavor = "woff2"
+    font.save(dest)
+    return dest.stat().st_size
+
+
+def main():
+    try:
+        size = build_font()
+    except ImportError:
+        sys.exit('fonttools is required: pip install "fonttools[woff]"')
+    print(f"wrote {FONT_PATH.relative_to(STATIC_DIR.parent)} ({size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import math
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+from perf import timed
+
+# ---------- CARD LISTS ----------
+# Position and MF scheme cards are rendered from Jinja2 templates in
+# templates/, compiled once per process, and each list (or list page) is
+# emitted as a single HTML block instead of one st.markdown per row. Long
+# lists are paged so render time and DOM size stay flat as holdings grow.
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+# Cards per page; shorter lists render in one page with no pager
+CARDS_PAGE_SIZE = 40
+
+_ENV = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(default=True, default_for_string=True),
+    undefined=StrictUndefined,
+    auto_reload=False,
+)
+_CARD_LIST = _ENV.get_template("card_list.html.j2")
+
+
+def _clean_name(name: str) -> str:
+    return name.upper().replace(" [SV]", "")
+
+
+def position_cards(rows: list[dict], owner_label: str | None = None) -> list[dict]:
+    """Card fields for position rows (already sorted).
+
+    owner_label is appended to every units line (the SV tab); otherwise only
+    SV positions are marked.
+    """
+    cards = []
+    for row in rows:
+        pl_aed = row["TotalPLAED"]
+        if owner_label is not None:
+            suffix = f" • {owner_label}"
+        else:
+            suffix = " • SV" if row["Owner"] == "SV" else ""
+        cards.append({
+            "units": f"{row['Units']:,.0f} UNITS{suffix}",
+            "pl_aed": f"{'+ ' if pl_aed >= 0 else ''}AED {pl_aed:,.0f}",
+            "pl_pct": f"{row['TotalPct']:+.2f}%",
+            "color": "kpi-green" if pl_aed >= 0 else "kpi-red",
+            "name": _clean_name(row["Name"]),
+            "value": f"AED {row['ValueAED']:,.0f}",
+            "ticker": row["Ticker"],
+        })
+    return cards
+
+
+def mf_display_name(scheme: str) -> str:
+    """Scheme name without a trailing plan code / date and the "Fund Growth" suffix."""
+    display_name = scheme
+    parts = display_name.split()
+    if parts and all(ch.isdigit() or ch in "/-" for ch in parts[-1]):
+        display_name = " ".join(parts[:-1])
+    if "Fund Growth" in display_name:
+        display_name = display_name.replace(" Fund Growth", "")
+    return display_name
+
+
+def mf_cards(rows: list[dict], fmt_value) -> list[dict]:
+    """Card fields for MF scheme rows (already sorted); fmt_value formats INR values."""
+    return [
+        {"value": fmt_value(row["value_inr"]), "ret": f"{row['return_pct']:.1f}%", "name": mf_display_name(row["scheme"])}
+        for row in rows
+    ]
+
+
+def page_count(n_cards: int, page_size: int = CARDS_PAGE_SIZE) -> int:
+    return max(1, math.ceil(n_cards / page_size))
+
+
+@timed()
+def render_card_list(cards: list[dict], kind: str, page: int = 1, page_size: int = CARDS_PAGE_SIZE) -> str:
+    """One HTML block for a page of cards; kind is "position" or "mf"."""
+    start = (page - 1) * page_size
+    return _CARD_LIST.render(cards=cards[start:start + page_size], kind=kind)
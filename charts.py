@@ -0,0 +1,287 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from perf import span, timed
+
+# ---------- CHART COLORS ----------
+COLOR_PRIMARY = "#4aa3ff"
+COLOR_SUCCESS = "#6bcf8f"
+COLOR_DANGER = "#f27d72"
+COLOR_BG = "#0f1a2b"
+
+# ---------- FIGURE MEMO ----------
+# px.treemap costs ~100 ms per call, mostly in its path aggregation, and the
+# frames it is fed rarely change between ticks. Treemap figures are memoized
+# on a hash of the plotted columns; when only the numbers move (same tiles),
+# the last figure is copied and its per-tile arrays replaced instead of being
+# rebuilt through px. Memoized figures are shared by all sessions: treat them
+# as read-only.
+
+FIGURE_MEMO_SIZE = 16
+
+_FIGURES: OrderedDict[tuple[str, str], go.Figure] = OrderedDict()
+_LATEST_FIGURE: dict[str, go.Figure] = {}
+_FIGURES_LOCK = threading.Lock()
+
+
+def frame_digest(frame: pd.DataFrame, columns: list[str]) -> str:
+    """Content hash of the given columns (values and order, not the index)."""
+    hashed = pd.util.hash_pandas_object(frame[columns], index=False)
+    return hashlib.blake2b(hashed.to_numpy().tobytes(), digest_size=16).hexdigest()
+
+
+def _patched_treemap(prev: go.Figure, hm: pd.DataFrame, color: str, custom_data: list[str]) -> go.Figure | None:
+    """prev with hm's sizes, colours and custom data, or None if the tiles differ."""
+    trace = prev.data[0]
+    ids = list(trace.ids) if len(prev.data) == 1 and trace.ids is not None else []
+    if len(ids) != len(hm) or not hm["Name"].is_unique or set(ids) != set(hm["Name"]):
+        return None
+    rows = hm.set_index("Name").loc[ids]
+    fig = go.Figure(prev)
+    fig.update_traces(
+        values=rows["SizeForHeatmap"].to_numpy(),
+        marker_colors=rows[color].to_numpy(),
+        customdata=rows[custom_data].to_numpy(),
+    )
+    return fig
+
+
+def memoized_treemap(color: str, custom_data: list[str]):
+    """Decorator for treemap builders over a frame with one tile per Name.
+
+    Records a span tagged cache=hit|patch|miss and exposes `.clear()`.
+    """
+    columns = list(dict.fromkeys(["Name", "SizeForHeatmap", color, *custom_data]))
+
+    def deco(build):
+        kind = build.__name__
+
+        @functools.wraps(build)
+        def wrapper(hm: pd.DataFrame) -> go.Figure:
+            with span(kind) as s:
+                key = (kind, frame_digest(hm, columns))
+                with _FIGURES_LOCK:
+                    fig = _FIGURES.get(key)
+                    if fig is not None:
+                        _FIGURES.move_to_end(key)
+                        s.attrs["cache"] = "hit"
+                        return fig
+                    prev = _LATEST_FIGURE.get(kind)
+                fig = _patched_treemap(prev, hm, color, custom_data) if prev is not None else None
+                s.attrs["cache"] = "miss" if fig is None else "patch"
+                if fig is None:
+                    fig = build(hm)
+                with _FIGURES_LOCK:
+                    _FIGURES[key] = _LATEST_FIGURE[kind] = fig
+                    while len(_FIGURES) > FIGURE_MEMO_SIZE:
+                        _FIGURES.popitem(last=False)
+                return fig
+
+        def clear():
+            with _FIGURES_LOCK:
+                for k in [k for k in _FIGURES if k[0] == kind]:
+                    del _FIGURES[k]
+                _LATEST_FIGURE.pop(kind, None)
+
+        wrapper.clear = clear
+        return wrapper
+    return deco
+
+
+# ---------- DAY P&L TREEMAPS ----------
+
+def _style_treemap(fig, hovertemplate: str):
+    fig.update_traces(
+        hovertemplate=hovertemplate,
+        texttemplate="%{label}<br>%{customdata[2]}",
+        textfont=dict(family="Space Grotesk, sans-serif", color="#e6eaf0", size=11),
+        marker=dict(line=dict(width=0)),
+        root_color=COLOR_BG,
+    )
+
+    fig.update_layout(
+        margin=dict(t=0, l=0, r=0, b=0),
+        paper_bgcolor=COLOR_BG,
+        plot_bgcolor=COLOR_BG,
+        coloraxis_showscale=False,
+        font=dict(family="Space Grotesk, sans-serif"),
+    )
+    return fig
+
+
+def label_for_k(v: float) -> str:
+    if v >= 0:
+        return f"₹{abs(v):,.0f}k"
+    else:
+        return f"[₹{abs(v):,.0f}k]"
+
+
+def label_for_sv(v: float) -> str:
+    if v >= 0:
+        return f"AED {v:,.0f}"
+    else:
+        return f"[AED {abs(v):,.0f}]"
+
+
+@timed()
+def build_overview_heatmap_frame(
+    agg_for_heatmap: pd.DataFrame,
+    aed_to_inr: float,
+    mf_val_inr: float,
+    mf_day_pl_inr: float,
+    mf_day_pct: float,
+) -> pd.DataFrame:
+    """Heatmap rows for the Overview tab: holdings (SV rolled up) plus one Indian MF tile."""
+    hm = agg_for_heatmap.copy()
+    hm["DayPLINR"] = hm["DayPLAED"] * aed_to_inr
+
+    if mf_val_inr > 0 or mf_day_pl_inr != 0.0:
+        ind_mf_row = {
+            "Name": "Indian MF",
+            "Ticker": "INDMF",
+            "Owner": "MF",
+            "Sector": "India MF",
+            "Units": 0.0,
+            "PriceUSD": 0.0,
+            "ValueAED": mf_val_inr / aed_to_inr if mf_val_inr > 0 else 0.0,
+            "PurchaseAED": 0.0,
+            "DayPct": mf_day_pct,
+            "DayPLAED": mf_day_pl_inr / aed_to_inr,
+            "DayPLINR": mf_day_pl_inr,
+            "TotalPct": 0.0,
+            "TotalPLAED": 0.0,
+            "WeightPct": 0.0,
+        }
+        hm = pd.concat([hm, pd.DataFrame([ind_mf_row])], ignore_index=True)
+
+    hm["SizeForHeatmap"] = hm["DayPLINR"].abs() + 1e-6
+    hm["DayPLK"] = hm["DayPLINR"] / 1000.0
+    hm["DayPLKLabel"] = hm["DayPLK"].apply(label_for_k)
+    return hm
+
+
+OVERVIEW_CUSTOM_DATA = ["DayPLINR", "Ticker", "DayPLKLabel"]
+SV_CUSTOM_DATA = ["DayPLAED", "Ticker", "DayPLLabel"]
+
+
+@memoized_treemap("DayPLINR", OVERVIEW_CUSTOM_DATA)
+def overview_treemap(hm: pd.DataFrame):
+    fig = px.treemap(
+        hm,
+        path=["Name"],
+        values="SizeForHeatmap",
+        color="DayPLINR",
+        color_continuous_scale=[COLOR_DANGER, "#16233a", COLOR_SUCCESS],
+        color_continuous_midpoint=0,
+        custom_data=OVERVIEW_CUSTOM_DATA,
+    )
+    return _style_treemap(
+        fig,
+        "<b>%{label}</b><br>Ticker: %{customdata[1]}<br>Day P&L: ₹%{customdata[0]:,.0f}<extra></extra>",
+    )
+
+
+@timed()
+def build_sv_heatmap_frame(sv_positions: pd.DataFrame) -> pd.DataFrame:
+    hm_sv = sv_positions.copy()
+    hm_sv["Name"] = hm_sv["Name"].str.replace(r"\s*\[SV\]", "", regex=True)
+    hm_sv["SizeForHeatmap"] = hm_sv["DayPLAED"].abs() + 1e-6
+    hm_sv["DayPLLabel"] = hm_sv["DayPLAED"].apply(label_for_sv)
+    return hm_sv
+
+
+@memoized_treemap("DayPLAED", SV_CUSTOM_DATA)
+def sv_treemap(hm_sv: pd.DataFrame):
+    fig_sv = px.treemap(
+        hm_sv,
+        path=["Name"],
+        values="SizeForHeatmap",
+        color="DayPLAED",
+        color_continuous_scale=[COLOR_DANGER, "#16233a", COLOR_SUCCESS],
+        color_continuous_midpoint=0,
+        custom_data=SV_CUSTOM_DATA,
+    )
+    return _style_treemap(
+        fig_sv,
+        "<b>%{label}</b><br>Ticker: %{customdata[1]}<br>Day P&L: AED %{customdata[0]:,.0f}<extra></extra>",
+    )
+
+# ---------- VALUE HISTORY ----------
+
+HISTORY_COLORS = [COLOR_PRIMARY, COLOR_SUCCESS, "#f5c451", COLOR_DANGER, "#b48cff", "#5fd4d0", "#ff9f6e", "#8aa0c0"]
+
+
+@timed()
+def value_history_chart(series: pd.DataFrame):
+    """Stacked daily value per column (INR, shown in lakh) with range buttons."""
+    lakhs = series / 100000.0
+    fig = go.Figure()
+    for i, column in enumerate(lakhs.columns):
+        fig.add_trace(go.Scatter(
+            x=lakhs.index,
+            y=lakhs[column].to_numpy(),
+            name=str(column),
+            mode="lines",
+            stackgroup="value",
+            line=dict(width=1.2, color=HISTORY_COLORS[i % len(HISTORY_COLORS)]),
+            hovertemplate=f"{column}: ₹%{{y:,.1f}} L<extra></extra>",
+        ))
+
+    fig.update_layout(
+        margin=dict(t=8, l=0, r=0, b=0),
+        paper_bgcolor=COLOR_BG,
+        plot_bgcolor=COLOR_BG,
+        font=dict(family="Space Grotesk, sans-serif", color="#e6eaf0", size=11),
+        hovermode="x unified",
+        showlegend=len(lakhs.columns) > 1,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=0),
+        xaxis=dict(
+            showgrid=False,
+            rangeselector=dict(
+                buttons=[
+                    dict(count=6, label="6M", step="month", stepmode="backward"),
+                    dict(count=1, label="1Y", step="year", stepmode="backward"),
+                    dict(count=3, label="3Y", step="year", stepmode="backward"),
+                    dict(step="all", label="All"),
+                ],
+                bgcolor="#16233a",
+                activecolor="#243656",
+            ),
+        ),
+        yaxis=dict(gridcolor="#1e2c44", tickprefix="₹", ticksuffix=" L"),
+    )
+    return fig
+
+
+# ---------- RISK ----------
+
+@timed()
+def correlation_heatmap(corr: pd.DataFrame):
+    """Pairwise daily-return correlations, red (together) to blue (opposite)."""
+    labels = [str(c) for c in corr.columns]
+    fig = go.Figure(go.Heatmap(
+        z=corr.to_numpy(),
+        x=labels,
+        y=labels,
+        zmin=-1.0,
+        zmax=1.0,
+        colorscale=[[0.0, COLOR_PRIMARY], [0.5, COLOR_BG], [1.0, COLOR_DANGER]],
+        texttemplate="%{z:.2f}" if len(labels) <= 20 else None,
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>",
+        colorbar=dict(thickness=10),
+    ))
+    fig.update_layout(
+        margin=dict(t=8, l=0, r=0, b=0),
+        paper_bgcolor=COLOR_BG,
+        plot_bgcolor=COLOR_BG,
+        font=dict(family="Space Grotesk, sans-serif", color="#e6eaf0", size=11),
+        height=max(320, 28 * len(labels)),
+        yaxis=dict(autorange="reversed"),
+    )
+    return fig
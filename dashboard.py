@@ -1,12 +1,59 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.express as px
-import requests
-from datetime import datetime, time, timedelta
-from zoneinfo import ZoneInfo
-import json
+from datetime import date, datetime, timedelta
+import functools
+import re
+import threading
 from pathlib import Path
+from typing import Any, Callable
+
+from build_static import FONT_PATH
+from cards import mf_cards, page_count, position_cards, render_card_list
+from charts import (
+    build_overview_heatmap_frame,
+    build_sv_heatmap_frame,
+    correlation_heatmap,
+    overview_treemap,
+    sv_treemap,
+    value_history_chart,
+)
+from fx import FxMatrix, fx_matrix
+from history import ValueHistory, build_value_history
+from holdings import holdings_mf_codes, holdings_tickers, load_holdings, load_mf_holdings
+from ledger import current_books, current_transactions
+from market_data import (
+    NavQuote,
+    QuoteService,
+    fetch_fx_history,
+    fetch_mf_nav_quotes,
+    fetch_minute_closes,
+    fetch_prices_close,
+    fx_matrix_from,
+    index_strip_from,
+    last_prices_from,
+    quote_symbols,
+    sync_price_store,
+)
+from portfolio import aggregate_for_heatmap, build_positions_from_prices, reference_closes
+from returns import returns_table
+from risk import RISK_BENCHMARK, RISK_WINDOW, RiskSnapshot, get_risk_engine, risk_table
+from perf import REGISTRY, finish_trace, span, start_trace, timed
+from price_store import PriceStore
+from refresher import Aged, MarketDataRefresher, MarketSnapshot, RefreshSource, stale_while_revalidate
+from sessions import (
+    US_CLOSED,
+    US_LIVE,
+    US_POST_MARKET,
+    US_TZ,
+    closes_interval,
+    fx_interval,
+    indices_interval,
+    intraday_interval,
+    mf_nav_interval,
+    stream_interval,
+    us_phase,
+)
+from streaming import PRICE_STREAM, PollingFeed, PositionStream, PriceStream, ReplayFeed
 
 # ---------- PAGE CONFIG ----------
 st.set_page_config(
@@ -15,470 +62,177 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# ---------- THEME / CSS ----------
-st.markdown(
-    """
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&family=Material+Symbols+Rounded:opsz,wght,FILL,GRAD@20..24,400,1,0&display=swap');
-
-    :root {
-        --bg: #0f1a2b;
-        --card: #16233a;
-        --border: #1f2d44;
-        --text: #e6eaf0;
-        --muted: #9ba7b8;
-        --accent: #4aa3ff;
-        --accent-soft: #7fc3ff;
-        --danger: #f27d72;
-        --success: #6bcf8f; /* Vibrant Green for Heatmap */
-    }
-
-    html, body, [class*="css"] {
-        font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-        background: var(--bg);
-        color: var(--text);
-    }
+# ---------- PERF TRACE (one per rerun; panel via ?perf=1) ----------
+perf_trace = start_trace()
 
-    header {visibility: hidden;}
-
-    .block-container {
-        padding: 0.8rem 0.9rem 2rem;
-        max-width: 900px;
-    }
+# ---------- THEME / CSS ----------
+# static/dashboard.css, read once per process. Space Grotesk is self-hosted
+# under static/fonts (no Google Fonts @import on the critical path), and a
+# style-only st.html lands in the event container, so it takes no layout space.
+# Until build_static.py has produced the font file, the local @font-face is
+# swapped for the Google Fonts import so the theme keeps its typeface.
+THEME_CSS_PATH = Path(__file__).resolve().parent / "static" / "dashboard.css"
+REMOTE_FONT_CSS = "@import url('https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap');\n"
+_FONT_FACE = re.compile(r"@font-face\s*\{[^}]*\}\s*")
 
-    .card {
-        background: var(--card);
-        border: 1px solid var(--border);
-        border-radius: 6px;
-        padding: 6px 10px;
-        box-shadow: none;
-        margin-bottom: 8px;
-    }
 
-    /* --- KPI CARD STYLING --- */
-    .mf-card {
-        background: #f4f6f8 !important;
-        border-color: #e0e4ea !important;
-        color: #0f1a2b !important; /* Default Text Color */
-        display: flex;
-        flex-direction: column;
-        justify-content: space-between; 
-        height: 96px; 
-        padding: 12px 16px !important; 
-        box-sizing: border-box;
-    }
+@st.cache_resource
+def load_theme_css() -> str:
+    css = THEME_CSS_PATH.read_text(encoding="utf-8")
+    if not FONT_PATH.exists():
+        css = REMOTE_FONT_CSS + _FONT_FACE.sub("", css)
+    return f"<style>\n{css}</style>"
 
-    /* --- COLOR CLASSES FOR PROFIT/LOSS (Must override parent !important) --- */
-    .kpi-green {
-        color: #15803d !important; /* Dark Green for readability on light bg */
-    }
-    
-    .kpi-red {
-        color: #b91c1c !important; /* Dark Red */
-    }
-
-    /* --- COLOR CORRECTION FOR MUTUAL FUND TAB & WHITE CARDS --- */
-    .mf-card .page-title {
-        color: #020617 !important; 
-        font-weight: 600;
-    }
 
-    .mf-card .kpi-label {
-        color: #475569; 
-        font-weight: 500;
-    }
+st.html(load_theme_css())
 
-    .mf-card .kpi-value-main {
-        color: #0f1a2b; 
-        font-weight: 700;
-    }
-    
-    .mf-card .kpi-number {
-         color: #0f1a2b; 
-    }
+# Helper: format INR values as "₹10.1 L"
+def fmt_inr_lacs(inr_value: float) -> str:
+    if inr_value is None or inr_value != inr_value:  # NaN check
+        return "₹0.0 L"
+    lacs = inr_value / 100000.0
+    return f"₹{lacs:,.1f} L"
 
-    /* --------------------------------------------------------- */
-
-    /* UNIFIED LABEL STYLE: Top/Bottom Labels */
-    .kpi-label {
-        font-family: 'Space Grotesk', sans-serif;
-        font-size: 0.6rem; 
-        font-weight: 400; /* Normal weight */
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-        line-height: 1.0;
-        white-space: nowrap;
-        margin: 0;
-    }
+# ---------- HOLDINGS ----------
+# holdings/transactions.csv when present (units / cost replayed from the
+# ledger), else holdings/portfolio.csv and holdings/mf.csv. Files are re-read
+# only when they change.
 
-    /* UNIFIED NUMBER STYLE: Value & Percentage */
-    .kpi-number {
-        font-family: 'Space Grotesk', sans-serif;
-        font-size: 1.1rem; 
-        font-weight: 700;
-        letter-spacing: -0.02em;
-        line-height: 1.0;
-    }
-    
-    .kpi-value-main {
-        font-family: 'Space Grotesk', sans-serif;
-        font-size: 1.0rem;
-        font-weight: 700;
-        line-height: 1.1;
-    }
 
-    /* Container for the middle row of numbers */
-    .kpi-mid-row {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        width: 100%;
-        margin: 0; 
-    }
+def load_books() -> tuple[pd.DataFrame, pd.DataFrame, str | None]:
+    """(US holdings, MF holdings, ledger error). A broken ledger falls back to the holdings files."""
+    try:
+        us_books, mf_books = current_books()
+        return us_books, mf_books, None
+    except Exception as exc:
+        return load_holdings(), load_mf_holdings(), str(exc)
 
-    /* Helper for Top Row Split (Value Left, Return Right) */
-    .kpi-top-row {
-        display: flex;
-        justify-content: space-between;
-        width: 100%;
-        align-items: flex-end; /* Align bottom so text sits nicely */
-    }
 
-    .page-title {
-        font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-        font-size: 1.0rem;
-        font-weight: 600;
-        margin: 0 0 2px 0;
-        color: var(--text);
-        letter-spacing: 0.01em;
-    }
+with span("load_holdings"):
+    holdings, mf_holdings, ledger_error = load_books()
+    mf_config = mf_holdings.to_dict("records")
 
-    .page-subtitle {
-        font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-        font-size: 0.75rem;
-        color: var(--muted);
-        margin: 0;
-        letter-spacing: 0.03em;
-    }
+if ledger_error:
+    st.warning(f"Transaction ledger not applied, showing holdings files instead: {ledger_error}")
 
-    .stPlotlyChart {
-        background: transparent !important;
-    }
+# ---------- MARKET DATA (BACKGROUND REFRESH) ----------
+# A process-wide refresher fetches every source on its own interval in daemon
+# threads (intervals replace the old st.cache_data TTLs). Page runs only read
+# its latest immutable snapshot, so rendering never blocks on yfinance or AMFI.
 
-    .stTabs {
-        margin-top: 0.75rem;
-    }
+# Only the first page view of a fresh process waits (at most this long) for data
+COLD_START_WAIT_S = 20.0
 
-    .stTabs [data-baseweb="tab-list"] {
-        display: flex;
-        align-items: flex-end;
-        gap: 0rem;
-        width: 100%;
-        border-bottom: 1px solid var(--border);
-        background: transparent;
-    }
 
-    .stTabs [data-baseweb="tab"] {
-        position: relative;
-        flex: 1 1 25% !important;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        gap: 0.15rem;
-        font-family: 'Space Grotesk', sans-serif !important;
-        font-size: 0.7rem !important;
-        padding: 4px 0 3px 0 !important;
-        color: #16233a !important;
-        background: transparent !important;
-        border: none !important;
-        cursor: pointer;
-        white-space: nowrap;
-        box-sizing: border-box;
-    }
+@st.cache_resource
+def get_price_store() -> PriceStore:
+    return PriceStore()
 
-    @media (max-width: 768px) {
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 0;
-        }
-        .stTabs [data-baseweb="tab"] {
-            font-size: 0.6rem !important;
-            padding: 4px 0 3px 0 !important;
-        }
-    }
 
-    .stTabs [role="tab"] {
-        min-width: 0 !important;
-    }
+@st.cache_resource
+def get_market_refresher() -> MarketDataRefresher:
+    store = get_price_store()
 
-    .stTabs [data-baseweb="tab"]::before {
-        content: "";
-        position: absolute;
-        inset: 0;
-        border-radius: 0;
-        background: transparent;
-        border: none;
-        opacity: 0;
-    }
+    # Ticker / scheme lists are re-derived per fetch so holdings-file edits are picked up
+    def tickers() -> list[str]:
+        return holdings_tickers(load_books()[0])
 
-    .stTabs [aria-selected="true"] {
-        color: #0f172a !important;
-        font-weight: 500 !important;
-    }
+    def codes() -> list[str]:
+        return holdings_mf_codes(load_books()[1])
 
-    .stTabs [data-baseweb="tab"]::after {
-        content: "";
-        position: absolute;
-        left: 0;
-        right: 0;
-        bottom: -1px;
-        height: 2px;
-        border-radius: 999px;
-        background: transparent;
-        transition: background-color 140ms ease-out;
-    }
+    # Holdings, header indices and FX pairs share one bulk quote fetch per refresh
+    quotes = QuoteService(lambda: quote_symbols(tickers()))
 
-    .stTabs [aria-selected="true"]::after {
-        background: #0b1530; 
-    }
+    # Intervals follow the market sessions (sessions.py) and freeze while nothing
+    # can change. Last argument: hard max age in seconds, past which a page run
+    # refreshes synchronously.
+    refresher = MarketDataRefresher([
+        RefreshSource("prices_close", lambda: fetch_prices_close(store, tickers()), closes_interval, pd.DataFrame(), 6 * 3600),
+        RefreshSource("prices_intraday", lambda: last_prices_from(quotes.book(), tickers() + [RISK_BENCHMARK]), intraday_interval, pd.Series(dtype=float), 900),
+        RefreshSource("indices", lambda: index_strip_from(quotes.book()), indices_interval, "", 900),
+        RefreshSource("fx", lambda: fx_matrix_from(quotes.book(), refresher.snapshot()["fx"]), fx_interval, fx_matrix(None), 6 * 3600),
+        RefreshSource("mf_navs", lambda: fetch_mf_nav_quotes(store, codes()), mf_nav_interval, {}, 24 * 3600),
+    ])
+    return refresher.start()
 
-    .stTabs [data-baseweb="tab-highlight"] {
-        background-color: transparent !important;
-    }
 
-</style>
-""",
-    unsafe_allow_html=True,
-)
+with span("market_snapshot") as _snap_span:
+    market_refresher = get_market_refresher()
+    market_refresher.wait_ready(COLD_START_WAIT_S)
+    _snap_span.attrs["revalidated"] = ",".join(market_refresher.revalidate_expired())
+    market = market_refresher.snapshot()
+    _snap_span.attrs["version"] = market.version
 
-# ---------- CONSTANTS & FALLBACKS ----------
-DEFAULT_USD_AED = 3.6725
-DEFAULT_AED_INR = 24.50
-
-COLOR_PRIMARY = "#4aa3ff"
-COLOR_SUCCESS = "#6bcf8f"
-COLOR_DANGER = "#f27d72"
-COLOR_BG = "#0f1a2b"
-
-# ---------- PORTFOLIO CONFIG (UPDATED DEC 2025) ----------
-# Values calculated based on 'Fully Loaded Purchase Price' from screenshot * 3.6725
-portfolio_config = [
-    # --- MV PORTFOLIO ---
-    {"Name": "Alphabet", "Ticker": "GOOGL", "Units": 51, "PurchaseValAED": 34152, "Owner": "MV", "Sector": "Tech"},
-    {"Name": "Tesla", "Ticker": "TSLA", "Units": 30, "PurchaseValAED": 33138, "Owner": "MV", "Sector": "Auto"},
-    {"Name": "Apple", "Ticker": "AAPL", "Units": 50, "PurchaseValAED": 37208, "Owner": "MV", "Sector": "Tech"},
-    {"Name": "AMD", "Ticker": "AMD", "Units": 26, "PurchaseValAED": 15482, "Owner": "MV", "Sector": "Semi"},
-    {"Name": "Broadcom", "Ticker": "AVGO", "Units": 13, "PurchaseValAED": 13588, "Owner": "MV", "Sector": "Semi"},
-    {"Name": "Nasdaq 100", "Ticker": "QQQM", "Units": 180, "PurchaseValAED": 150997, "Owner": "MV", "Sector": "ETF"},
-    {"Name": "Amazon", "Ticker": "AMZN", "Units": 59, "PurchaseValAED": 47751, "Owner": "MV", "Sector": "Retail"},
-    {"Name": "Nvidia", "Ticker": "NVDA", "Units": 81, "PurchaseValAED": 51712, "Owner": "MV", "Sector": "Semi"},
-    {"Name": "Meta", "Ticker": "META", "Units": 30, "PurchaseValAED": 77787, "Owner": "MV", "Sector": "Tech"},
-    {"Name": "MSFT", "Ticker": "MSFT", "Units": 37, "PurchaseValAED": 69566, "Owner": "MV", "Sector": "Tech"},
-
-    # --- SV PORTFOLIO ---
-    {"Name": "Apple [SV]", "Ticker": "AAPL", "Units": 2, "PurchaseValAED": 1487, "Owner": "SV", "Sector": "Tech"},
-    {"Name": "Broadcom [SV]", "Ticker": "AVGO", "Units": 2, "PurchaseValAED": 2123, "Owner": "SV", "Sector": "Semi"},
-    {"Name": "Nasdaq [SV]", "Ticker": "QQQ", "Units": 1, "PurchaseValAED": 2096, "Owner": "SV", "Sector": "ETF"},
-    {"Name": "Amazon [SV]", "Ticker": "AMZN", "Units": 4, "PurchaseValAED": 3181, "Owner": "SV", "Sector": "Retail"},
-    {"Name": "Nasdaq 100 [SV]", "Ticker": "QQQM", "Units": 14, "PurchaseValAED": 12728, "Owner": "SV", "Sector": "ETF"},
-    {"Name": "Novo [SV]", "Ticker": "NVO", "Units": 4, "PurchaseValAED": 714, "Owner": "SV", "Sector": "Health"},
-    {"Name": "Nvidia [SV]", "Ticker": "NVDA", "Units": 6, "PurchaseValAED": 3832, "Owner": "SV", "Sector": "Semi"},
-    {"Name": "MSFT [SV]", "Ticker": "MSFT", "Units": 6, "PurchaseValAED": 11128, "Owner": "SV", "Sector": "Tech"},
-]
-
-# ---------- INDIA MF CONFIG (UPDATED - CORRECT REGULAR PLAN CODES) ----------
-# Replaced Direct Plan codes with Regular Plan codes (AMFI) to match portfolio
-# Data verified against user file (e.g. PPFAS NAV ~87.23)
-
-MF_CONFIG = [
-    {
-        "Scheme": "Axis Large and Mid Cap Fund Growth",
-        "Category": "Equity",
-        "Units": 55026.38,
-        "CostINR": 1754912.25,
-        "InitialValueINR": 1843383.56,
-        "AMFICode": "120465"  # Regular Growth (was 145110 Direct)
-    },
-    {
-        "Scheme": "Franklin India ELSS Tax Saver Fund Growth 19360019",
-        "Category": "Equity",
-        "Units": 286.62,
-        "CostINR": 160000.00,
-        "InitialValueINR": 429627.50,
-        "AMFICode": "100356"  # Regular Growth
-    },
-    {
-        "Scheme": "Franklin India ELSS Tax Saver Fund Growth 30097040",
-        "Category": "Equity",
-        "Units": 190.43,
-        "CostINR": 95000.00,
-        "InitialValueINR": 285444.01,
-        "AMFICode": "100356"  # Regular Growth
-    },
-    {
-        "Scheme": "ICICI Prudential ELSS Tax Saver Fund Growth",
-        "Category": "Equity",
-        "Units": 267.83,
-        "CostINR": 98000.00,
-        "InitialValueINR": 257648.07,
-        "AMFICode": "100354"  # Regular Growth (was 120592 Direct)
-    },
-    {
-        "Scheme": "ICICI Prudential NASDAQ 100 Index Fund Growth",
-        "Category": "Equity",
-        "Units": 43574.66,
-        "CostINR": 654967.25,
-        "InitialValueINR": 854577.46,
-        "AMFICode": "149218"  # Regular Growth (was 147816 Direct)
-    },
-    {
-        "Scheme": "Mirae Asset Large and Mid Cap Fund Growth",
-        "Category": "Equity",
-        "Units": 9054.85,
-        "CostINR": 1327433.63,
-        "InitialValueINR": 1424255.47,
-        "AMFICode": "112933"  # Regular Growth (was 118825 Direct)
-    },
-    {
-        "Scheme": "Nippon India Multi Cap Fund Growth",
-        "Category": "Equity",
-        "Units": 4813.52,
-        "CostINR": 1404929.75,
-        "InitialValueINR": 1448773.01,
-        "AMFICode": "100469"  # Regular Growth (was 118778 Direct)
-    },
-    {
-        "Scheme": "Parag Parikh Flexi Cap Fund Growth 15530560",
-        "Category": "Equity",
-        "Units": 25345.69,
-        "CostINR": 2082395.88,
-        "InitialValueINR": 2210977.69,
-        "AMFICode": "119598"  # Regular Growth (was 122639 Direct)
-    },
-    {
-        "Scheme": "Parag Parikh Flexi Cap Fund Growth 15722429",
-        "Category": "Equity",
-        "Units": 6095.12,
-        "CostINR": 499975.00,
-        "InitialValueINR": 531695.26,
-        "AMFICode": "119598"  # Regular Growth
-    },
-    {
-        "Scheme": "SBI Multicap Fund Growth",
-        "Category": "Equity",
-        "Units": 83983.45,
-        "CostINR": 1404929.75,
-        "InitialValueINR": 1424997.65,
-        "AMFICode": "148856"  # Regular Growth (was 153629 Direct)
-    }
-]
 
-# Helper: format INR values as "₹10.1 L"
-def fmt_inr_lacs(inr_value: float) -> str:
-    if inr_value is None or inr_value != inr_value:  # NaN check
-        return "₹0.0 L"
-    lacs = inr_value / 100000.0
-    return f"₹{lacs:,.1f} L"
+@timed()
+def load_mf_nav_quotes() -> dict:
+    """Latest + previous NAV per scheme name (AMFI Regular Plan codes), from the market snapshot."""
+    fetched_data = market["mf_navs"]
+    quotes: dict[str, NavQuote] = {}
 
-@st.cache_data(ttl=3600)
-def load_mf_navs_from_amfi() -> dict:
-    """
-    Fetch latest NAV for each MF using the Official AMFI API (mfapi.in).
-    Now using Regular Plan codes to ensure valuation matches portfolio.
-    """
-    navs: dict[str, float] = {}
-    
-    # Deduplicate codes to avoid calling API multiple times for same fund
-    unique_codes = set(entry["AMFICode"] for entry in MF_CONFIG if "AMFICode" in entry)
-    
-    fetched_data = {}
-    
-    for code in unique_codes:
-        try:
-            url = f"https://api.mfapi.in/mf/{code}"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if "data" in data and len(data["data"]) > 0:
-                    # AMFI returns string NAV, convert to float
-                    nav_value = float(data["data"][0]["nav"])
-                    fetched_data[code] = nav_value
-        except Exception:
-            pass
-            
     # Map back to Scheme Names
-    for entry in MF_CONFIG:
+    for entry in mf_config:
         scheme = entry["Scheme"]
         code = entry.get("AMFICode")
         if code in fetched_data:
-            navs[scheme] = fetched_data[code]
-            
-    return navs
-
-def compute_india_mf_aggregate() -> dict:
-    """Computes aggregate Indian MF metrics using AMFI data."""
-    total_value_inr = 0.0
-    total_daily_pl_inr = 0.0
-    
-    # We need NAVs to calculate value
-    mf_navs = load_mf_navs_from_amfi()
+            quotes[scheme] = fetched_data[code]
+
+    return quotes
+
 
-    for mf_entry in MF_CONFIG:
+@timed()
+def compute_mf_rows() -> list[dict]:
+    """Per-scheme value, day P&L and absolute return using AMFI data (file value when no NAV)."""
+    # We need NAVs to calculate value; previous NAVs come from the local NAV history
+    mf_quotes = load_mf_nav_quotes()
+    rows = []
+
+    for mf_entry in mf_config:
         scheme = mf_entry["Scheme"]
         units = float(mf_entry["Units"] or 0.0)
+        cost_inr = float(mf_entry["CostINR"] or 0.0)
         file_value_inr = float(mf_entry.get("InitialValueINR", 0.0))
-        
-        live_nav = mf_navs.get(scheme)
-        
+
+        quote = mf_quotes.get(scheme)
+        live_nav = quote.nav if quote is not None else None
+
         # 1. Calculate Current Value
         if live_nav is not None and live_nav > 0 and units > 0:
             value_inr = live_nav * units
+            # 2. Daily P&L: latest NAV vs previous published NAV
+            daily_pl = quote.day_change * units
         else:
             # Fallback to the value from the file if API fails
             value_inr = file_value_inr
-            
-        # 2. Daily P&L (Approximate)
-        # Since standard AMFI API doesn't give "Yesterday's NAV" easily in one call without history parsing,
-        # we will set daily P&L to 0.0 for now to keep it fast, or we could parse history.
-        # For this version, we focus on accurate TOTAL value.
-        daily_pl = 0.0 
+            daily_pl = 0.0
 
-        total_value_inr += value_inr
-        total_daily_pl_inr += daily_pl
+        # Absolute return
+        abs_return = (value_inr - cost_inr) / cost_inr * 100.0 if cost_inr > 0 else 0.0
 
-    return {"total_value_inr": total_value_inr, "daily_pl_inr": total_daily_pl_inr}
+        rows.append({
+            "scheme": scheme,
+            "value_inr": value_inr,
+            "daily_pl_inr": daily_pl,
+            "return_pct": abs_return,
+        })
 
-# ---------- FX HELPERS (API DRIVEN) ----------
+    return rows
 
-@st.cache_data(ttl=3600)
-def get_fx_rates() -> dict:
-    """
-    Fetches live FX rates for USD->AED and AED->INR.
-    Includes fallbacks if API fails.
-    """
-    rates = {
-        "USD_AED": DEFAULT_USD_AED,
-        "AED_INR": DEFAULT_AED_INR
+
+def compute_india_mf_aggregate(rows: list[dict]) -> dict:
+    """Computes aggregate Indian MF metrics from the per-scheme rows."""
+    return {
+        "total_value_inr": sum(r["value_inr"] for r in rows),
+        "daily_pl_inr": sum(r["daily_pl_inr"] for r in rows),
+        "daily_pl_by_scheme": {r["scheme"]: r["daily_pl_inr"] for r in rows},
     }
-    
-    # 1. USD -> AED
-    try:
-        # USDAED=X is the standard ticker for USD to AED
-        hist = yf.Ticker("USDAED=X").history(period="5d")
-        if not hist.empty:
-            rates["USD_AED"] = float(hist["Close"].iloc[-1])
-    except Exception:
-        pass
-        
-    # 2. AED -> INR
-    try:
-        # AEDINR=X is the standard ticker for AED to INR
-        hist = yf.Ticker("AEDINR=X").history(period="5d")
-        if not hist.empty:
-            rates["AED_INR"] = float(hist["Close"].iloc[-1])
-    except Exception:
-        pass
-        
-    return rates
+
+# ---------- FX HELPERS (API DRIVEN) ----------
+
+@timed()
+def get_fx_rates() -> FxMatrix:
+    """FX matrix (any pair, see fx.py) from the market snapshot (default rates until first fetch)."""
+    return market["fx"]
 
 
 def fmt_inr_lacs_from_aed(aed_value: float, aed_to_inr: float) -> str:
@@ -488,90 +242,65 @@ def fmt_inr_lacs_from_aed(aed_value: float, aed_to_inr: float) -> str:
 
 # ---------- PRICE FETCHING (REGULAR CLOSE) ----------
 
-@st.cache_data(ttl=300)
+@timed()
 def load_prices_close() -> pd.DataFrame:
-    tickers = sorted({item["Ticker"] for item in portfolio_config})
-    # Fetch 5 days to ensure we have previous close data even on weekends
-    data = yf.download(
-        tickers=tickers,
-        period="5d",
-        interval="1d",
-        auto_adjust=True,
-        group_by="ticker",
-        progress=False,
-        threads=False,
-    )
-    if data is None or data.empty:
-        return pd.DataFrame()
-    if isinstance(data.columns, pd.MultiIndex):
-        lvl1 = data.columns.get_level_values(1)
-        if "Adj Close" in lvl1:
-            close = data.xs("Adj Close", level=1, axis=1)
-        elif "Close" in lvl1:
-            close = data.xs("Close", level=1, axis=1)
-        else:
-            close = data.xs(lvl1[0], level=1, axis=1)
-        close.columns = close.columns.get_level_values(0)
-    else:
-        if "Adj Close" in data.columns:
-            close = data[["Adj Close"]]
-        elif "Close" in data.columns:
-            close = data[["Close"]]
-        else:
-            return pd.DataFrame()
-        close.columns = [tickers[0]]
-    close = close.dropna(how="all")
-    return close
+    """Recent daily closes; the refresher keeps the on-disk store in sync."""
+    return market["prices_close"]
+
+
+@stale_while_revalidate(fresh_for=300, max_age=3600)
+def load_close_history(tickers: tuple[str, ...], start: date | None = None) -> pd.DataFrame:
+    """Full daily close history from the local store, as Aged(frame, fetched_at).
+
+    Tickers the store has never seen (ledger lines sold before the refresher
+    ran) are backfilled once; everything else is a local read.
+    """
+    store = get_price_store()
+    missing = sorted(set(tickers) - set(store.last_dates(list(tickers))))
+    if missing:
+        sync_price_store(store, missing)
+    return store.read_closes(list(tickers), start=start)
+
+
+@stale_while_revalidate(fresh_for=300, max_age=3600)
+def load_nav_history(codes: tuple[str, ...], start: date | None = None) -> pd.DataFrame:
+    """Daily NAV history from the local store (codes it lacks are seeded once), as Aged."""
+    store = get_price_store()
+    heads = store.nav_heads(list(codes))
+    missing = [code for code in codes if code not in heads]
+    if missing:
+        fetch_mf_nav_quotes(store, missing)
+    return store.read_navs(list(codes), start=start)
+
+
+@stale_while_revalidate(fresh_for=3600, max_age=6 * 3600)
+def load_fx_history(start: date | None = None) -> FxMatrix:
+    """Dated FX matrix from the FX pairs' daily closes, synced into the local store, as Aged."""
+    return fetch_fx_history(get_price_store(), start)
+
+
+@stale_while_revalidate(fresh_for=3600, max_age=6 * 3600)
+def load_benchmark_history(start: date | None = None) -> pd.DataFrame:
+    """Daily RISK_BENCHMARK closes, synced into the local store (one small request), as Aged."""
+    store = get_price_store()
+    sync_price_store(store, [RISK_BENCHMARK])
+    return store.read_closes([RISK_BENCHMARK], start=start)
 
 # ---------- PRICE FETCHING (INTRADAY) ----------
 
-@st.cache_data(ttl=60)
+@timed()
 def load_prices_intraday() -> pd.Series:
-    """Get last intraday price per ticker using 1m data with pre/post market enabled."""
-    tickers = sorted({item["Ticker"] for item in portfolio_config})
-    last_prices: dict[str, float] = {}
+    """Last intraday price per ticker (1m bars, pre/post included), from the market snapshot."""
+    return market["prices_intraday"]
 
-    us_tz = ZoneInfo("America/New_York")
-    
-    # We don't filter by "Today" anymore, we just take the absolute latest tick available
-    # This ensures we see Post-Market data even if it is technically "tomorrow" or weekend
-    for t in tickers:
-        try:
-            tkr = yf.Ticker(t)
-            # Fetch 5 days to be safe on weekends
-            hist = tkr.history(period="5d", interval="1m", prepost=True)
-            if hist is None or hist.empty:
-                continue
-            
-            # The last row is the latest trade (Pre, Live, or Post)
-            last_prices[t] = float(hist["Close"].iloc[-1])
-        except Exception:
-            continue
-
-    if not last_prices:
-        return pd.Series(dtype=float)
-    return pd.Series(last_prices)
-    # ---------- MARKET STATUS & DATA SOURCE ----------
+# ---------- MARKET STATUS & DATA SOURCE ----------
 
 def get_market_phase_and_prices():
-    us_tz = ZoneInfo("America/New_York")
-    now_us = datetime.now(us_tz)
-    weekday = now_us.weekday()
-    t = now_us.time()
-    
     # Define Strings based on Time - NO SQUARE BRACKETS
-    if weekday >= 5:
-        # Weekend -> "Post Market" (Last State)
-        phase_str = "Post Market"
-    else:
-        # Weekday Logic
-        if time(4,0) <= t < time(9,30):
-            phase_str = "Pre-Market"
-        elif time(9,30) <= t < time(16,0):
-            phase_str = "Live Market"
-        else:
-            # Evenings/Nights -> "Post Market"
-            phase_str = "Post Market"
+    phase_str = us_phase()
+    if phase_str == US_CLOSED:
+        # Nights and weekends -> "Post Market" (Last State)
+        phase_str = US_POST_MARKET
 
     base_close = load_prices_close()
     intraday = load_prices_intraday()
@@ -582,280 +311,452 @@ def get_market_phase_and_prices():
 
     return phase_str, intraday
 
-@st.cache_data(ttl=60)
-def get_market_indices_change(phase_str: str) -> str:
+@timed()
+def get_market_indices_change() -> str:
+    """Nifty 50 / Nasdaq 100 header strip, from the market snapshot."""
+    return market["indices"]
+
+
+# Quotes older than this are flagged in the header (refresher behind or upstream down)
+STALE_QUOTES_AFTER_S = 300.0
+
+
+def fmt_age(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def quotes_freshness_note(quotes: Aged) -> str:
+    """Header suffix for stale quotes; empty while they are fresh."""
+    age = quotes.age
+    if age is None or age <= STALE_QUOTES_AFTER_S:
+        return ""
+    return f"<span style='opacity:0.6;'>quotes {fmt_age(age)} old</span>"
+
+
+# ---------- DATA PIPELINE ----------
+# Everything derived from live prices comes from one market snapshot. The full
+# run computes it once; the live fragments below recompute it on their own
+# timers, and only when the refresher has published a newer snapshot.
+
+@timed()
+def compute_live_data(snapshot: MarketSnapshot) -> dict:
+    global market
+    market = snapshot
+
+    market_status_str, price_source = get_market_phase_and_prices()
+    prices_close = load_prices_close()
+    header_metrics_str = get_market_indices_change()
+    # Frozen quotes (market closed) are final, not stale
+    freshness_note = "" if market_refresher.frozen("prices_intraday") else quotes_freshness_note(market.aged("prices_intraday"))
+    if freshness_note:
+        sep = " <span style='opacity:0.4; margin:0 6px;'>|</span> " if header_metrics_str else ""
+        header_metrics_str = f"{header_metrics_str}{sep}{freshness_note}"
+
+    # FETCH API FX RATES
+    fx = get_fx_rates()
+    usd_to_aed = fx.rate("USD", "AED")
+    aed_to_inr = fx.rate("AED", "INR")
+
+    if isinstance(price_source, pd.DataFrame):
+        positions = build_positions_from_prices(price_source, None, usd_to_aed, holdings)
+    else:
+        positions = build_positions_from_prices(prices_close, price_source, usd_to_aed, holdings)
+
+    return {
+        "version": snapshot.version,
+        "market_status_str": market_status_str,
+        "header_metrics_str": header_metrics_str,
+        "fx": fx,
+        "USD_TO_AED": usd_to_aed,
+        "AED_TO_INR": aed_to_inr,
+        "prices_close": prices_close,
+        "positions": positions,
+    }
+
+
+live = compute_live_data(market)
+_live_version = market.version
+
+
+def latest_live_data() -> dict:
+    """Live data for the newest snapshot; recomputed only when its version changed."""
+    global live, _live_version
+    market_refresher.revalidate_expired()
+    snapshot = market_refresher.snapshot()
+    if snapshot.version != _live_version:
+        live = compute_live_data(snapshot)
+        _live_version = snapshot.version
+    return live
+
+
+# ---------- DERIVED DATASETS ----------
+# Tab datasets (heatmap roll-up, MF rows, SV subset, sorted card lists) are
+# built on first use, once per data version, and shared by every session and
+# fragment. Tabs only build what they render, so a closed tab costs nothing.
+
+# Data versions kept at once (sessions can briefly sit on different snapshots)
+DERIVED_KEEP_VERSIONS = 4
+
+
+@st.cache_resource
+def get_derived_store() -> dict:
+    return {"lock": threading.Lock(), "versions": {}}
+
+
+class IdentityKey:
+    """Hashable handle compared by identity (`is`), not by id() alone.
+
+    The handle keeps its object alive, so while a key holding it is stored
+    the id cannot be recycled by a newly loaded frame.
     """
-    Fetches Nifty 50 and Nasdaq 100 changes.
-    FIXED: Uses ^NDX (Index) as primary, QQQ as fallback. 
-    Improved logic to prevent '0.0%' errors during pre/post market.
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, IdentityKey) and other.obj is self.obj
+
+
+def books_key(live: dict) -> tuple:
+    """Key for data built from this snapshot and the holdings frames in use.
+
+    The holdings and ledger caches hand back the same frame objects until
+    their files change, so a reload gives a new key.
     """
-    
-    # --- 1. NIFTY 50 ---
-    nifty_str = "Nifty 0.0%"
-    try:
-        nifty = yf.Ticker("^NSEI")
-        hist = nifty.history(period="2d")
-        if len(hist) >= 2:
-            close_now = hist["Close"].iloc[-1]
-            prev_close = hist["Close"].iloc[-2]
-            pct = (close_now / prev_close - 1) * 100
-            nifty_str = f"Nifty {pct:+.1f}%"
-        elif len(hist) == 1:
-            # If only 1 day data (e.g. holiday glitch), try 5d
-            hist_5d = nifty.history(period="5d")
-            if len(hist_5d) >= 2:
-                close_now = hist_5d["Close"].iloc[-1]
-                prev_close = hist_5d["Close"].iloc[-2]
-                pct = (close_now / prev_close - 1) * 100
-                nifty_str = f"Nifty {pct:+.1f}%"
-    except:
-        pass
-
-    # --- 2. NASDAQ 100 (Robust Fix) ---
-    nasdaq_str = "Nasdaq 0.0%"
-    
-    def calculate_change(ticker_symbol):
-        """Helper to try getting change from a specific ticker"""
-        tkr = yf.Ticker(ticker_symbol)
-        # Get intraday data to capture Pre/Post market moves
-        hist_1m = tkr.history(period="1d", interval="1m", prepost=True)
-        # Get daily data for baseline
-        daily = tkr.history(period="5d")
-        
-        if daily.empty:
-            return None
+    return live["version"], IdentityKey(holdings), IdentityKey(mf_holdings)
 
-        # Determine 'Current' Price
-        if not hist_1m.empty:
-            current_price = hist_1m["Close"].iloc[-1]
-        else:
-            current_price = daily["Close"].iloc[-1]
 
-        # Determine 'Previous' Close (Baseline)
-        # If we are in Live/Pre market, baseline is Yesterday's Close
-        # If we are in Post market, baseline is Today's Close (usually)
-        # To be safe, we always compare against the most recent COMPLETED trading day.
-        
-        if len(daily) >= 2:
-            # Check if the last row is 'today' (incomplete) or 'yesterday'
-            last_date = daily.index[-1].date()
-            now_date = datetime.now(ZoneInfo("America/New_York")).date()
-            
-            if last_date == now_date:
-                # Last row is today. Prev close is row -2.
-                prev_close = daily["Close"].iloc[-2]
-            else:
-                # Last row is yesterday (or Friday). That is the current close? No, that's the baseline.
-                # If we have live data (hist_1m), we compare against last_date close.
-                prev_close = daily["Close"].iloc[-1]
+def derived(live: dict, name: str, build: Callable[[], Any]) -> Any:
+    """build() for this data version, computed once; treat the result as read-only."""
+    store = get_derived_store()
+    key = books_key(live)
+    with store["lock"]:
+        values = store["versions"].get(key)
+        if values is not None and name in values:
+            return values[name]
+    with span(f"derive:{name}"):
+        value = build()
+    with store["lock"]:
+        versions = store["versions"]
+        versions.setdefault(key, {})[name] = value
+        for stale in list(versions)[:-DERIVED_KEEP_VERSIONS]:
+            del versions[stale]
+    return value
+
+
+def heatmap_rollup(live: dict) -> pd.DataFrame:
+    positions = live["positions"]
+    return derived(live, "heatmap_rollup", lambda: aggregate_for_heatmap(positions) if not positions.empty else positions)
+
+
+def mf_rows(live: dict) -> list[dict]:
+    return derived(live, "mf_rows", compute_mf_rows)
+
+
+def sv_positions_of(live: dict) -> pd.DataFrame:
+    positions = live["positions"]
+    return derived(live, "sv_positions", lambda: positions[positions["Owner"] == "SV"].copy())
+
+
+def position_card_list(live: dict, name: str, frame: pd.DataFrame, owner_label: str | None = None) -> list[dict]:
+    """Card fields for a position list, by total profit high to low."""
+    return derived(live, name, lambda: position_cards(
+        frame.sort_values(by="TotalPLAED", ascending=False).to_dict("records"), owner_label
+    ))
+
+
+# Window loaded for the History tab (the chart's range buttons zoom within it)
+HISTORY_YEARS = 5
+
+
+def value_history(live: dict) -> ValueHistory:
+    """Daily INR value per holding line over the last HISTORY_YEARS (see history.py)."""
+    def build() -> ValueHistory:
+        start = (pd.Timestamp.today() - pd.DateOffset(years=HISTORY_YEARS)).date()
+        transactions = None if ledger_error else current_transactions()
+        if transactions is not None:
+            kinds = transactions["Kind"].astype(str)
+            tickers = transactions.loc[kinds == "US", "Symbol"]
+            codes = transactions.loc[kinds == "MF", "Symbol"]
         else:
+            tickers, codes = holdings["Ticker"], mf_holdings["AMFICode"]
+        closes = load_close_history(tuple(sorted(set(tickers.astype(str)))), start).value
+        navs = load_nav_history(tuple(sorted(set(codes.astype(str)))), start).value
+        # Dated rates, with today's spot on top
+        fx = load_fx_history(start).value.merged(live["fx"])
+        return build_value_history(holdings, mf_holdings, closes, navs, fx, start, transactions)
+    return derived(live, "value_history", build)
+
+
+def xirr_returns(live: dict) -> pd.DataFrame | None:
+    """Money-weighted returns per holding, owner and portfolio (see returns.py); None without a ledger."""
+    def build() -> pd.DataFrame | None:
+        transactions = None if ledger_error else current_transactions()
+        if transactions is None or transactions.empty:
             return None
+        positions = live["positions"]
+        priced = positions[positions["PriceUSD"] > 0]
+        # Book-currency price per unit: AED for US tickers, INR for AMFI codes
+        prices = dict(zip(priced["Ticker"].astype(str), priced["PriceUSD"] * live["USD_TO_AED"]))
+        prices.update({code: quote.nav for code, quote in market["mf_navs"].items() if quote.nav > 0})
+        # Each cash flow converts at its own date's rate
+        fx = load_fx_history(transactions["Date"].min().date()).value.merged(live["fx"])
+        return returns_table(transactions, prices, fx, date.today())
+    return derived(live, "xirr_returns", build)
+
+
+# Calendar days of closes loaded for the Risk tab (covers the drawdown window)
+RISK_HISTORY_DAYS = 400
+
+
+def risk_view(live: dict) -> tuple[RiskSnapshot, pd.DataFrame]:
+    """(snapshot, table) from the shared risk engine: new daily bars only, live prices on top."""
+    def build() -> tuple[RiskSnapshot, pd.DataFrame]:
+        positions = live["positions"]
+        tickers = tuple(sorted(set(positions["Ticker"].astype(str))))
+        start = date.today() - timedelta(days=RISK_HISTORY_DAYS)
+        closes = pd.concat(
+            [load_close_history(tickers, start).value, load_benchmark_history(start).value], axis=1
+        ).reindex(columns=[*tickers, RISK_BENCHMARK])
+        tick = None
+        if us_phase() == US_LIVE:
+            # Today's stored bar is still forming: the live price stands in for it
+            closes = closes[closes.index < pd.Timestamp(datetime.now(US_TZ).date())]
+            tick = load_prices_intraday()
+        snapshot = get_risk_engine().snapshot(closes, tick)
+        return snapshot, risk_table(snapshot, positions.groupby("Ticker")["ValueAED"].sum())
+    return derived(live, "risk", build)
+
+
+def render_cards(live: dict, name: str, cards: list[dict], kind: str) -> None:
+    """A card list as one HTML emit per page, with a pager once it outgrows a page."""
+    pages = page_count(len(cards))
+    page = 1
+    if pages > 1:
+        key = f"{name}_page"
+        if st.session_state.get(key, 1) > pages:
+            st.session_state[key] = pages
+        page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key))
+    html = derived(live, f"{name}_html_{page}", lambda: render_card_list(cards, kind, page))
+    st.markdown(html, unsafe_allow_html=True)
+
+
+# ---------- STREAMING PRICES (PRICE_STREAM=poll|replay) ----------
+# Opt-in. A feed thread pushes ticks into a quote table (streaming.py). Each US
+# KPI card is then its own fragment on STREAM_RENDER_S: it reprices only the
+# positions that ticked and re-sends just that card (a fragment rerun has to
+# re-send everything it owns, so the card is the unit). Position cards,
+# treemaps and the other tabs stay on the snapshot and the live timer.
+
+STREAM_RENDER_S = 2
+
+
+@st.cache_resource
+def get_price_stream() -> PriceStream | None:
+    def tickers() -> list[str]:
+        return holdings_tickers(load_books()[0])
+
+    if PRICE_STREAM == "poll":
+        feed = PollingFeed(tickers, stream_interval)
+    elif PRICE_STREAM == "replay":
+        feed = ReplayFeed(lambda: fetch_minute_closes(tickers()))
+    else:
+        return None
+    return PriceStream(feed).start()
 
-        if prev_close == 0:
-            return None
-            
-        return (current_price / prev_close - 1) * 100
 
-    # Try Primary: ^NDX (Official Index)
-    pct_change = calculate_change("^NDX")
-    
-    # Try Secondary: QQQ (ETF) if Primary failed or returned flat 0.0 (suspicious)
-    if pct_change is None or (abs(pct_change) < 0.001):
-        pct_change_qqq = calculate_change("QQQ")
-        if pct_change_qqq is not None:
-            pct_change = pct_change_qqq
+price_stream = get_price_stream()
 
-    if pct_change is not None:
-        nasdaq_str = f"Nasdaq {pct_change:+.1f}%"
 
-    return f"{nifty_str} <span style='opacity:0.4; margin:0 6px;'>|</span> {nasdaq_str}"
+def streaming_live() -> bool:
+    return price_stream is not None and price_stream.live
 
 
-# ---------- PORTFOLIO BUILDERS ----------
+def kpi_totals(live: dict, frame: pd.DataFrame, owner: str | None = None) -> dict[str, float]:
+    """AED value / purchase / day_pl / total_pl of frame's positions, streamed prices on top when live."""
+    if streaming_live():
+        def build() -> PositionStream:
+            positions = live["positions"]
+            _, prev_close = reference_closes(live["prices_close"], positions["Ticker"])
+            return PositionStream(positions, prev_close, live["USD_TO_AED"])
+        return price_stream.totals(books_key(live), build, (owner,))[owner]
+    return {
+        "value": frame["ValueAED"].sum(),
+        "purchase": frame["PurchaseAED"].sum(),
+        "day_pl": frame["DayPLAED"].sum(),
+        "total_pl": frame["TotalPLAED"].sum(),
+    }
 
-def build_positions_from_prices(prices_close: pd.DataFrame, prices_intraday: pd.Series | None, usd_to_aed_rate: float) -> pd.DataFrame:
-    rows = []
-    
-    # We need a robust "Previous Close" to calculate change against.
-    
-    for item in portfolio_config:
-        t = item["Ticker"]
-        units = float(item["Units"])
-        purchase = float(item["PurchaseValAED"])
-
-        # 1. Get Live Price
-        live_price = 0.0
-        if prices_intraday is not None:
-            live_price = float(prices_intraday.get(t, 0.0))
-        
-        # Fallback to close if no intraday
-        if live_price == 0 and not prices_close.empty:
-             live_price = float(prices_close.iloc[-1].get(t, 0.0))
-
-        # 2. Get Previous Close (Reference for P&L)
-        prev_close_price = 0.0
-        if not prices_close.empty:
-            last_date = prices_close.index[-1].date()
-            us_tz = ZoneInfo("America/New_York")
-            today_date = datetime.now(us_tz).date()
-            
-            col_data = prices_close[t]
-            if len(col_data) >= 2:
-                if last_date == today_date:
-                    prev_close_price = float(col_data.iloc[-2])
-                else:
-                    prev_close_price = float(col_data.iloc[-1])
-            elif len(col_data) == 1:
-                prev_close_price = float(col_data.iloc[-1])
-
-        if live_price <= 0:
-            value_aed = purchase
-            day_pct = 0.0
-            day_pl_aed = 0.0
-            total_pl_aed = 0.0
-            total_pct = 0.0
-            price_usd = 0.0
-        else:
-            price_usd = live_price
-            price_aed = price_usd * usd_to_aed_rate
-            value_aed = price_aed * units
 
-            # Day P&L vs Previous Close
-            if prev_close_price > 0:
-                day_pct = (price_usd / prev_close_price - 1.0) * 100.0
-            else:
-                day_pct = 0.0
-                
-            day_pl_aed = value_aed * (day_pct / 100.0)
+def kpi_card_html(top_label: str, main_value: str, right_value: str, bottom_label: str) -> str:
+    # HTML content must be flush left to avoid code block rendering
+    return f"""
+<div class="card mf-card">
+<div class="kpi-label">{top_label}</div>
+<div class="kpi-mid-row">
+<div class="kpi-number">{main_value}</div>
+<div class="kpi-number">{right_value}</div>
+</div>
+<div class="kpi-label">{bottom_label}</div>
+</div>
+"""
 
-            total_pl_aed = value_aed - purchase
-            total_pct = (total_pl_aed / purchase) * 100.0 if purchase > 0 else 0.0
 
-        rows.append(
-            {
-                "Name": item["Name"],
-                "Ticker": t,
-                "Owner": item["Owner"],
-                "Sector": item["Sector"],
-                "Units": units,
-                "PriceUSD": price_usd,
-                "ValueAED": value_aed,
-                "PurchaseAED": purchase,
-                "DayPct": day_pct,
-                "DayPLAED": day_pl_aed,
-                "TotalPct": total_pct,
-                "TotalPLAED": total_pl_aed,
-            }
-        )
-
-    df = pd.DataFrame(rows)
-    total_val = df["ValueAED"].sum()
-    df["WeightPct"] = df["ValueAED"] / total_val * 100.0 if total_val > 0 else 0.0
-    return df
-
-def aggregate_for_heatmap(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return df
-    mv = df[df["Owner"] == "MV"].copy()
-    sv = df[df["Owner"] == "SV"].copy()
-    if sv.empty:
-        return mv.reset_index(drop=True)
-
-    total_val_all = df["ValueAED"].sum()
-    sv_val = sv["ValueAED"].sum()
-    sv_purchase = sv["PurchaseAED"].sum()
-    sv_day_pl = sv["DayPLAED"].sum()
-    sv_total_pl = sv["TotalPLAED"].sum()
-
-    sv_row = pd.DataFrame(
-        [
-            {
-                "Name": "SV Portfolio",
-                "Ticker": "SVPF",
-                "Owner": "SV",
-                "Sector": "Mixed",
-                "Units": sv["Units"].sum(),
-                "PriceUSD": 0.0,
-                "ValueAED": sv_val,
-                "PurchaseAED": sv_purchase,
-                "DayPct": (sv_day_pl / sv_val * 100.0) if sv_val > 0 else 0.0,
-                "DayPLAED": sv_day_pl,
-                "TotalPct": (sv_total_pl / sv_purchase * 100.0) if sv_purchase > 0 else 0.0,
-                "TotalPLAED": sv_total_pl,
-                "WeightPct": (sv_val / total_val_all * 100.0) if total_val_all > 0 else 0.0,
-            }
-        ]
-    )
+def us_kpi_cards(live: dict, totals: dict[str, float]) -> dict[str, str]:
+    """Overview's US Stocks cards: today's profit and total holding."""
+    aed_to_inr = live["AED_TO_INR"]
+    day_pl_aed, total_val_aed = totals["day_pl"], totals["value"]
+    us_prev_val_aed = total_val_aed - day_pl_aed
+    us_day_pct = (day_pl_aed / us_prev_val_aed * 100.0) if us_prev_val_aed > 0 else 0.0
+    total_pl_pct = (totals["total_pl"] / totals["purchase"] * 100.0) if totals["purchase"] > 0 else 0.0
+    status = live["market_status_str"].upper()
+    status_display = f"TODAY'S PROFIT <span style='opacity:0.5; margin:0 4px;'>|</span> {status}"
+    return {
+        "us_day": kpi_card_html(status_display, f"₹{day_pl_aed * aed_to_inr:,.0f}", f"{us_day_pct:+.2f}%", "US STOCKS"),
+        "us_total": kpi_card_html(
+            "TOTAL HOLDING", fmt_inr_lacs_from_aed(total_val_aed, aed_to_inr), f"{total_pl_pct:+.2f}%", "US STOCKS"
+        ),
+    }
+
+
+def sv_kpi_card_html(top_label: str, main_value: str, right_value: str) -> str:
+    return f"""
+        <div class="card mf-card">
+            <div class="kpi-label">{top_label}</div>
+            <div class="kpi-mid-row">
+                <div class="kpi-number">{main_value}</div>
+                <div class="kpi-number">{right_value}</div>
+            </div>
+            <div class="kpi-label">US STOCKS</div>
+        </div>
+        """
+
+
+def sv_kpi_cards(live: dict, totals: dict[str, float]) -> dict[str, str]:
+    """SV tab's cards: today's profit, total profit and total holding."""
+    sv_total_val_aed, sv_total_purchase_aed = totals["value"], totals["purchase"]
+    sv_total_pl_aed, sv_day_pl_aed = totals["total_pl"], totals["day_pl"]
+
+    sv_total_pl_pct = (sv_total_pl_aed / sv_total_purchase_aed * 100.0) if sv_total_purchase_aed > 0 else 0.0
+    prev_total_val = sv_total_val_aed - sv_day_pl_aed
+    sv_day_pl_pct = (sv_day_pl_aed / prev_total_val * 100.0) if prev_total_val > 0 else 0.0
+    return {
+        "sv_day": sv_kpi_card_html("TODAY'S PROFIT", f"AED {sv_day_pl_aed:,.0f}", f"{sv_day_pl_pct:+.2f}%"),
+        "sv_total_pl": sv_kpi_card_html("TOTAL PROFIT", f"AED {sv_total_pl_aed:,.0f}", f"{sv_total_pl_pct:+.2f}%"),
+        "sv_value": sv_kpi_card_html(
+            "TOTAL HOLDING", f"AED {sv_total_val_aed:,.0f}", fmt_inr_lacs_from_aed(sv_total_val_aed, live["AED_TO_INR"])
+        ),
+    }
 
-    mv = mv.copy()
-    mv["WeightPct"] = mv["ValueAED"] / total_val_all * 100.0 if total_val_all > 0 else 0.0
 
-    combined = pd.concat([mv, sv_row], ignore_index=True)
-    return combined
-    # ---------- DATA PIPELINE ----------
+def overview_us_cards(live: dict) -> dict[str, str]:
+    return us_kpi_cards(live, kpi_totals(live, live["positions"]))
 
-market_status_str, price_source = get_market_phase_and_prices()
-prices_close = load_prices_close()
-header_metrics_str = get_market_indices_change(market_status_str)
 
-# FETCH API FX RATES
-fx_rates = get_fx_rates()
-USD_TO_AED = fx_rates["USD_AED"]
-AED_TO_INR = fx_rates["AED_INR"]
+def sv_cards(live: dict) -> dict[str, str]:
+    return sv_kpi_cards(live, kpi_totals(live, sv_positions_of(live), "SV"))
 
-if isinstance(price_source, pd.DataFrame):
-    positions = build_positions_from_prices(price_source, None, USD_TO_AED)
-else:
-    positions = build_positions_from_prices(prices_close, price_source, USD_TO_AED)
 
-agg_for_heatmap = aggregate_for_heatmap(positions) if not positions.empty else positions
+# ---------- LIVE FRAGMENTS ----------
+# The header strip, the Overview KPI grid + treemap and the SV KPI cards +
+# treemap rerun on their own timer (st.fragment), so a price tick re-sends
+# only those regions instead of the whole page, CSS and every position card.
+# Timers slow down while US quotes are frozen.
 
-total_val_aed = positions["ValueAED"].sum()
-total_purchase_aed = positions["PurchaseAED"].sum()
-total_pl_aed = positions["TotalPLAED"].sum()
-day_pl_aed = positions["DayPLAED"].sum()
+LIVE_REFRESH_S = 60
+FROZEN_REFRESH_S = 300
 
-total_pl_pct = (total_pl_aed / total_purchase_aed * 100.0) if total_purchase_aed > 0 else 0.0
+live_refresh_s = FROZEN_REFRESH_S if market_refresher.frozen("prices_intraday") else LIVE_REFRESH_S
+# True for the rest of this full run; fragment-only reruns see False
+in_full_run = True
+# True while a fragment-only rerun has its trace open (nested fragments add spans to it)
+in_fragment_run = False
 
-total_val_inr_lacs = fmt_inr_lacs_from_aed(total_val_aed, AED_TO_INR)
-total_pl_inr_lacs = fmt_inr_lacs_from_aed(total_pl_aed, AED_TO_INR)
-day_pl_inr_lacs = fmt_inr_lacs_from_aed(day_pl_aed, AED_TO_INR)
 
-overall_pct_str = f"{total_pl_pct:+.2f}%"
+def live_fragment(name: str, every: float | None = None):
+    """st.fragment on the live timer (or every `every` s), traced as its own rerun when it runs alone."""
+    def deco(fn):
+        @st.fragment(run_every=every or live_refresh_s)
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global in_fragment_run
+            if in_full_run or in_fragment_run:
+                with span(f"fragment:{name}"):
+                    return fn(*args, **kwargs)
+            trace = start_trace(f"fragment:{name}")
+            in_fragment_run = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                in_fragment_run = False
+                finish_trace(trace)
+        return wrapper
+    return deco
+
+
+@live_fragment("stream:kpi", every=STREAM_RENDER_S)
+def render_stream_card(cards: Callable[[dict], dict[str, str]], key: str):
+    st.markdown(cards(latest_live_data())[key], unsafe_allow_html=True)
+
+
+def render_kpi_card(cards: Callable[[dict], dict[str, str]], key: str) -> None:
+    """One KPI card; while prices stream it is its own fragment, re-sent on the stream timer alone."""
+    if streaming_live():
+        render_stream_card(cards, key)
+    else:
+        st.markdown(cards(latest_live_data())[key], unsafe_allow_html=True)
 
 # ---------- HEADER ----------
 
-st.markdown(
-    f"""
+@live_fragment("header")
+def render_header():
+    st.markdown(
+        f"""
 <div class="card">
   <div class="page-title">Stocks Dashboard</div>
-  <div class="page-subtitle">{header_metrics_str}</div>
+  <div class="page-subtitle">{latest_live_data()["header_metrics_str"]}</div>
 </div>
 """,
-    unsafe_allow_html=True,
-)
+        unsafe_allow_html=True,
+    )
+
+
+render_header()
 
 # ---------- TABS ----------
 
-overview_tab, sv_tab, us_tab, mf_tab = st.tabs([
+# Lazy: switching tabs reruns the script and only the open tab's content runs
+overview_tab, sv_tab, us_tab, mf_tab, history_tab, risk_tab = st.tabs([
     "🪙 Overview",
     "💷 SV Stocks",
     "💵 US Stocks",
     "💴 India MF",
-])
+    "📈 History",
+    "🧭 Risk",
+], key="tab", on_change="rerun")
 
 # ---------- HOME TAB ----------
 
-with overview_tab:
+@live_fragment("overview")
+def render_overview_live():
+    live = latest_live_data()
+    AED_TO_INR = live["AED_TO_INR"]
+    agg_for_heatmap = heatmap_rollup(live)
+
     # --- 1. PREPARE DATA FOR CARDS ---
 
-    # A. US Stocks
-    us_day_pl_inr = day_pl_aed * AED_TO_INR
-    us_prev_val_aed = total_val_aed - day_pl_aed
-    us_day_pct = (day_pl_aed / us_prev_val_aed * 100.0) if us_prev_val_aed > 0 else 0.0
+    # A. US Stocks: us_kpi_cards, via render_kpi_card (streamed prices on top when live)
 
     # B. India Mutual Funds
-    mf_agg = compute_india_mf_aggregate()
+    mf_agg = compute_india_mf_aggregate(mf_rows(live))
     mf_val_inr = float(mf_agg.get("total_value_inr", 0.0) or 0.0)
     mf_day_pl_inr = float(mf_agg.get("daily_pl_inr", 0.0) or 0.0)
     
@@ -864,7 +765,7 @@ with overview_tab:
     mf_day_pct = (mf_day_pl_inr / mf_prev_val * 100.0) if mf_prev_val > 0 else 0.0
 
     # MF ABSOLUTE RETURN %
-    mf_total_cost = sum(item["CostINR"] for item in MF_CONFIG)
+    mf_total_cost = sum(item["CostINR"] for item in mf_config)
     mf_total_profit = mf_val_inr - mf_total_cost
     mf_abs_return_pct = (mf_total_profit / mf_total_cost * 100.0) if mf_total_cost > 0 else 0.0
 
@@ -872,58 +773,31 @@ with overview_tab:
     
     c1, c2, c3, c4 = st.columns(4)
 
-    def render_new_kpi_card(col, top_label, main_value, right_value, bottom_label):
-        with col:
-            # HTML content must be flush left to avoid code block rendering
-            html_content = f"""
-<div class="card mf-card">
-<div class="kpi-label">{top_label}</div>
-<div class="kpi-mid-row">
-<div class="kpi-number">{main_value}</div>
-<div class="kpi-number">{right_value}</div>
-</div>
-<div class="kpi-label">{bottom_label}</div>
-</div>
-"""
-            st.markdown(html_content, unsafe_allow_html=True)
-
     # Card 1: Today's Profit | Market Status -> US Stocks
-    status_display = f"TODAY'S PROFIT <span style='opacity:0.5; margin:0 4px;'>|</span> {market_status_str.upper()}"
-    
-    render_new_kpi_card(
-        c1, 
-        status_display, 
-        f"₹{us_day_pl_inr:,.0f}", 
-        f"{us_day_pct:+.2f}%",
-        "US STOCKS"
-    )
+    with c1:
+        render_kpi_card(overview_us_cards, "us_day")
 
     # Card 2: Today's Profit -> India MF
-    render_new_kpi_card(
-        c2, 
-        "TODAY'S PROFIT", 
-        f"₹{mf_day_pl_inr:,.0f}", 
-        f"{mf_day_pct:+.2f}%",
-        "INDIA MF"
-    )
+    with c2:
+        st.markdown(kpi_card_html(
+            "TODAY'S PROFIT", 
+            f"₹{mf_day_pl_inr:,.0f}", 
+            f"{mf_day_pct:+.2f}%",
+            "INDIA MF"
+        ), unsafe_allow_html=True)
 
     # Card 3: Total Holding -> US Stocks
-    render_new_kpi_card(
-        c3, 
-        "TOTAL HOLDING", 
-        total_val_inr_lacs,
-        f"{total_pl_pct:+.2f}%",  # Added + sign
-        "US STOCKS"
-    )
+    with c3:
+        render_kpi_card(overview_us_cards, "us_total")
 
     # Card 4: Total Holding -> India MF
-    render_new_kpi_card(
-        c4, 
-        "TOTAL HOLDING", 
-        fmt_inr_lacs(mf_val_inr), 
-        f"{mf_abs_return_pct:+.2f}%", # Added + sign
-        "INDIA MF"
-    )
+    with c4:
+        st.markdown(kpi_card_html(
+            "TOTAL HOLDING", 
+            fmt_inr_lacs(mf_val_inr), 
+            f"{mf_abs_return_pct:+.2f}%", # Added + sign
+            "INDIA MF"
+        ), unsafe_allow_html=True)
 
     # --- 3. RENDER HEATMAP ---
 
@@ -935,367 +809,102 @@ with overview_tab:
     if agg_for_heatmap is None or agg_for_heatmap.empty:
         st.info("No live price data. Showing static valuation only; heat map disabled.")
     else:
-        hm = agg_for_heatmap.copy()
-        hm["DayPLINR"] = hm["DayPLAED"] * AED_TO_INR
-
-        if mf_val_inr > 0 or mf_day_pl_inr != 0.0:
-            ind_mf_row = {
-                "Name": "Indian MF",
-                "Ticker": "INDMF",
-                "Owner": "MF",
-                "Sector": "India MF",
-                "Units": 0.0,
-                "PriceUSD": 0.0,
-                "ValueAED": mf_val_inr / AED_TO_INR if mf_val_inr > 0 else 0.0,
-                "PurchaseAED": 0.0,
-                "DayPct": 0.0,
-                "DayPLAED": mf_day_pl_inr / AED_TO_INR,
-                "DayPLINR": mf_day_pl_inr, 
-                "TotalPct": 0.0,
-                "TotalPLAED": 0.0,
-                "WeightPct": 0.0,
-            }
-            hm = pd.concat([hm, pd.DataFrame([ind_mf_row])], ignore_index=True)
+        hm = build_overview_heatmap_frame(agg_for_heatmap, AED_TO_INR, mf_val_inr, mf_day_pl_inr, mf_day_pct)
+        fig = overview_treemap(hm)
 
-        hm["SizeForHeatmap"] = hm["DayPLINR"].abs() + 1e-6
-        hm["DayPLK"] = hm["DayPLINR"] / 1000.0
+        with span("plotly_chart:overview"):
+            st.plotly_chart(fig, width="stretch", config={"displayModeBar": False})
 
-        def label_for_k(v: float) -> str:
-            if v >= 0:
-                return f"₹{abs(v):,.0f}k"
-            else:
-                return f"[₹{abs(v):,.0f}k]"
-
-        hm["DayPLKLabel"] = hm["DayPLK"].apply(label_for_k)
-
-        fig = px.treemap(
-            hm,
-            path=["Name"],
-            values="SizeForHeatmap",
-            color="DayPLINR",
-            color_continuous_scale=[COLOR_DANGER, "#16233a", COLOR_SUCCESS],
-            color_continuous_midpoint=0,
-            custom_data=["DayPLINR", "Ticker", "DayPLKLabel"],
-        )
-
-        fig.update_traces(
-            hovertemplate="<b>%{label}</b><br>Ticker: %{customdata[1]}<br>Day P&L: ₹%{customdata[0]:,.0f}<extra></extra>",
-            texttemplate="%{label}<br>%{customdata[2]}",
-            textfont=dict(family="Space Grotesk, sans-serif", color="#e6eaf0", size=11),
-            marker=dict(line=dict(width=0)),
-            root_color=COLOR_BG,
-        )
-
-        fig.update_layout(
-            margin=dict(t=0, l=0, r=0, b=0),
-            paper_bgcolor=COLOR_BG,
-            plot_bgcolor=COLOR_BG,
-            coloraxis_showscale=False,
-            font=dict(family="Space Grotesk, sans-serif"),
-        )
-
-        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+
+if overview_tab.open:
+    with overview_tab, span("tab:overview"):
+        render_overview_live()
 
 # ---------- SV TAB (Sae Vyas portfolio detail) ----------
 
-with sv_tab:
+@live_fragment("sv")
+def render_sv_live():
+    live = latest_live_data()
+    sv_positions = sv_positions_of(live)
 
-    sv_positions = positions[positions["Owner"] == "SV"].copy()
+    # Layout: 3 columns for 3 cards (RESTORED)
+    c1, c2, c3 = st.columns(3)
 
-    if sv_positions.empty:
-        st.info("No SV positions found.")
-    else:
-        sv_total_val_aed = sv_positions["ValueAED"].sum()
-        sv_total_purchase_aed = sv_positions["PurchaseAED"].sum()
-        sv_total_pl_aed = sv_positions["TotalPLAED"].sum()
-        sv_day_pl_aed = sv_positions["DayPLAED"].sum()
-
-        sv_total_pl_pct = (sv_total_pl_aed / sv_total_purchase_aed * 100.0) if sv_total_purchase_aed > 0 else 0.0
-        prev_total_val = sv_total_val_aed - sv_day_pl_aed
-        sv_day_pl_pct = (sv_day_pl_aed / prev_total_val * 100.0) if prev_total_val > 0 else 0.0
-
-        sv_day_pl_aed_str = f"AED {sv_day_pl_aed:,.0f}"
-        sv_day_pl_pct_str = f"{sv_day_pl_pct:+.2f}%"
-        sv_total_pl_aed_str = f"AED {sv_total_pl_aed:,.0f}"
-        sv_total_pl_pct_str = f"{sv_total_pl_pct:+.2f}%"
-        sv_total_val_aed_str = f"AED {sv_total_val_aed:,.0f}"
-        sv_total_val_inr_lacs_str = fmt_inr_lacs_from_aed(sv_total_val_aed, AED_TO_INR)
-
-        # Layout: 3 columns for 3 cards (RESTORED)
-        c1, c2, c3 = st.columns(3)
-
-        # Card 1: Today's Profit
-        with c1:
-            st.markdown(f"""
-            <div class="card mf-card">
-                <div class="kpi-label">TODAY'S PROFIT</div>
-                <div class="kpi-mid-row">
-                    <div class="kpi-number">{sv_day_pl_aed_str}</div>
-                    <div class="kpi-number">{sv_day_pl_pct_str}</div>
-                </div>
-                <div class="kpi-label">US STOCKS</div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        # Card 2: Total Profit
-        with c2:
-            st.markdown(f"""
-            <div class="card mf-card">
-                <div class="kpi-label">TOTAL PROFIT</div>
-                <div class="kpi-mid-row">
-                    <div class="kpi-number">{sv_total_pl_aed_str}</div>
-                    <div class="kpi-number">{sv_total_pl_pct_str}</div>
-                </div>
-                <div class="kpi-label">US STOCKS</div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        # Card 3: Total Holding Value
-        with c3:
-            st.markdown(f"""
-            <div class="card mf-card">
-                <div class="kpi-label">TOTAL HOLDING</div>
-                <div class="kpi-mid-row">
-                    <div class="kpi-number">{sv_total_val_aed_str}</div>
-                    <div class="kpi-number">{sv_total_val_inr_lacs_str}</div>
-                </div>
-                <div class="kpi-label">US STOCKS</div>
-            </div>
-            """, unsafe_allow_html=True)
+    # Card 1: Today's Profit
+    with c1:
+        render_kpi_card(sv_cards, "sv_day")
 
-        st.markdown(
-            """<div style="font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; color:#16233a; font-size:0.75rem; margin:4px 0;">Today's Gains – SV</div>""",
-            unsafe_allow_html=True,
-        )
+    # Card 2: Total Profit
+    with c2:
+        render_kpi_card(sv_cards, "sv_total_pl")
 
-        hm_sv = sv_positions.copy()
-        hm_sv["Name"] = hm_sv["Name"].str.replace(r"\s*\[SV\]", "", regex=True)
-        hm_sv["SizeForHeatmap"] = hm_sv["DayPLAED"].abs() + 1e-6
+    # Card 3: Total Holding Value
+    with c3:
+        render_kpi_card(sv_cards, "sv_value")
 
-        def label_for_sv(v: float) -> str:
-            if v >= 0:
-                return f"AED {v:,.0f}"
-            else:
-                return f"[AED {abs(v):,.0f}]"
-
-        hm_sv["DayPLLabel"] = hm_sv["DayPLAED"].apply(label_for_sv)
-
-        fig_sv = px.treemap(
-            hm_sv,
-            path=["Name"],
-            values="SizeForHeatmap",
-            color="DayPLAED",
-            color_continuous_scale=[COLOR_DANGER, "#16233a", COLOR_SUCCESS],
-            color_continuous_midpoint=0,
-            custom_data=["DayPLAED", "Ticker", "DayPLLabel"],
-        )
-
-        fig_sv.update_traces(
-            hovertemplate="<b>%{label}</b><br>Ticker: %{customdata[1]}<br>Day P&L: AED %{customdata[0]:,.0f}<extra></extra>",
-            texttemplate="%{label}<br>%{customdata[2]}",
-            textfont=dict(family="Space Grotesk, sans-serif", color="#e6eaf0", size=11),
-            marker=dict(line=dict(width=0)),
-            root_color=COLOR_BG,
-        )
-
-        fig_sv.update_layout(
-            margin=dict(t=0, l=0, r=0, b=0),
-            paper_bgcolor=COLOR_BG,
-            plot_bgcolor=COLOR_BG,
-            coloraxis_showscale=False,
-            font=dict(family="Space Grotesk, sans-serif"),
-        )
-
-        st.plotly_chart(fig_sv, use_container_width=True, config={"displayModeBar": False})
-        
-        # --- NEW SECTION: SV HOLDINGS CARDS (FIXED LOOP) ---
-        st.markdown(
-            """<div style="font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; color:#16233a; font-size:0.75rem; margin:14px 0 4px 0;">SV Holdings</div>""",
-            unsafe_allow_html=True,
-        )
-        
-        # Sort by Total Profit High to Low
-        sorted_sv = sv_positions.sort_values(by="TotalPLAED", ascending=False).to_dict('records')
-        
-        # Base Label Style
-        base_label_style = "font-family:'Space Grotesk',sans-serif; font-size:0.6rem; font-weight:400; text-transform:uppercase; margin:0;"
-        
-        for row in sorted_sv:
-            name = row["Name"]
-            ticker = row["Ticker"]
-            units = row["Units"]
-            val_aed = row["ValueAED"]
-            pl_aed = row["TotalPLAED"]
-            pl_pct = row["TotalPct"]
-            
-            # Explicit SV Label
-            units_str = f"{units:,.0f} UNITS • SV"
-            
-            val_aed_str = f"AED {val_aed:,.0f}"
-            pl_aed_str = f"{'+ ' if pl_aed >= 0 else ''}AED {pl_aed:,.0f}"
-            pl_pct_str = f"{pl_pct:+.2f}%"
-            
-            # Determine Color Class
-            color_class = "kpi-green" if pl_aed >= 0 else "kpi-red"
-            
-            # Clean Name
-            display_name = name.upper().replace(" [SV]", "")
-
-            # Render HTML Card with Explicit Class Logic
-            html_card = f"""
-<div class="card mf-card">
-<div class="kpi-top-row">
-<div class="kpi-label">{units_str}</div>
-<div class="{color_class}" style="{base_label_style} font-weight:600;">{pl_aed_str}</div>
-</div>
-<div class="kpi-mid-row">
-<div class="kpi-number">{display_name}</div>
-<div class="kpi-number">{val_aed_str}</div>
-</div>
-<div class="kpi-top-row">
-<div class="kpi-label" style="color:#9ba7b8 !important;">{ticker}</div>
-<div class="{color_class}" style="{base_label_style} font-weight:600;">{pl_pct_str}</div>
-</div>
-</div>
-"""
-            st.markdown(html_card, unsafe_allow_html=True)
+    st.markdown(
+        """<div style="font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; color:#16233a; font-size:0.75rem; margin:4px 0;">Today's Gains – SV</div>""",
+        unsafe_allow_html=True,
+    )
 
-# ---------- US STOCKS TAB (NEW) ----------
+    hm_sv = build_sv_heatmap_frame(sv_positions)
+    fig_sv = sv_treemap(hm_sv)
 
-with us_tab:
-    if positions.empty:
-        st.info("No US positions found.")
-    else:
-        # 3. INDIVIDUAL STOCK CARDS (REDESIGNED)
-        # Sorted by Total Profit AED Descending
-        sorted_pos = positions.sort_values(by="TotalPLAED", ascending=False).to_dict('records')
-        
-        # Base Label Style to allow color override (avoids the class .kpi-label color conflict)
-        base_label_style = "font-family:'Space Grotesk',sans-serif; font-size:0.6rem; font-weight:400; text-transform:uppercase; margin:0;"
-        
-        for row in sorted_pos:
-            name = row["Name"]
-            ticker = row["Ticker"]
-            units = row["Units"]
-            val_aed = row["ValueAED"]
-            pl_aed = row["TotalPLAED"]
-            pl_pct = row["TotalPct"]
-            owner = row["Owner"]
-            
-            # Label Update for SV
-            suffix = " • SV" if owner == "SV" else ""
-            units_str = f"{units:,.0f} UNITS{suffix}"
-            
-            val_aed_str = f"AED {val_aed:,.0f}"
-            pl_aed_str = f"{'+ ' if pl_aed >= 0 else ''}AED {pl_aed:,.0f}"
-            pl_pct_str = f"{pl_pct:+.2f}%"
-            
-            # Determine Color Class
-            color_class = "kpi-green" if pl_aed >= 0 else "kpi-red"
-            
-            # Clean Name
-            display_name = name.upper().replace(" [SV]", "")
-
-            # NEW CARD LAYOUT with Explicit Class Logic
-            html_card = f"""
-<div class="card mf-card">
-<div class="kpi-top-row">
-<div class="kpi-label">{units_str}</div>
-<div class="{color_class}" style="{base_label_style} font-weight:600;">{pl_aed_str}</div>
-</div>
-<div class="kpi-mid-row">
-<div class="kpi-number">{display_name}</div>
-<div class="kpi-number">{val_aed_str}</div>
-</div>
-<div class="kpi-top-row">
-<div class="kpi-label" style="color:#9ba7b8 !important;">{ticker}</div>
-<div class="{color_class}" style="{base_label_style} font-weight:600;">{pl_pct_str}</div>
-</div>
-</div>
-"""
-            st.markdown(html_card, unsafe_allow_html=True)
+    with span("plotly_chart:sv"):
+        st.plotly_chart(fig_sv, width="stretch", config={"displayModeBar": False})
 
-# ---------- INDIA MF TAB ----------
 
+if sv_tab.open:
+    with sv_tab, span("tab:sv"):
 
-with mf_tab:
-    if not MF_CONFIG:
-        st.info("No mutual fund data configured.")
-    else:
-        # Load NAVs from AMFI (Official API)
-        mf_navs = load_mf_navs_from_amfi()
-        mf_rows = []
-        for mf_entry in MF_CONFIG:
-            scheme = mf_entry["Scheme"]
-            units = float(mf_entry["Units"] or 0.0)
-            cost_inr = float(mf_entry["CostINR"] or 0.0)
-            file_value_inr = float(mf_entry.get("InitialValueINR", 0.0))
-
-            live_nav = mf_navs.get(scheme)
-
-            # Safety check logic REMOVED - Trust Live Data if available
-            value_inr = file_value_inr
-            if live_nav is not None and live_nav > 0 and units > 0:
-                candidate_value = live_nav * units
-                value_inr = candidate_value
-            
-            # Absolute return
-            if cost_inr > 0:
-                abs_return = (value_inr - cost_inr) / cost_inr * 100.0
-            else:
-                abs_return = 0.0
-
-            mf_rows.append(
-                {
-                    "scheme": scheme,
-                    "value_inr": value_inr,
-                    "return_pct": abs_return,
-                }
-            )
+        sv_positions = sv_positions_of(live)
 
-        mf_rows.sort(key=lambda r: r["value_inr"], reverse=True)
-        total_value_inr = sum(r["value_inr"] for r in mf_rows)
-        mf_total_cost = sum(item["CostINR"] for item in MF_CONFIG)
-        
-        if mf_total_cost > 0:
-            total_abs_return_pct = (total_value_inr - mf_total_cost) / mf_total_cost * 100.0
+        if sv_positions.empty:
+            st.info("No SV positions found.")
         else:
-            total_abs_return_pct = 0.0
+            render_sv_live()
+
+            # --- NEW SECTION: SV HOLDINGS CARDS (FIXED LOOP) ---
+            st.markdown(
+                """<div style="font-family: 'Space Grotesk', system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; color:#16233a; font-size:0.75rem; margin:14px 0 4px 0;">SV Holdings</div>""",
+                unsafe_allow_html=True,
+            )
+        
+            # Sort by Total Profit High to Low
+            render_cards(live, "sv_cards", position_card_list(live, "sv_cards", sv_positions, owner_label="SV"), "position")
 
-        total_value_str = fmt_inr_lacs(total_value_inr)
-        total_return_str = f"{total_abs_return_pct:.2f}%"
+# ---------- US STOCKS TAB (NEW) ----------
 
-        st.markdown(
-            f"""
-            <div class="card mf-card">
-                <div class="kpi-top-row">
-                    <div class="kpi-label">VALUE</div>
-                    <div class="kpi-label">RETURN</div>
-                </div>
-                <div class="kpi-mid-row">
-                    <div class="kpi-number">{total_value_str}</div>
-                    <div class="kpi-number">{total_return_str}</div>
-                </div>
-                <div class="kpi-label">PORTFOLIO AGGREGATE</div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+if us_tab.open:
+    with us_tab, span("tab:us"):
+        positions = live["positions"]
+        if positions.empty:
+            st.info("No US positions found.")
+        else:
+            # 3. INDIVIDUAL STOCK CARDS (REDESIGNED)
+            # Sorted by Total Profit AED Descending
+            render_cards(live, "us_cards", position_card_list(live, "us_cards", positions), "position")
 
-        for row in mf_rows:
-            scheme = row["scheme"]
-            value_inr = row["value_inr"]
-            ret_pct = row["return_pct"]
+# ---------- INDIA MF TAB ----------
 
-            display_name = scheme
-            parts = display_name.split()
-            if parts and all(ch.isdigit() or ch in "/-" for ch in parts[-1]):
-                display_name = " ".join(parts[:-1])
-            if "Fund Growth" in display_name:
-                display_name = display_name.replace(" Fund Growth", "")
 
-            value_str = fmt_inr_lacs(value_inr)
-            ret_str = f"{ret_pct:.1f}%"
+if mf_tab.open:
+    with mf_tab, span("tab:mf"):
+        if not mf_config:
+            st.info("No mutual fund data configured.")
+        else:
+            # Shared with the Overview MF cards; sorted copy, the rows are read-only
+            scheme_rows = sorted(mf_rows(live), key=lambda r: r["value_inr"], reverse=True)
+            total_value_inr = sum(r["value_inr"] for r in scheme_rows)
+            mf_total_cost = sum(item["CostINR"] for item in mf_config)
+        
+            if mf_total_cost > 0:
+                total_abs_return_pct = (total_value_inr - mf_total_cost) / mf_total_cost * 100.0
+            else:
+                total_abs_return_pct = 0.0
+
+            total_value_str = fmt_inr_lacs(total_value_inr)
+            total_return_str = f"{total_abs_return_pct:.2f}%"
 
             st.markdown(
                 f"""
@@ -1305,11 +914,118 @@ with mf_tab:
                         <div class="kpi-label">RETURN</div>
                     </div>
                     <div class="kpi-mid-row">
-                        <div class="kpi-number">{value_str}</div>
-                        <div class="kpi-number">{ret_str}</div>
+                        <div class="kpi-number">{total_value_str}</div>
+                        <div class="kpi-number">{total_return_str}</div>
                     </div>
-                    <div class="kpi-label">{display_name}</div>
+                    <div class="kpi-label">PORTFOLIO AGGREGATE</div>
                 </div>
                 """,
                 unsafe_allow_html=True,
             )
+
+            cards = derived(live, "mf_cards", lambda: mf_cards(scheme_rows, fmt_inr_lacs))
+            render_cards(live, "mf_cards", cards, "mf")
+
+# ---------- HISTORY TAB ----------
+
+HISTORY_BREAKDOWNS = {"Total": None, "US vs MF": "Kind", "Owner": "Owner", "Sector": "Sector"}
+
+if history_tab.open:
+    with history_tab, span("tab:history"):
+        history = value_history(live)
+        if history.empty:
+            st.info("No price history stored yet.")
+        else:
+            breakdown = st.radio(
+                "Breakdown", list(HISTORY_BREAKDOWNS), horizontal=True, key="history_breakdown",
+                label_visibility="collapsed",
+            )
+            column = HISTORY_BREAKDOWNS[breakdown]
+            series = derived(
+                live, f"history_by:{breakdown}",
+                lambda: history.total().to_frame() if column is None else history.by(column),
+            )
+            fig = value_history_chart(series)
+            with span("plotly_chart:history"):
+                st.plotly_chart(fig, width="stretch", config={"displayModeBar": False})
+            if ledger_error or current_transactions() is None:
+                st.caption("No transaction ledger: today's holdings are valued at each day's prices and FX.")
+
+        returns = xirr_returns(live)
+        if returns is None:
+            st.caption("XIRR needs dated cash flows: add holdings/transactions.csv to see money-weighted returns.")
+        else:
+            st.dataframe(
+                returns,
+                hide_index=True,
+                width="stretch",
+                column_config={
+                    "InvestedINR": st.column_config.NumberColumn("Invested ₹", format="localized"),
+                    "ReceivedINR": st.column_config.NumberColumn("Received ₹", format="localized"),
+                    "ValueINR": st.column_config.NumberColumn("Value ₹", format="localized"),
+                    "XIRRPct": st.column_config.NumberColumn("XIRR %", format="%.2f"),
+                    "ReturnPct": st.column_config.NumberColumn("Return %", format="%.2f"),
+                },
+            )
+
+# ---------- RISK TAB ----------
+
+if risk_tab.open:
+    with risk_tab, span("tab:risk"):
+        snapshot, table = risk_view(live)
+        if snapshot.as_of is None:
+            st.info("No price history stored yet.")
+        else:
+            st.dataframe(
+                table,
+                hide_index=True,
+                width="stretch",
+                column_config={
+                    "WeightPct": st.column_config.NumberColumn("Weight %", format="%.1f"),
+                    "VolPct": st.column_config.NumberColumn("Vol % (ann.)", format="%.1f"),
+                    "Beta": st.column_config.NumberColumn(f"Beta {RISK_BENCHMARK}", format="%.2f"),
+                    "CorrBenchmark": st.column_config.NumberColumn(f"Corr {RISK_BENCHMARK}", format="%.2f"),
+                    "DrawdownPct": st.column_config.NumberColumn("Drawdown %", format="%.1f"),
+                    "MaxDrawdownPct": st.column_config.NumberColumn("Max DD % (1y)", format="%.1f"),
+                },
+            )
+            holdings_corr = snapshot.corr.drop(index=RISK_BENCHMARK, columns=RISK_BENCHMARK, errors="ignore")
+            fig = correlation_heatmap(holdings_corr)
+            with span("plotly_chart:risk"):
+                st.plotly_chart(fig, width="stretch", config={"displayModeBar": False})
+            live_note = " plus today's live prices" if snapshot.provisional else ""
+            st.caption(
+                f"Volatility, beta and correlation over the last {RISK_WINDOW} daily returns to "
+                f"{snapshot.as_of:%d %b %Y}{live_note}; drawdown from the 1-year high."
+            )
+
+# ---------- DIAGNOSTICS PANEL (?perf=1) ----------
+
+in_full_run = False
+finish_trace(perf_trace)
+
+if st.query_params.get("perf") == "1":
+    with st.expander(f"Performance – rerun {perf_trace.duration_ms:,.1f} ms", expanded=True):
+        span_rows = [
+            {
+                "Span": "\u2003" * depth + s.name,
+                "ms": round(s.duration_ms, 2),
+                "Cache": s.attrs.get("cache", ""),
+            }
+            for depth, s in perf_trace.tree()
+        ]
+        st.dataframe(pd.DataFrame(span_rows), hide_index=True, width="stretch")
+
+        source_rows = [
+            {
+                "Source": name,
+                "Age s": round(market.age(name), 1) if market.age(name) is not None else None,
+                "Last fetch ms": round(market.fetch_ms[name], 1) if name in market.fetch_ms else None,
+            }
+            for name in market.values
+        ]
+        st.dataframe(pd.DataFrame(source_rows), hide_index=True, width="stretch")
+
+        c1, c2 = st.columns(2)
+        c1.download_button("Spans (JSON lines)", perf_trace.to_jsonl(), "spans.jsonl", "application/x-ndjson")
+        c2.download_button("Metrics (Prometheus)", REGISTRY.to_prometheus(), "dashboard.prom", "text/plain")
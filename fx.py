@@ -0,0 +1,139 @@
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# ---------- FX MATRIX ----------
+# Every rate the dashboard uses comes from one date x currency matrix holding
+# the USD value of one unit of each currency on each date. Any pair is then a
+# ratio of two columns: rate(a -> b) = usd[a] / usd[b], so crosses that are not
+# quoted (USD -> INR, GBP -> AED, ...) are triangulated through USD.
+#
+# The quoted pairs below are plain Yahoo symbols. They ride along with the
+# holdings in the bulk quote fetch (spot) and in the close store's batched
+# sync (history), so adding a currency adds a column, not a round-trip.
+# Conversions index the matrix with whole arrays of currencies and dates.
+
+CURRENCIES = ("USD", "AED", "INR", "GBP", "EUR")
+FX_PIVOT = "USD"
+# Yahoo symbol -> (base, quote); its close is units of quote per unit of base
+FX_PAIRS = {
+    "USDAED=X": ("USD", "AED"),
+    "AEDINR=X": ("AED", "INR"),
+    "GBPUSD=X": ("GBP", "USD"),
+    "EURUSD=X": ("EUR", "USD"),
+}
+# Served for a pair until it has been fetched at least once; after that a
+# pair missing from a fetch keeps the previous matrix's spot (see fx_matrix)
+FX_DEFAULTS = {"USDAED=X": 3.6725, "AEDINR=X": 24.50, "GBPUSD=X": 1.27, "EURUSD=X": 1.08}
+
+
+def _solve_order(pairs: dict[str, tuple[str, str]], pivot: str) -> list[tuple[str, str, str, bool]]:
+    """(symbol, known, unknown, known_is_base) steps that price every currency from the pivot."""
+    known, steps, queue = {pivot}, [], deque([pivot])
+    while queue:
+        currency = queue.popleft()
+        for symbol, (base, quote) in pairs.items():
+            if currency in (base, quote):
+                other = quote if currency == base else base
+                if other not in known:
+                    known.add(other)
+                    steps.append((symbol, currency, other, currency == base))
+                    queue.append(other)
+    unreachable = set(CURRENCIES) - known
+    if unreachable:
+        raise ValueError(f"no FX pair path from {pivot} to {', '.join(sorted(unreachable))}")
+    return steps
+
+
+_SOLVE_STEPS = _solve_order(FX_PAIRS, FX_PIVOT)
+_CURRENCY_INDEX = pd.Index(CURRENCIES)
+
+
+@dataclass(frozen=True)
+class FxMatrix:
+    """USD per unit of each currency (columns CURRENCIES) on each date; the last row is spot."""
+    dates: pd.DatetimeIndex
+    usd: np.ndarray
+    quoted: frozenset = field(default_factory=frozenset)    # pairs backed by data, not FX_DEFAULTS
+
+    @property
+    def empty(self) -> bool:
+        """No pair came back (the refresher keeps its last good matrix)."""
+        return not self.quoted
+
+    def _columns(self, currency) -> np.ndarray:
+        codes = _CURRENCY_INDEX.get_indexer(np.atleast_1d(np.asarray(currency, dtype=object)))
+        if (codes < 0).any():
+            raise KeyError(f"unknown currency in {currency!r}")
+        return codes
+
+    def _rows(self, on) -> np.ndarray | int:
+        """Row in force on each date (the latest on or before it; the first row for earlier dates)."""
+        if on is None:
+            return len(self.dates) - 1
+        stamps = pd.DatetimeIndex(np.atleast_1d(np.asarray(on, dtype="datetime64[ns]")))
+        rows = self.dates.searchsorted(stamps, side="right") - 1
+        return np.clip(rows, 0, len(self.dates) - 1)
+
+    def rates(self, src, dst, on=None) -> np.ndarray:
+        """Units of dst per unit of src. src / dst may be arrays (per row); on is None (spot) or dates."""
+        rows = self._rows(on)
+        src_col, dst_col = self._columns(src), self._columns(dst)
+        return self.usd[rows, src_col] / self.usd[rows, dst_col]
+
+    def rate(self, src: str, dst: str, on=None) -> float:
+        return float(self.rates(src, dst, on)[0])
+
+    def convert(self, amounts, src, dst, on=None) -> np.ndarray:
+        """amounts (array or Series) in src -> dst, at spot or at each row's date."""
+        return np.asarray(amounts, dtype=float) * self.rates(src, dst, on)
+
+    def series(self, src: str, dst: str, index: pd.DatetimeIndex) -> pd.Series:
+        """dst per src on every date of index."""
+        return pd.Series(self.rates(src, dst, index), index=index, name=f"{src}_{dst}")
+
+    def cross(self, on=None) -> pd.DataFrame:
+        """Every pair at once: row currency -> column currency."""
+        row = self.usd[self._rows(on)]
+        return pd.DataFrame(row[:, None] / row[None, :], index=CURRENCIES, columns=CURRENCIES)
+
+    def pair_rates(self, on=None) -> dict[str, float]:
+        """Close per FX_PAIRS symbol (quote per base), at spot or on a date."""
+        return {symbol: self.rate(base, quote, on) for symbol, (base, quote) in FX_PAIRS.items()}
+
+    def merged(self, newer: "FxMatrix") -> "FxMatrix":
+        """self with newer's rows appended (newer wins on shared dates), e.g. history + spot."""
+        keep = ~self.dates.isin(newer.dates)
+        frame = pd.concat([
+            pd.DataFrame(self.usd[keep], index=self.dates[keep]),
+            pd.DataFrame(newer.usd, index=newer.dates),
+        ]).sort_index(kind="stable")
+        return FxMatrix(pd.DatetimeIndex(frame.index), frame.to_numpy(), self.quoted | newer.quoted)
+
+
+def fx_matrix(closes: pd.DataFrame | None, previous: FxMatrix | None = None) -> FxMatrix:
+    """Matrix from daily closes of the FX_PAIRS symbols (date x symbol, any subset).
+
+    Gaps are forward-filled, dates before a pair's first close use that close,
+    and pairs without any close use previous's spot rate, or FX_DEFAULTS when
+    there is no previous matrix. With no closes at all the matrix is a single
+    row dated today.
+    """
+    if closes is None or closes.empty:
+        closes = pd.DataFrame(index=pd.DatetimeIndex([pd.Timestamp.today().normalize()]))
+    closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+    quoted = frozenset(s for s in FX_PAIRS if s in closes.columns and closes[s].notna().any())
+    pairs = closes.reindex(columns=list(FX_PAIRS)).ffill().bfill().fillna(
+        FX_DEFAULTS if previous is None else previous.pair_rates()
+    )
+
+    usd = np.full((len(pairs), len(CURRENCIES)), np.nan)
+    usd[:, _CURRENCY_INDEX.get_loc(FX_PIVOT)] = 1.0
+    for symbol, known, unknown, known_is_base in _SOLVE_STEPS:
+        close = pairs[symbol].to_numpy(dtype=float)
+        have = usd[:, _CURRENCY_INDEX.get_loc(known)]
+        # 1 base = close quote, so usd[base] = close * usd[quote]
+        usd[:, _CURRENCY_INDEX.get_loc(unknown)] = have / close if known_is_base else have * close
+    return FxMatrix(pd.DatetimeIndex(pairs.index), usd, quoted)
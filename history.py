@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from fx import FxMatrix
+from perf import timed
+
+# ---------- HISTORICAL PORTFOLIO VALUE ----------
+# Daily INR value of every holding line, built from three aligned matrices:
+#   units (date x line)   cumulative BUY / SELL deltas from the transaction
+#                         ledger, or today's holdings held flat when there is
+#                         no ledger (the holdings files carry no dates)
+#   price (date x line)   daily closes in USD / NAVs in INR, forward-filled
+#                         across each other's holidays
+#   fx    (date)          USD->INR on each date (fx.py), for US lines only
+# value = units * price * fx. Owner / sector / kind series are one matrix
+# product of the value matrix with a line -> group indicator matrix. There are
+# no per-day Python loops; cost is linear in dates x lines.
+
+LINE_COLUMNS = ["Kind", "Owner", "Symbol", "Name", "Sector"]
+KIND_LABELS = {"US": "US Stocks", "MF": "India MF"}
+# Owner recorded for MF lines from holdings/mf.csv (matches the seeded ledger)
+MF_OWNER = "MF"
+
+
+@dataclass(frozen=True)
+class ValueHistory:
+    """Daily INR value per holding line; `lines` describes each column of `values`."""
+    values: pd.DataFrame    # DatetimeIndex x line position, INR
+    lines: pd.DataFrame     # LINE_COLUMNS, one row per values column
+
+    @property
+    def empty(self) -> bool:
+        return self.values.empty
+
+    def total(self) -> pd.Series:
+        return pd.Series(self.values.to_numpy().sum(axis=1), index=self.values.index, name="Total")
+
+    def by(self, column: str) -> pd.DataFrame:
+        """Value summed per distinct value of a line column (Owner, Sector or Kind)."""
+        labels = self.lines[column].astype(str)
+        if column == "Kind":
+            labels = labels.map(lambda k: KIND_LABELS.get(k, k))
+        codes, groups = pd.factorize(labels, sort=True)
+        indicator = np.zeros((len(codes), len(groups)))
+        indicator[np.arange(len(codes)), codes] = 1.0
+        return pd.DataFrame(self.values.to_numpy() @ indicator, index=self.values.index, columns=list(groups))
+
+
+def holdings_lines(holdings: pd.DataFrame, mf_holdings: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """(lines, units) for the current holdings files, one line per row."""
+    lines = pd.concat([
+        pd.DataFrame({
+            "Kind": "US", "Owner": holdings["Owner"].astype(str), "Symbol": holdings["Ticker"].astype(str),
+            "Name": holdings["Name"].astype(str), "Sector": holdings["Sector"].astype(str),
+        }),
+        pd.DataFrame({
+            "Kind": "MF", "Owner": MF_OWNER, "Symbol": mf_holdings["AMFICode"].astype(str),
+            "Name": mf_holdings["Scheme"].astype(str), "Sector": mf_holdings["Category"].astype(str),
+        }),
+    ], ignore_index=True)
+    # US lines first (build_value_history relies on it)
+    units = np.concatenate([holdings["Units"].to_numpy(dtype=float), mf_holdings["Units"].to_numpy(dtype=float)])
+    return lines[LINE_COLUMNS], units
+
+
+def ledger_units(tx: pd.DataFrame, calendar: pd.DatetimeIndex) -> tuple[pd.DataFrame, np.ndarray]:
+    """(lines, units matrix) from the transaction ledger, one line per (Kind, Owner, Symbol, Name).
+
+    A transaction counts from its own date, or the next calendar date when it
+    falls on a non-trading day. Transactions before the calendar fold into its
+    first row.
+    """
+    ordered = tx.sort_values("Date", kind="stable", ignore_index=True)
+    keys = ordered[["Kind", "Owner", "Symbol", "Name"]].astype(str)
+    # Line ids in order of first appearance (ngroup without sorting)
+    line_id = keys.groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+    n_lines = int(line_id.max()) + 1 if len(line_id) else 0
+
+    tx_type = ordered["Type"].astype(str).str.upper().to_numpy()
+    sign = np.select([tx_type == "BUY", tx_type == "SELL"], [1.0, -1.0], 0.0)
+    delta = sign * ordered["Units"].fillna(0.0).to_numpy(dtype=float)
+
+    row = np.searchsorted(calendar.to_numpy(), ordered["Date"].to_numpy(dtype="datetime64[ns]"), side="left")
+    inside = row < len(calendar)
+    units = np.zeros((len(calendar), n_lines))
+    np.add.at(units, (row[inside], line_id[inside]), delta[inside])
+    units = np.cumsum(units, axis=0)
+    # Float dust from partial sells would otherwise show as tiny residual values
+    units[np.abs(units) < 1e-9] = 0.0
+
+    sectors = ordered["Sector"].astype(object).where(ordered["Sector"].astype(str) != "")
+    sector = sectors.groupby(line_id).last().reindex(range(n_lines)).fillna("").astype(str)
+    lines = keys.drop_duplicates(ignore_index=True)
+    lines["Sector"] = sector.to_numpy()
+    # US lines first, like holdings_lines
+    order = np.argsort(lines["Kind"].to_numpy() != "US", kind="stable")
+    return lines[LINE_COLUMNS].iloc[order].reset_index(drop=True), units[:, order]
+
+
+def _aligned(frame: pd.DataFrame, calendar: pd.DatetimeIndex, columns: list[str]) -> np.ndarray:
+    """frame forward-filled onto calendar, one output column per entry of columns (NaN if absent)."""
+    if frame is None or frame.empty:
+        return np.full((len(calendar), len(columns)), np.nan)
+    frame = frame[~frame.index.duplicated(keep="last")]
+    filled = frame.reindex(frame.index.union(calendar)).ffill().reindex(calendar)
+    return filled.reindex(columns=columns).to_numpy(dtype=float)
+
+
+def history_calendar(closes: pd.DataFrame, navs: pd.DataFrame, start: date | None = None) -> pd.DatetimeIndex:
+    """Union of US trading days and NAV dates, from start onwards."""
+    index = pd.DatetimeIndex([])
+    for frame in (closes, navs):
+        if frame is not None and not frame.empty:
+            index = index.union(pd.DatetimeIndex(frame.index))
+    if start is not None:
+        index = index[index >= pd.Timestamp(start)]
+    return index
+
+
+@timed()
+def build_value_history(
+    holdings: pd.DataFrame,
+    mf_holdings: pd.DataFrame,
+    closes: pd.DataFrame,
+    navs: pd.DataFrame,
+    fx: FxMatrix,
+    start: date | None = None,
+    transactions: pd.DataFrame | None = None,
+) -> ValueHistory:
+    """Daily INR value per line, US lines at the USD->INR rate of each date
+    in `fx`. With `transactions`, units follow the ledger; otherwise
+    holdings are flat."""
+    if transactions is not None and not transactions.empty:
+        # Nothing is held before the first transaction
+        first = pd.Timestamp(transactions["Date"].min()).date()
+        start = first if start is None else max(start, first)
+    calendar = history_calendar(closes, navs, start)
+    if transactions is not None and not transactions.empty:
+        lines, units = ledger_units(transactions, calendar)
+    else:
+        lines, flat = holdings_lines(holdings, mf_holdings)
+        units = np.broadcast_to(flat, (len(calendar), len(flat)))
+    if len(calendar) == 0 or lines.empty:
+        return ValueHistory(pd.DataFrame(index=calendar), lines)
+
+    # Lines come US first, so both blocks are column slices (views)
+    n_us = int((lines["Kind"] == "US").sum())
+    symbols = lines["Symbol"].tolist()
+    values = np.empty((len(calendar), len(lines)))
+    values[:, :n_us] = _aligned(closes, calendar, symbols[:n_us])
+    values[:, n_us:] = _aligned(navs, calendar, symbols[n_us:])
+
+    usd_inr = fx.rates("USD", "INR", calendar)
+
+    # price -> value in place: x units, x FX for US lines
+    values *= units
+    values[:, :n_us] *= usd_inr[:, None]
+    # No price yet (before a listing / first NAV) or no units: contributes nothing
+    np.copyto(values, 0.0, where=np.isnan(values))
+    return ValueHistory(pd.DataFrame(values, index=calendar), lines.reset_index(drop=True))
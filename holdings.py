@@ -0,0 +1,139 @@
+import io
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# ---------- HOLDINGS FILES ----------
+# US stock lots and India MF holdings live in columnar files next to the code
+# (CSV, or Parquet for large books) instead of Python literals, so a holdings
+# change is a file edit rather than a redeploy. Each file is parsed once into
+# a typed frame (categorical owner / sector / ticker, float64 amounts) and
+# re-read only when its mtime or size changes. Environment overrides:
+#   HOLDINGS_PATH=/path/to/portfolio.parquet
+#   MF_HOLDINGS_PATH=/path/to/mf.csv
+
+HOLDINGS_DIR = Path(__file__).resolve().parent / "holdings"
+HOLDINGS_PATH = Path(os.environ.get("HOLDINGS_PATH", HOLDINGS_DIR / "portfolio.csv"))
+MF_HOLDINGS_PATH = Path(os.environ.get("MF_HOLDINGS_PATH", HOLDINGS_DIR / "mf.csv"))
+
+HOLDINGS_SCHEMA = {
+    "Name": "str",
+    "Ticker": "category",
+    "Units": "float64",
+    "PurchaseValAED": "float64",
+    "Owner": "category",
+    "Sector": "category",
+}
+
+MF_SCHEMA = {
+    "Scheme": "str",
+    "Category": "category",
+    "Units": "float64",
+    "CostINR": "float64",
+    "InitialValueINR": "float64",
+    "AMFICode": "str",
+}
+
+
+def coerce(frame: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
+    """Select and type the schema columns.
+
+    Categories keep first-appearance order, so owner roll-ups and any
+    group-by on them list owners in the same order as the file.
+    """
+    missing = [col for col in schema if col not in frame.columns]
+    if missing:
+        raise ValueError(f"holdings file is missing columns: {', '.join(missing)}")
+    frame = frame.reset_index(drop=True)
+    out = {}
+    for col, dtype in schema.items():
+        values = frame[col]
+        if dtype == "category":
+            values = values.astype("string")
+            out[col] = pd.Categorical(values, categories=pd.unique(values.dropna()))
+        else:
+            out[col] = values.astype(dtype)
+    return pd.DataFrame(out)
+
+
+def read_holdings_file(path: Path, schema: dict[str, str]) -> pd.DataFrame:
+    if path.suffix.lower() in (".parquet", ".pq"):
+        raw = pd.read_parquet(path, columns=list(schema))
+    else:
+        # Only whole-line "#" comments: names may legitimately contain "#"
+        with open(path, encoding="utf-8") as fh:
+            text = "".join(line for line in fh if not line.lstrip().startswith("#"))
+        # Text columns are read as strings so scheme codes keep leading zeros
+        raw = pd.read_csv(
+            io.StringIO(text),
+            skipinitialspace=True,
+            dtype={col: "string" for col, dtype in schema.items() if dtype != "float64"},
+        )
+    return coerce(raw, schema)
+
+
+class HoldingsCache:
+    """Parsed holdings frames keyed by path, invalidated on (mtime, size) change.
+
+    A file that disappears or fails to parse after a good load keeps serving
+    the last good frame; only a first load that fails raises.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames: dict[Path, tuple[tuple[int, int], pd.DataFrame]] = {}
+
+    def load(self, path: Path, schema: dict[str, str]) -> pd.DataFrame:
+        path = Path(path)
+        cached = self._frames.get(path)
+        try:
+            st = path.stat()
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            if cached is not None:
+                return cached[1]
+            raise
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with self._lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            try:
+                frame = read_holdings_file(path, schema)
+            except Exception:
+                if cached is not None:
+                    # Remember the bad version so it isn't re-parsed every rerun
+                    self._frames[path] = (key, cached[1])
+                    return cached[1]
+                raise
+            self._frames[path] = (key, frame)
+            return frame
+
+
+_CACHE = HoldingsCache()
+
+
+def load_table(path: Path, schema: dict[str, str]) -> pd.DataFrame:
+    """Any typed holdings-style table through the shared mtime cache."""
+    return _CACHE.load(path, schema)
+
+
+def load_holdings(path: Path | None = None) -> pd.DataFrame:
+    """US stock lots (Name, Ticker, Units, PurchaseValAED, Owner, Sector). Read-only: copy before mutating."""
+    return _CACHE.load(path or HOLDINGS_PATH, HOLDINGS_SCHEMA)
+
+
+def load_mf_holdings(path: Path | None = None) -> pd.DataFrame:
+    """India MF holdings (Scheme, Category, Units, CostINR, InitialValueINR, AMFICode). Read-only."""
+    return _CACHE.load(path or MF_HOLDINGS_PATH, MF_SCHEMA)
+
+
+def holdings_tickers(holdings: pd.DataFrame) -> list[str]:
+    return sorted(holdings["Ticker"].dropna().unique().astype(str))
+
+
+def holdings_mf_codes(mf_holdings: pd.DataFrame) -> list[str]:
+    return sorted(mf_holdings["AMFICode"].dropna().unique().astype(str))
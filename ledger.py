@@ -0,0 +1,364 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from holdings import (
+    HOLDINGS_DIR,
+    HOLDINGS_SCHEMA,
+    MF_SCHEMA,
+    coerce,
+    load_holdings,
+    load_mf_holdings,
+    load_table,
+)
+from price_store import DATA_DIR
+
+# ---------- TRANSACTION LEDGER ----------
+# Optional holdings/transactions.csv (or TRANSACTIONS_PATH, CSV or Parquet)
+# with one row per BUY / SELL / DIVIDEND:
+#   Date, Owner, Kind (US | MF), Symbol (ticker or AMFI code), Name, Sector
+#   (sector, or category for MF), Type, Units, Amount
+# Amount is in the book currency (AED for US stocks, INR for MF): total cost
+# for a BUY, net proceeds for a SELL, cash received for a DIVIDEND. A holding
+# line is (Kind, Owner, Symbol, Name), so two folios of one scheme stay apart.
+#
+# Units, cost basis (average cost) and realized P&L are derived by replaying
+# the ledger in date order. The running state is snapshotted every
+# SNAPSHOT_EVERY transactions into data/ledger.sqlite together with a
+# fingerprint of the rows it covers; a refresh resumes from the newest
+# snapshot whose fingerprint still matches and replays only the rows after
+# it. Editing an old row changes the fingerprint and falls back to an older
+# snapshot (or a full replay) automatically.
+
+TRANSACTIONS_PATH = Path(os.environ.get("TRANSACTIONS_PATH", HOLDINGS_DIR / "transactions.csv"))
+LEDGER_STORE_PATH = DATA_DIR / "ledger.sqlite"
+SNAPSHOT_EVERY = 500
+KEEP_SNAPSHOTS = 4
+
+TRANSACTION_SCHEMA = {
+    "Date": "datetime64[ns]",
+    "Owner": "category",
+    "Kind": "category",
+    "Symbol": "str",
+    "Name": "str",
+    "Sector": "category",
+    "Type": "category",
+    "Units": "float64",
+    "Amount": "float64",
+}
+
+# Units below this are treated as a closed position
+_DUST = 1e-9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_snapshot (
+    seq         INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ledger_snapshot_line (
+    seq      INTEGER NOT NULL,
+    opened   INTEGER NOT NULL,
+    kind     TEXT NOT NULL,
+    owner    TEXT NOT NULL,
+    symbol   TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    sector   TEXT NOT NULL,
+    units    REAL NOT NULL,
+    cost     REAL NOT NULL,
+    realized REAL NOT NULL,
+    income   REAL NOT NULL,
+    PRIMARY KEY (seq, kind, owner, symbol, name)
+) WITHOUT ROWID;
+"""
+
+LineKey = tuple[str, str, str, str]   # (kind, owner, symbol, name)
+
+
+class LineState:
+    """Running totals for one holding line. `opened` is the ledger position of
+    its first transaction and fixes the line's display order."""
+
+    __slots__ = ("opened", "sector", "units", "cost", "realized", "income")
+
+    def __init__(self, opened: int, sector: str = "", units: float = 0.0, cost: float = 0.0,
+                 realized: float = 0.0, income: float = 0.0):
+        self.opened = opened
+        self.sector = sector
+        self.units = units
+        self.cost = cost
+        self.realized = realized
+        self.income = income
+
+
+LedgerState = dict[LineKey, LineState]
+
+
+def apply_transactions(state: LedgerState, tx: pd.DataFrame, offset: int = 0) -> None:
+    """Replay `tx` (already in ledger order, starting at position `offset`) onto `state` in place."""
+    columns = [tx[c].astype(object).to_numpy() for c in ("Kind", "Owner", "Symbol", "Name", "Sector", "Type")]
+    units_col = tx["Units"].fillna(0.0).to_numpy()
+    amount_col = tx["Amount"].fillna(0.0).to_numpy()
+    dates = tx["Date"].to_numpy()
+
+    for i, (kind, owner, symbol, name, sector, tx_type) in enumerate(zip(*columns)):
+        key = (str(kind), str(owner), str(symbol), str(name))
+        line = state.get(key)
+        if line is None:
+            line = state[key] = LineState(offset + i)
+        if isinstance(sector, str) and sector:
+            line.sector = sector
+        units, amount = float(units_col[i]), float(amount_col[i])
+        tx_type = str(tx_type).upper()
+
+        if tx_type == "BUY":
+            line.units += units
+            line.cost += amount
+        elif tx_type == "SELL":
+            if units > line.units + _DUST:
+                raise ValueError(
+                    f"{pd.Timestamp(dates[i]).date()} {symbol} ({owner}): "
+                    f"selling {units:g} units but only {line.units:g} held"
+                )
+            cost_out = line.cost * (units / line.units) if line.units > 0 else 0.0
+            line.realized += amount - cost_out
+            line.units -= units
+            line.cost -= cost_out
+            if line.units < _DUST:
+                line.units, line.cost = 0.0, 0.0
+        elif tx_type == "DIVIDEND":
+            line.income += amount
+        else:
+            raise ValueError(f"{pd.Timestamp(dates[i]).date()} {symbol}: unknown transaction type {tx_type!r}")
+
+
+def prefix_fingerprints(tx: pd.DataFrame) -> np.ndarray:
+    """fp[n-1] identifies the first n rows (order-sensitive, uint64 arithmetic)."""
+    hashes = pd.util.hash_pandas_object(tx, index=False).to_numpy(dtype=np.uint64)
+    weights = np.arange(1, len(tx) + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return np.cumsum(hashes * weights, dtype=np.uint64)
+
+
+class LedgerStore:
+    """SQLite snapshots of the ledger state (connection per call, like PriceStore)."""
+
+    def __init__(self, path: Path = LEDGER_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def snapshots(self) -> list[tuple[int, str]]:
+        """(seq, fingerprint) of stored snapshots, newest position first."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT seq, fingerprint FROM ledger_snapshot ORDER BY seq DESC").fetchall()
+
+    def load(self, seq: int) -> LedgerState:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT opened, kind, owner, symbol, name, sector, units, cost, realized, income "
+                "FROM ledger_snapshot_line WHERE seq = ? ORDER BY opened",
+                (seq,),
+            ).fetchall()
+        return {(k, o, s, n): LineState(op, *values) for op, k, o, s, n, *values in rows}
+
+    def save(self, seq: int, fingerprint: str, state: LedgerState) -> None:
+        lines = [
+            (seq, line.opened, *key, line.sector, line.units, line.cost, line.realized, line.income)
+            for key, line in state.items()
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM ledger_snapshot_line WHERE seq = ?", (seq,))
+            conn.execute(
+                "INSERT OR REPLACE INTO ledger_snapshot (seq, fingerprint, created_at) VALUES (?, ?, ?)",
+                (seq, fingerprint, time.time()),
+            )
+            conn.executemany(
+                "INSERT INTO ledger_snapshot_line VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lines
+            )
+            # Keep the most recently written snapshots only
+            stale = conn.execute(
+                "SELECT seq FROM ledger_snapshot ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (KEEP_SNAPSHOTS,),
+            ).fetchall()
+            for (old,) in stale:
+                conn.execute("DELETE FROM ledger_snapshot WHERE seq = ?", (old,))
+                conn.execute("DELETE FROM ledger_snapshot_line WHERE seq = ?", (old,))
+
+
+@dataclass(frozen=True)
+class LedgerBooks:
+    """Open positions derived from the ledger, in the holdings-file schemas.
+
+    Both frames carry two extra columns, RealizedPL and Income (book
+    currency), which include closed lines' history via `closed`.
+    """
+    holdings: pd.DataFrame      # HOLDINGS_SCHEMA + RealizedPL, Income
+    mf_holdings: pd.DataFrame   # MF_SCHEMA + RealizedPL, Income
+    closed: pd.DataFrame        # fully sold lines: Kind, Owner, Symbol, Name, RealizedPL, Income
+    transactions: int
+    resumed_from: int           # snapshot position the last build started at
+    replayed: int               # rows replayed by the last build
+
+
+def _books_from_state(state: LedgerState, transactions: int, resumed_from: int) -> LedgerBooks:
+    items = sorted(state.items(), key=lambda item: item[1].opened)
+    keys = [key for key, _ in items]
+    lines = [line for _, line in items]
+    frame = pd.DataFrame({
+        "Kind": [k[0] for k in keys],
+        "Owner": [k[1] for k in keys],
+        "Symbol": [k[2] for k in keys],
+        "Name": [k[3] for k in keys],
+        "Sector": [line.sector for line in lines],
+        "Units": np.array([line.units for line in lines], dtype="float64"),
+        "Cost": np.array([line.cost for line in lines], dtype="float64"),
+        "RealizedPL": np.array([line.realized for line in lines], dtype="float64"),
+        "Income": np.array([line.income for line in lines], dtype="float64"),
+    })
+    is_open = frame["Units"] > _DUST
+    us = frame[is_open & (frame["Kind"] == "US")]
+    mf = frame[is_open & (frame["Kind"] == "MF")]
+
+    holdings = coerce(
+        pd.DataFrame({
+            "Name": us["Name"], "Ticker": us["Symbol"], "Units": us["Units"],
+            "PurchaseValAED": us["Cost"], "Owner": us["Owner"], "Sector": us["Sector"],
+        }),
+        HOLDINGS_SCHEMA,
+    )
+    mf_holdings = coerce(
+        pd.DataFrame({
+            "Scheme": mf["Name"], "Category": mf["Sector"], "Units": mf["Units"],
+            "CostINR": mf["Cost"], "InitialValueINR": mf["Cost"], "AMFICode": mf["Symbol"],
+        }),
+        MF_SCHEMA,
+    )
+    for out, src in ((holdings, us), (mf_holdings, mf)):
+        out["RealizedPL"] = src["RealizedPL"].to_numpy()
+        out["Income"] = src["Income"].to_numpy()
+
+    closed = frame.loc[~is_open, ["Kind", "Owner", "Symbol", "Name", "RealizedPL", "Income"]].reset_index(drop=True)
+    return LedgerBooks(holdings, mf_holdings, closed, transactions, resumed_from, transactions - resumed_from)
+
+
+class LedgerEngine:
+    """Process-wide ledger replayer with snapshot resume and a per-file memo."""
+
+    def __init__(self, store: LedgerStore, snapshot_every: int = SNAPSHOT_EVERY):
+        self._store = store
+        self._snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._memo: tuple[pd.DataFrame, LedgerBooks] | None = None
+
+    def books(self, tx: pd.DataFrame) -> LedgerBooks:
+        with self._lock:
+            # Same parsed frame (file unchanged) -> same books, no work at all
+            if self._memo is not None and self._memo[0] is tx:
+                return self._memo[1]
+            books = self._build(tx)
+            self._memo = (tx, books)
+            return books
+
+    def _build(self, tx: pd.DataFrame) -> LedgerBooks:
+        ordered = tx.sort_values("Date", kind="stable", ignore_index=True)
+        n = len(ordered)
+        fps = prefix_fingerprints(ordered)
+
+        start, state = 0, {}
+        for seq, fingerprint in self._store.snapshots():
+            if 0 < seq <= n and f"{int(fps[seq - 1]):016x}" == fingerprint:
+                start, state = seq, self._store.load(seq)
+                break
+
+        # Replay up to each snapshot boundary, snapshotting as we cross it
+        every = self._snapshot_every
+        pos = start
+        while pos < n:
+            boundary = (pos // every + 1) * every
+            end = min(boundary, n)
+            apply_transactions(state, ordered.iloc[pos:end], pos)
+            pos = end
+            if pos == boundary:
+                self._store.save(pos, f"{int(fps[pos - 1]):016x}", state)
+
+        return _books_from_state(state, n, start)
+
+
+_engine: LedgerEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_ledger_engine() -> LedgerEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LedgerEngine(LedgerStore())
+        return _engine
+
+
+def load_transactions(path: Path | None = None) -> pd.DataFrame:
+    return load_table(path or TRANSACTIONS_PATH, TRANSACTION_SCHEMA)
+
+
+def ledger_books(path: Path | None = None) -> LedgerBooks | None:
+    """Positions derived from the transaction ledger, or None when there is no ledger file."""
+    path = Path(path or TRANSACTIONS_PATH)
+    if not path.exists():
+        return None
+    return get_ledger_engine().books(load_transactions(path))
+
+
+def current_transactions(path: Path | None = None) -> pd.DataFrame | None:
+    """The parsed transaction ledger (re-read only when the file changes), or None without one."""
+    path = Path(path or TRANSACTIONS_PATH)
+    if not path.exists():
+        return None
+    return load_transactions(path)
+
+
+def current_books() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(US holdings, MF holdings): from the ledger when present, else the holdings files."""
+    books = ledger_books()
+    if books is not None:
+        return books.holdings, books.mf_holdings
+    return load_holdings(), load_mf_holdings()
+
+
+def seed_ledger_from_holdings(path: Path | None = None, as_of: date | None = None) -> int:
+    """Write a starter ledger with one BUY per current holdings row. Returns the row count.
+
+    Refuses to overwrite an existing ledger.
+    """
+    path = Path(path or TRANSACTIONS_PATH)
+    if path.exists():
+        raise FileExistsError(path)
+    day = (as_of or date.today()).isoformat()
+    us, mf = load_holdings(), load_mf_holdings()
+    rows = pd.concat([
+        pd.DataFrame({
+            "Date": day, "Owner": us["Owner"].astype(str), "Kind": "US", "Symbol": us["Ticker"].astype(str),
+            "Name": us["Name"], "Sector": us["Sector"].astype(str), "Type": "BUY",
+            "Units": us["Units"], "Amount": us["PurchaseValAED"],
+        }),
+        pd.DataFrame({
+            "Date": day, "Owner": "MF", "Kind": "MF", "Symbol": mf["AMFICode"],
+            "Name": mf["Scheme"], "Sector": mf["Category"].astype(str), "Type": "BUY",
+            "Units": mf["Units"], "Amount": mf["CostINR"],
+        }),
+    ], ignore_index=True)
+    rows.to_csv(path, index=False)
+    return len(rows)
@@ -0,0 +1,540 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from amfi import NavFetchResult, fetch_latest_navs, load_navall_index
+from fx import FX_DEFAULTS, FX_PAIRS, FxMatrix, fx_matrix
+from price_store import PriceStore
+from providers import get_provider
+
+# Plain fetch functions (no Streamlit caching). The dashboard's background
+# refresher calls these on its own schedule; they can also be timed directly.
+# All upstream access goes through providers.get_provider(), so the same code
+# runs live, recording, or replaying recorded responses offline.
+
+# ---------- CONSTANTS & FALLBACKS ----------
+DEFAULT_USD_AED = FX_DEFAULTS["USDAED=X"]
+DEFAULT_AED_INR = FX_DEFAULTS["AEDINR=X"]
+
+# ---------- INDIA MF NAVs (AMFI) ----------
+
+# "navall": one download of AMFI's daily NAVAll.txt for every scheme (default)
+# "mfapi":  one mfapi.in JSON request per scheme code
+MF_NAV_SOURCE = os.environ.get("MF_NAV_SOURCE", "navall")
+# Optional local NAVAll.txt (or mirror URL) so the dashboard can run offline
+AMFI_NAVALL_PATH = os.environ.get("AMFI_NAVALL_PATH")
+
+
+@dataclass(frozen=True)
+class NavQuote:
+    """Latest NAV for a scheme plus the previous published NAV (for day P&L)."""
+    nav: float
+    nav_date: date | None
+    prev_nav: float | None = None
+    prev_date: date | None = None
+
+    @property
+    def day_change(self) -> float:
+        """Per-unit NAV change vs the previous NAV (0.0 if there is none yet)."""
+        if self.prev_nav is None or self.prev_nav <= 0:
+            return 0.0
+        return self.nav - self.prev_nav
+
+
+def fetch_mf_nav_quotes(store: PriceStore, codes: list[str]) -> dict[str, NavQuote]:
+    """
+    Latest and previous NAV per AMFI scheme code, backed by the on-disk NAV history.
+
+    By default all codes are served from a single NAVAll.txt index; any code
+    the index lacks (or everything, if the file can't be read) falls back to
+    concurrent per-scheme mfapi.in requests (see amfi.py). Each refresh appends
+    only NAV dates newer than what the store holds.
+
+    A code with fewer than two stored points is seeded from its mfapi.in
+    response, which already carries the full series; this happens once per
+    scheme, after which day P&L needs no extra requests.
+    """
+    codes = sorted(set(codes))
+    result = NavFetchResult()
+    if MF_NAV_SOURCE == "navall":
+        try:
+            result = load_navall_index(AMFI_NAVALL_PATH, wanted=set(codes)).lookup(codes)
+        except Exception:
+            result = NavFetchResult()
+
+    heads = store.nav_heads(codes)
+    need_api = [c for c in codes if c not in result.navs or len(heads.get(c, [])) < 2]
+    if need_api:
+        api = fetch_latest_navs(need_api, with_history=True)
+        result.navs.update(api.navs)
+        result.dates.update(api.dates)
+        result.history.update(api.history)
+
+    new_points = []
+    for code, nav in result.navs.items():
+        latest = heads[code][0][0] if code in heads else None
+        series = result.history.get(code)
+        if series is None and code in result.dates:
+            series = [(result.dates[code], nav)]
+        for nav_date, value in series or []:
+            if latest is None or nav_date > latest:
+                new_points.append((code, nav_date, value))
+    if new_points:
+        store.upsert_navs(new_points)
+        heads = store.nav_heads(codes)
+
+    quotes: dict[str, NavQuote] = {}
+    for code in codes:
+        points = heads.get(code)
+        if points:
+            (nav_date, nav), prev = points[0], (points[1] if len(points) > 1 else (None, None))
+            quotes[code] = NavQuote(nav, nav_date, prev[1], prev[0])
+        elif code in result.navs:
+            quotes[code] = NavQuote(result.navs[code], result.dates.get(code))
+    return quotes
+
+# ---------- FX RATES ----------
+
+def fetch_fx_rates() -> dict:
+    """
+    Fetches live FX rates for USD->AED and AED->INR.
+    Includes fallbacks if API fails.
+    """
+    rates = {
+        "USD_AED": DEFAULT_USD_AED,
+        "AED_INR": DEFAULT_AED_INR
+    }
+
+    # 1. USD -> AED
+    try:
+        # USDAED=X is the standard ticker for USD to AED
+        hist = get_provider().history("USDAED=X", period="5d")
+        if not hist.empty:
+            rates["USD_AED"] = float(hist["Close"].iloc[-1])
+    except Exception:
+        pass
+
+    # 2. AED -> INR
+    try:
+        # AEDINR=X is the standard ticker for AED to INR
+        hist = get_provider().history("AEDINR=X", period="5d")
+        if not hist.empty:
+            rates["AED_INR"] = float(hist["Close"].iloc[-1])
+    except Exception:
+        pass
+
+    return rates
+
+# ---------- DAILY CLOSES (LOCAL STORE + INCREMENTAL GAP-FILL) ----------
+
+# Backfill depth for a ticker the store has never seen; afterwards only new bars are fetched
+CLOSE_BACKFILL_PERIOD = "max"
+# Re-read a few days before the last stored bar so splits/dividend re-adjustments are detected
+CLOSE_OVERLAP_DAYS = 5
+# Rows handed to the position builders (same window as the old 5d download)
+CLOSE_WINDOW_ROWS = 5
+
+
+def _extract_close(data: pd.DataFrame, tickers: list[str]) -> pd.DataFrame:
+    """Pull a wide (date x ticker) close frame out of a yf.download result."""
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        lvl1 = data.columns.get_level_values(1)
+        if "Adj Close" in lvl1:
+            close = data.xs("Adj Close", level=1, axis=1)
+        elif "Close" in lvl1:
+            close = data.xs("Close", level=1, axis=1)
+        else:
+            close = data.xs(lvl1[0], level=1, axis=1)
+        close.columns = close.columns.get_level_values(0)
+    else:
+        if "Adj Close" in data.columns:
+            close = data[["Adj Close"]]
+        elif "Close" in data.columns:
+            close = data[["Close"]]
+        else:
+            return pd.DataFrame()
+        close.columns = [tickers[0]]
+    return close.dropna(how="all")
+
+
+def _download_closes(tickers: list[str], **kwargs) -> pd.DataFrame:
+    try:
+        data = get_provider().download(
+            tickers,
+            interval="1d",
+            auto_adjust=True,
+            group_by="ticker",
+            progress=False,
+            threads=False,
+            **kwargs,
+        )
+    except Exception:
+        return pd.DataFrame()
+    return _extract_close(data, tickers)
+
+
+def sync_price_store(store: PriceStore, tickers: list[str]) -> None:
+    """Bring the on-disk close store up to date for `tickers`.
+
+    Unknown tickers get a one-off full backfill. Known tickers only fetch the bars
+    after their last stored date (plus a short overlap). If the overlap no longer
+    matches what is stored (split or dividend re-adjustment), that ticker's
+    history is re-downloaded.
+    """
+    last = store.last_dates(tickers)
+    missing = [t for t in tickers if t not in last]
+    known = [t for t in tickers if t in last]
+
+    if known:
+        start = min(last[t] for t in known) - timedelta(days=CLOSE_OVERLAP_DAYS)
+        fresh = _download_closes(known, start=start.isoformat())
+        if not fresh.empty:
+            stored = store.read_closes(known, start=start)
+            common = stored.columns.intersection(fresh.columns)
+            stale = []
+            if len(common):
+                stored = stored[common]
+                # Compare completed bars only; the newest stored bar may have been partial
+                last_ts = pd.DatetimeIndex([pd.Timestamp(last[t]) for t in common])
+                completed = stored.index.to_numpy()[:, None] < last_ts.to_numpy()[None, :]
+                ratio = fresh[common].reindex(stored.index) / stored
+                drift = (ratio - 1.0).abs().where(completed).max()
+                stale = list(drift[drift > 1e-3].index)
+            store.upsert_closes(fresh.drop(columns=stale, errors="ignore"))
+            if stale:
+                store.delete_tickers(stale)
+                missing.extend(stale)
+
+    if missing:
+        store.upsert_closes(_download_closes(sorted(missing), period=CLOSE_BACKFILL_PERIOD))
+
+
+def fetch_prices_close(store: PriceStore, tickers: list[str]) -> pd.DataFrame:
+    """Sync the store, then return the most recent daily closes from disk."""
+    sync_price_store(store, tickers)
+    last = store.last_dates(tickers)
+    if not last:
+        return pd.DataFrame()
+    # Only read a short tail from disk; CLOSE_WINDOW_ROWS trading days fit comfortably
+    start = max(last.values()) - timedelta(days=CLOSE_WINDOW_ROWS * 3)
+    return store.read_closes(tickers, start=start).tail(CLOSE_WINDOW_ROWS)
+
+
+def fetch_fx_history(store: PriceStore, start: date | None = None) -> FxMatrix:
+    """Dated FX matrix (fx.py) from the daily closes of every FX pair.
+
+    The FX pairs live in the same close store as the holdings, so after the
+    first backfill a refresh is one batched request for the new bars.
+    """
+    symbols = list(FX_PAIRS)
+    sync_price_store(store, symbols)
+    return fx_matrix(store.read_closes(symbols, start=start))
+
+# ---------- INTRADAY LAST PRICES ----------
+
+# One bulk request over a short window; 1d of 1m bars incl. pre/post is ~960 rows per symbol
+INTRADAY_LOOKBACK = "1d"
+# Per-ticker fallback keeps the old, wider window for symbols the bulk call missed
+INTRADAY_FALLBACK_LOOKBACK = "5d"
+
+
+def fetch_last_price_single(ticker: str, period: str = INTRADAY_FALLBACK_LOOKBACK) -> float | None:
+    """Latest 1m close (pre/post included) for one ticker, or None."""
+    try:
+        hist = get_provider().history(ticker, period=period, interval="1m", prepost=True)
+    except Exception:
+        return None
+    if hist is None or hist.empty:
+        return None
+    closes = hist["Close"].dropna()
+    if closes.empty:
+        return None
+    return float(closes.iloc[-1])
+
+
+def fetch_last_prices_loop(tickers: list[str]) -> pd.Series:
+    """Legacy path: one 5d/1m history call per ticker. Kept for benchmarking."""
+    last_prices: dict[str, float] = {}
+    for t in tickers:
+        price = fetch_last_price_single(t)
+        if price is not None:
+            last_prices[t] = price
+    if not last_prices:
+        return pd.Series(dtype=float)
+    return pd.Series(last_prices)
+
+
+def fetch_minute_closes(tickers: list[str], period: str = INTRADAY_LOOKBACK, start: datetime | None = None) -> pd.DataFrame:
+    """1m closes (pre/post included), bar time x ticker, from one bulk download; empty on failure.
+
+    `start` (timezone-aware) asks for the bars since then instead of `period`.
+    """
+    window = {"period": period} if start is None else {"start": start}
+    try:
+        data = get_provider().download(
+            tickers,
+            **window,
+            interval="1m",
+            prepost=True,
+            auto_adjust=True,
+            group_by="ticker",
+            progress=False,
+            threads=True,
+        )
+    except Exception:
+        return pd.DataFrame()
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        return data.xs("Close", level=1, axis=1)
+    return data[["Close"]].set_axis([tickers[0]], axis=1)
+
+
+def _download_last_prices(tickers: list[str], period: str = INTRADAY_LOOKBACK) -> pd.Series:
+    """Last positive 1m close (pre/post included) per ticker from one bulk download."""
+    close = fetch_minute_closes(tickers, period)
+    if close.empty:
+        return pd.Series(dtype=float)
+    # Last non-null bar per column, without a Python loop over tickers
+    last = close.ffill().iloc[-1].dropna().astype(float)
+    return last[last > 0]
+
+
+def fetch_last_prices_batched(tickers: list[str], period: str = INTRADAY_LOOKBACK) -> pd.Series:
+    """Latest 1m close for all tickers from a single bulk download.
+
+    Symbols missing from the bulk result (no bars in the short window, or a
+    partial failure upstream) are retried one by one with the wider window.
+    """
+    if not tickers:
+        return pd.Series(dtype=float)
+
+    last = _download_last_prices(tickers, period)
+
+    missing = [t for t in tickers if t not in last.index]
+    if missing:
+        fallback = fetch_last_prices_loop(missing)
+        last = pd.concat([last, fallback]) if not last.empty else fallback
+
+    return last
+
+# ---------- MARKET INDICES (HEADER STRIP) ----------
+
+def fetch_market_indices_change() -> str:
+    """
+    Fetches Nifty 50 and Nasdaq 100 changes.
+    FIXED: Uses ^NDX (Index) as primary, QQQ as fallback.
+    Improved logic to prevent '0.0%' errors during pre/post market.
+    """
+    
+    # --- 1. NIFTY 50 ---
+    nifty_str = "Nifty 0.0%"
+    try:
+        provider = get_provider()
+        hist = provider.history("^NSEI", period="2d")
+        if len(hist) >= 2:
+            close_now = hist["Close"].iloc[-1]
+            prev_close = hist["Close"].iloc[-2]
+            pct = (close_now / prev_close - 1) * 100
+            nifty_str = f"Nifty {pct:+.1f}%"
+        elif len(hist) == 1:
+            # If only 1 day data (e.g. holiday glitch), try 5d
+            hist_5d = provider.history("^NSEI", period="5d")
+            if len(hist_5d) >= 2:
+                close_now = hist_5d["Close"].iloc[-1]
+                prev_close = hist_5d["Close"].iloc[-2]
+                pct = (close_now / prev_close - 1) * 100
+                nifty_str = f"Nifty {pct:+.1f}%"
+    except Exception:
+        pass
+
+    # --- 2. NASDAQ 100 (Robust Fix) ---
+    nasdaq_str = "Nasdaq 0.0%"
+    
+    def calculate_change(ticker_symbol):
+        """Helper to try getting change from a specific ticker"""
+        provider = get_provider()
+        # Get intraday data to capture Pre/Post market moves
+        hist_1m = provider.history(ticker_symbol, period="1d", interval="1m", prepost=True)
+        # Get daily data for baseline
+        daily = provider.history(ticker_symbol, period="5d")
+        
+        if daily.empty:
+            return None
+
+        # Determine 'Current' Price
+        if not hist_1m.empty:
+            current_price = hist_1m["Close"].iloc[-1]
+        else:
+            current_price = daily["Close"].iloc[-1]
+
+        # Determine 'Previous' Close (Baseline)
+        # If we are in Live/Pre market, baseline is Yesterday's Close
+        # If we are in Post market, baseline is Today's Close (usually)
+        # To be safe, we always compare against the most recent COMPLETED trading day.
+        
+        if len(daily) >= 2:
+            # Check if the last row is 'today' (incomplete) or 'yesterday'
+            last_date = daily.index[-1].date()
+            now_date = datetime.now(ZoneInfo("America/New_York")).date()
+            
+            if last_date == now_date:
+                # Last row is today. Prev close is row -2.
+                prev_close = daily["Close"].iloc[-2]
+            else:
+                # Last row is yesterday (or Friday). That is the current close? No, that's the baseline.
+                # If we have live data (hist_1m), we compare against last_date close.
+                prev_close = daily["Close"].iloc[-1]
+        else:
+            return None
+
+        if prev_close == 0:
+            return None
+            
+        return (current_price / prev_close - 1) * 100
+
+    # Try Primary: ^NDX (Official Index)
+    pct_change = calculate_change("^NDX")
+    
+    # Try Secondary: QQQ (ETF) if Primary failed or returned flat 0.0 (suspicious)
+    if pct_change is None or (abs(pct_change) < 0.001):
+        pct_change_qqq = calculate_change("QQQ")
+        if pct_change_qqq is not None:
+            pct_change = pct_change_qqq
+
+    if pct_change is not None:
+        nasdaq_str = f"Nasdaq {pct_change:+.1f}%"
+
+    return f"{nifty_str} <span style='opacity:0.4; margin:0 6px;'>|</span> {nasdaq_str}"
+
+# ---------- UNIFIED QUOTES (ONE BULK FETCH PER REFRESH) ----------
+# Every symbol a page needs (holdings, header indices, FX pairs) is fetched
+# together: one bulk 1m download for the latest prices and one bulk daily
+# download for the recent closes, instead of ~10 per-symbol history calls.
+# The resulting QuoteBook is fanned out to the intraday prices, the index
+# strip and the FX rates.
+
+INDEX_SYMBOLS = ("^NSEI", "^NDX", "QQQ")
+# Daily window for previous closes (same as the old per-symbol 5d histories)
+QUOTE_DAILY_PERIOD = "5d"
+# Sources asking within this many seconds share one QuoteBook
+QUOTE_MAX_AGE_S = 30.0
+
+
+@dataclass(frozen=True)
+class QuoteBook:
+    last: pd.Series         # latest 1m close (pre/post included) per symbol
+    daily: pd.DataFrame     # recent daily closes, date x symbol
+    fetched_at: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return self.last.empty and self.daily.empty
+
+    def closes(self, symbol: str) -> pd.Series:
+        if symbol not in self.daily.columns:
+            return pd.Series(dtype=float)
+        return self.daily[symbol].dropna()
+
+
+def quote_symbols(tickers: list[str]) -> list[str]:
+    """Holdings plus index and FX symbols, sorted so recordings replay with a stable key."""
+    return sorted(set(tickers) | set(INDEX_SYMBOLS) | set(FX_PAIRS))
+
+
+def fetch_quote_book(symbols: list[str]) -> QuoteBook:
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return QuoteBook(pd.Series(dtype=float), pd.DataFrame(), time.time())
+    last = _download_last_prices(symbols)
+    daily = _download_closes(symbols, period=QUOTE_DAILY_PERIOD)
+    return QuoteBook(last, daily, time.time())
+
+
+def last_prices_from(book: QuoteBook, tickers: list[str]) -> pd.Series:
+    """Latest price per holding ticker.
+
+    Tickers missing from the bulk 1m download are retried one by one over the
+    wider 5d window (as fetch_last_prices_batched does), so their pre/post
+    price stays live; only those still missing use their latest daily close.
+    """
+    last = book.last.reindex(tickers)
+    missing = list(dict.fromkeys(last.index[last.isna()]))
+    if missing:
+        last = last.fillna(fetch_last_prices_loop(missing))
+    if last.isna().any() and not book.daily.empty:
+        daily_last = book.daily.reindex(columns=tickers).ffill().iloc[-1]
+        last = last.fillna(daily_last)
+    last = last.dropna().astype(float)
+    return last[last > 0]
+
+
+def fx_matrix_from(book: QuoteBook, previous: FxMatrix | None = None) -> FxMatrix:
+    """FX matrix over the book's recent daily closes; the last row is spot.
+
+    Empty when no pair came back, so the refresher keeps the last good
+    matrix; a pair missing from a partial book keeps previous's rate (the
+    matrix being refreshed), not its default.
+    """
+    return fx_matrix(book.daily.reindex(columns=[s for s in FX_PAIRS if s in book.daily.columns]), previous)
+
+
+def _index_change(book: QuoteBook, symbol: str) -> float | None:
+    """Change vs the most recent completed session, using the live 1m price when there is one."""
+    daily = book.closes(symbol)
+    if len(daily) < 2:
+        return None
+    current = float(book.last[symbol]) if symbol in book.last.index else float(daily.iloc[-1])
+    now_date = datetime.now(ZoneInfo("America/New_York")).date()
+    prev_close = daily.iloc[-2] if daily.index[-1].date() == now_date else daily.iloc[-1]
+    if prev_close == 0:
+        return None
+    return (current / prev_close - 1) * 100
+
+
+def index_strip_from(book: QuoteBook) -> str:
+    """Header strip with the same rules as fetch_market_indices_change(); "" if no index came back."""
+    nifty = book.closes("^NSEI")
+    nifty_pct = (nifty.iloc[-1] / nifty.iloc[-2] - 1) * 100 if len(nifty) >= 2 else None
+
+    # ^NDX first; QQQ when the index is missing or suspiciously flat
+    nasdaq_pct = _index_change(book, "^NDX")
+    if nasdaq_pct is None or abs(nasdaq_pct) < 0.001:
+        qqq_pct = _index_change(book, "QQQ")
+        if qqq_pct is not None:
+            nasdaq_pct = qqq_pct
+
+    if nifty_pct is None and nasdaq_pct is None:
+        return ""
+    nifty_str = f"Nifty {nifty_pct:+.1f}%" if nifty_pct is not None else "Nifty 0.0%"
+    nasdaq_str = f"Nasdaq {nasdaq_pct:+.1f}%" if nasdaq_pct is not None else "Nasdaq 0.0%"
+    return f"{nifty_str} <span style='opacity:0.4; margin:0 6px;'>|</span> {nasdaq_str}"
+
+
+class QuoteService:
+    """Hands every caller within QUOTE_MAX_AGE_S the same QuoteBook.
+
+    The refresher's intraday, index and FX sources each ask for the book on
+    their own thread; the first one fetches, the rest wait on the lock and
+    reuse the result, so a refresh costs two bulk requests in total.
+    """
+
+    def __init__(self, symbols: Callable[[], list[str]], max_age: float = QUOTE_MAX_AGE_S):
+        self._symbols = symbols
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._book: QuoteBook | None = None
+
+    def book(self) -> QuoteBook:
+        with self._lock:
+            if self._book is None or time.time() - self._book.fetched_at >= self.max_age:
+                self._book = fetch_quote_book(self._symbols())
+            return self._book
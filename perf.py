@@ -0,0 +1,205 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# ---------- HOT-PATH TIMING SPANS ----------
+# A Trace collects nested, timed spans for one Streamlit rerun. Code marks
+# hot paths with `with span("name"):` or `@timed()`; outside a trace (the
+# background refresher, benchmarks) both are near-free no-ops. Finished traces
+# feed a process-wide registry that renders Prometheus text, and can be
+# appended to a JSON-lines log:
+#   PERF_LOG_PATH=perf.jsonl            one JSON object per span, per rerun
+#   PERF_PROM_PATH=/var/lib/node_exporter/dashboard.prom   (textfile collector)
+
+
+@dataclass
+class Span:
+    id: int
+    name: str
+    parent: int | None
+    start: float
+    duration_ms: float = 0.0
+    attrs: dict = field(default_factory=dict)
+
+
+class Trace:
+    def __init__(self, label: str = "rerun"):
+        self.label = label
+        self.wall_start = time.time()
+        self.t0 = time.perf_counter()
+        self.spans: list[Span] = []
+        self._stack: list[int] = []
+        self.duration_ms = 0.0
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        parent = self._stack[-1] if self._stack else None
+        s = Span(len(self.spans), name, parent, time.perf_counter(), attrs=dict(attrs))
+        self.spans.append(s)
+        self._stack.append(s.id)
+        try:
+            yield s
+        finally:
+            s.duration_ms = (time.perf_counter() - s.start) * 1000.0
+            self._stack.pop()
+
+    def finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self.t0) * 1000.0
+
+    def tree(self) -> list[tuple[int, Span]]:
+        """Spans in depth-first order with their nesting depth."""
+        children: dict[int | None, list[Span]] = {}
+        for s in self.spans:
+            children.setdefault(s.parent, []).append(s)
+        rows: list[tuple[int, Span]] = []
+
+        def walk(parent, depth):
+            for s in children.get(parent, []):
+                rows.append((depth, s))
+                walk(s.id, depth + 1)
+
+        walk(None, 0)
+        return rows
+
+    def to_jsonl(self) -> str:
+        lines = []
+        for s in self.spans:
+            lines.append(json.dumps({
+                "ts": round(self.wall_start + (s.start - self.t0), 6),
+                "trace": self.label,
+                "span": s.name,
+                "id": s.id,
+                "parent": s.parent,
+                "duration_ms": round(s.duration_ms, 3),
+                **s.attrs,
+            }, default=str))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+class _NullSpan:
+    attrs: dict = {}
+
+
+_current: ContextVar[Trace | None] = ContextVar("perf_trace", default=None)
+
+
+def start_trace(label: str = "rerun") -> Trace:
+    trace = Trace(label)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _current.get()
+    if trace is None:
+        yield _NullSpan()
+        return
+    with trace.span(name, **attrs) as s:
+        yield s
+
+
+def timed(name: str | None = None):
+    """Decorator: run the function inside a span (named after it by default)."""
+    def deco(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# ---------- EXPORT ----------
+
+class PerfRegistry:
+    """Process-wide span aggregates (count / total / max per span name, cache results)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.span_count: dict[str, int] = {}
+        self.span_sum_ms: dict[str, float] = {}
+        self.span_max_ms: dict[str, float] = {}
+        self.cache_results: dict[tuple[str, str], int] = {}
+        self.traces = 0
+        self.trace_sum_ms = 0.0
+
+    def record(self, trace: Trace) -> None:
+        with self._lock:
+            self.traces += 1
+            self.trace_sum_ms += trace.duration_ms
+            for s in trace.spans:
+                self.span_count[s.name] = self.span_count.get(s.name, 0) + 1
+                self.span_sum_ms[s.name] = self.span_sum_ms.get(s.name, 0.0) + s.duration_ms
+                self.span_max_ms[s.name] = max(self.span_max_ms.get(s.name, 0.0), s.duration_ms)
+                if "cache" in s.attrs:
+                    key = (s.name, s.attrs["cache"])
+                    self.cache_results[key] = self.cache_results.get(key, 0) + 1
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            out = [
+                "# HELP dashboard_reruns_total Completed dashboard reruns.",
+                "# TYPE dashboard_reruns_total counter",
+                f"dashboard_reruns_total {self.traces}",
+                "# HELP dashboard_rerun_ms_sum Total rerun wall time in milliseconds.",
+                "# TYPE dashboard_rerun_ms_sum counter",
+                f"dashboard_rerun_ms_sum {self.trace_sum_ms:.3f}",
+                "# HELP dashboard_span_ms Span wall time in milliseconds.",
+                "# TYPE dashboard_span_ms summary",
+            ]
+            for name in sorted(self.span_count):
+                label = _prom_label(name)
+                out.append(f'dashboard_span_ms_count{{span="{label}"}} {self.span_count[name]}')
+                out.append(f'dashboard_span_ms_sum{{span="{label}"}} {self.span_sum_ms[name]:.3f}')
+            out += [
+                "# HELP dashboard_span_ms_max Slowest observation per span in milliseconds.",
+                "# TYPE dashboard_span_ms_max gauge",
+            ]
+            for name in sorted(self.span_max_ms):
+                out.append(f'dashboard_span_ms_max{{span="{_prom_label(name)}"}} {self.span_max_ms[name]:.3f}')
+            out += [
+                "# HELP dashboard_cache_requests_total Cached loader / figure lookups by result (hit, stale, patch, miss).",
+                "# TYPE dashboard_cache_requests_total counter",
+            ]
+            for (name, result), n in sorted(self.cache_results.items()):
+                out.append(f'dashboard_cache_requests_total{{fn="{_prom_label(name)}",result="{result}"}} {n}')
+            return "\n".join(out) + "\n"
+
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+REGISTRY = PerfRegistry()
+_export_lock = threading.Lock()
+
+
+def finish_trace(trace: Trace) -> None:
+    """Close the trace, add it to the registry and write any configured exports."""
+    trace.finish()
+    REGISTRY.record(trace)
+    log_path = os.environ.get("PERF_LOG_PATH")
+    prom_path = os.environ.get("PERF_PROM_PATH")
+    if not (log_path or prom_path):
+        return
+    with _export_lock:
+        if log_path:
+            with open(log_path, "a", encoding="utf-8") as fh:
+                fh.write(trace.to_jsonl())
+        if prom_path:
+            tmp = Path(f"{prom_path}.tmp")
+            tmp.write_text(REGISTRY.to_prometheus(), encoding="utf-8")
+            tmp.replace(prom_path)
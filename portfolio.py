@@ -0,0 +1,185 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from holdings import HOLDINGS_SCHEMA, coerce, load_holdings
+from perf import timed
+
+# Pure-pandas position builders over the holdings frame (holdings.py). No
+# Streamlit here, so the builders can be benchmarked and reused outside the app.
+
+# ---------- PORTFOLIO BUILDERS ----------
+
+US_TZ = ZoneInfo("America/New_York")
+
+POSITION_COLUMNS = [
+    "Name", "Ticker", "Owner", "Sector", "Units", "PriceUSD", "ValueAED", "PurchaseAED",
+    "DayPct", "DayPLAED", "TotalPct", "TotalPLAED", "WeightPct",
+]
+
+# Holdings frames built from list-of-dict configs, keyed by id(). The config
+# itself is kept alongside so a recycled id() can never return a stale frame.
+_holdings_cache: dict[int, tuple[list[dict], pd.DataFrame]] = {}
+
+
+def holdings_frame(config: list[dict] | pd.DataFrame) -> pd.DataFrame:
+    """Holdings as a typed frame; list-of-dict configs are converted once and cached."""
+    if isinstance(config, pd.DataFrame):
+        return config if isinstance(config.index, pd.RangeIndex) else config.reset_index(drop=True)
+    cached = _holdings_cache.get(id(config))
+    if cached is not None and cached[0] is config and len(cached[1]) == len(config):
+        return cached[1]
+    frame = coerce(pd.DataFrame(config, columns=list(HOLDINGS_SCHEMA)), HOLDINGS_SCHEMA)
+    if len(_holdings_cache) > 16:
+        _holdings_cache.clear()
+    _holdings_cache[id(config)] = (config, frame)
+    return frame
+
+
+def _lookup(positions: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """values[positions] with -1 (unknown ticker) and NaN mapped to 0."""
+    picked = np.where(positions >= 0, values[positions], np.nan) if len(values) else np.full(len(positions), np.nan)
+    return np.nan_to_num(picked, nan=0.0)
+
+
+def reference_closes(prices_close: pd.DataFrame, tickers: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(latest close, previous close) per ticker, 0 where unknown.
+
+    If today's bar is already in the close frame, the previous close is the
+    bar before it.
+    """
+    if prices_close.empty:
+        return np.zeros(len(tickers)), np.zeros(len(tickers))
+    cols = prices_close.columns.get_indexer(tickers)
+    closes = prices_close.to_numpy(dtype="float64", na_value=np.nan)
+    last_is_today = prices_close.index[-1].date() == datetime.now(US_TZ).date()
+    ref_row = -2 if last_is_today and len(prices_close) >= 2 else -1
+    return _lookup(cols, closes[-1]), _lookup(cols, closes[ref_row])
+
+
+@timed()
+def build_positions_from_prices(
+    prices_close: pd.DataFrame,
+    prices_intraday: pd.Series | None,
+    usd_to_aed_rate: float,
+    config: list[dict] | pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """One row per holding with value and day / total P&L in AED.
+
+    Works on whole columns: each price source is indexed once for all tickers
+    and every derived figure is a NumPy expression, so the cost no longer
+    grows with a Python iteration per position.
+    """
+    holdings = holdings_frame(load_holdings() if config is None else config)
+    tickers = holdings["Ticker"]
+    units = holdings["Units"].to_numpy(dtype="float64")
+    purchase = holdings["PurchaseValAED"].to_numpy(dtype="float64")
+    n = len(holdings)
+
+    # 1. Live price: intraday, falling back to the latest close
+    live = np.zeros(n)
+    if prices_intraday is not None:
+        intraday = pd.to_numeric(prices_intraday, errors="coerce").to_numpy(dtype="float64")
+        live = _lookup(prices_intraday.index.get_indexer(tickers), intraday)
+
+    # 2. Previous close (reference for day P&L)
+    latest_close, prev_close = reference_closes(prices_close, tickers)
+    live = np.where(live == 0, latest_close, live)
+
+    priced = live > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_usd = np.where(priced, live, 0.0)
+        value_aed = np.where(priced, live * usd_to_aed_rate * units, purchase)
+        day_pct = np.where(priced & (prev_close > 0), (live / prev_close - 1.0) * 100.0, 0.0)
+        day_pl_aed = value_aed * (day_pct / 100.0)
+        total_pl_aed = np.where(priced, value_aed - purchase, 0.0)
+        total_pct = np.where(priced & (purchase > 0), total_pl_aed / purchase * 100.0, 0.0)
+
+    total_val = value_aed.sum()
+    weight = value_aed / total_val * 100.0 if total_val > 0 else np.zeros(n)
+
+    return pd.DataFrame(
+        {
+            "Name": holdings["Name"],
+            "Ticker": tickers,
+            "Owner": holdings["Owner"],
+            "Sector": holdings["Sector"],
+            "Units": units,
+            "PriceUSD": price_usd,
+            "ValueAED": value_aed,
+            "PurchaseAED": purchase,
+            "DayPct": day_pct,
+            "DayPLAED": day_pl_aed,
+            "TotalPct": total_pct,
+            "TotalPLAED": total_pl_aed,
+            "WeightPct": weight,
+        },
+        columns=POSITION_COLUMNS,
+    )
+
+
+TOTAL_COLUMNS = ["Units", "ValueAED", "PurchaseAED", "DayPLAED", "TotalPLAED"]
+
+
+def _owner_sums(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    """(owner code per row, owners in holdings order, per-owner sums and percentages).
+
+    One group-by pass: owners are factorized in holdings order and every
+    total column is summed with a single bincount. DayPct is day P&L over
+    current value, matching the rolled-up heatmap tiles.
+    """
+    codes, owners = pd.factorize(df["Owner"], sort=False)
+    sums = {
+        col: np.bincount(codes, weights=df[col].to_numpy(dtype="float64"), minlength=len(owners))
+        for col in TOTAL_COLUMNS
+    }
+    value, purchase = sums["ValueAED"], sums["PurchaseAED"]
+    total_val_all = value.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sums["DayPct"] = np.where(value > 0, sums["DayPLAED"] / value * 100.0, 0.0)
+        sums["TotalPct"] = np.where(purchase > 0, sums["TotalPLAED"] / purchase * 100.0, 0.0)
+        sums["WeightPct"] = value / total_val_all * 100.0 if total_val_all > 0 else np.zeros(len(owners))
+    return codes, np.asarray(owners, dtype=object), sums
+
+
+@timed()
+def aggregate_for_heatmap(df: pd.DataFrame, detail_owner: str | None = None) -> pd.DataFrame:
+    """Heatmap rows: `detail_owner`'s positions individually, every other owner as one tile.
+
+    `detail_owner` defaults to the first owner in the holdings file (MV).
+    Roll-up tiles are named "<owner> Portfolio" with ticker "<owner>PF".
+    The result is assembled column by column from NumPy arrays and built as
+    one frame (no boolean-mask copy or concat; those dominated at this size).
+    """
+    if df.empty:
+        return df
+    if detail_owner is None:
+        detail_owner = df["Owner"].iloc[0]
+    codes, owners, sums = _owner_sums(df)
+    rolled = owners != detail_owner
+    if not rolled.any():
+        return df.reset_index(drop=True)
+    detail = np.flatnonzero(~rolled[codes])
+
+    names = [str(owner) for owner in owners[rolled]]
+    rollups = {
+        "Name": [f"{owner} Portfolio" for owner in names],
+        "Ticker": [f"{owner}PF" for owner in names],
+        "Owner": names,
+        "Sector": ["Mixed"] * len(names),
+        "PriceUSD": np.zeros(len(names)),
+        **{col: sums[col][rolled] for col in TOTAL_COLUMNS + ["DayPct", "TotalPct", "WeightPct"]},
+    }
+    value = df["ValueAED"].to_numpy(dtype="float64")
+    total_val_all = value.sum()
+    weight = value[detail] / total_val_all * 100.0 if total_val_all > 0 else np.zeros(len(detail))
+    columns = {}
+    for col, dtype in df.dtypes.items():
+        values = weight if col == "WeightPct" else df[col].to_numpy()[detail]
+        # Categorical labels come out as strings, as pd.concat with plain string rows would
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = "string"
+        columns[col] = pd.array(np.concatenate([values, np.asarray(rollups[col], dtype=values.dtype)]), dtype=dtype)
+    return pd.DataFrame(columns)
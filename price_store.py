@@ -0,0 +1,158 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ---------- LOCAL DAILY CLOSE / NAV STORE ----------
+# One row per (ticker, date) and per (AMFI code, date). Lives on disk so a
+# Streamlit restart keeps the full daily history and refreshes only need the
+# bars / NAVs after the last stored date.
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+PRICE_STORE_PATH = DATA_DIR / "prices.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_close (
+    ticker TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    close  REAL NOT NULL,
+    PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS nav_history (
+    code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    nav  REAL NOT NULL,
+    PRIMARY KEY (code, date)
+) WITHOUT ROWID;
+"""
+
+
+class PriceStore:
+    """Thin SQLite wrapper. Opens a short-lived connection per call so it is
+    safe to share between Streamlit script threads."""
+
+    def __init__(self, path: Path = PRICE_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def last_dates(self, tickers: list[str]) -> dict[str, date]:
+        """Latest stored bar per ticker. Tickers with no history are omitted."""
+        if not tickers:
+            return {}
+        marks = ",".join("?" * len(tickers))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT ticker, MAX(date) FROM daily_close WHERE ticker IN ({marks}) GROUP BY ticker",
+                list(tickers),
+            ).fetchall()
+        return {t: date.fromisoformat(d) for t, d in rows if d}
+
+    def upsert_closes(self, close: pd.DataFrame) -> int:
+        """Write a wide (date x ticker) close frame. Existing bars are overwritten,
+        which lets the still-forming bar for today be refreshed in place."""
+        if close is None or close.empty:
+            return 0
+        values = close.to_numpy(dtype=float)
+        row_idx, col_idx = np.nonzero(~np.isnan(values))
+        if len(row_idx) == 0:
+            return 0
+        dates = pd.to_datetime(close.index).strftime("%Y-%m-%d").to_numpy()
+        tickers = close.columns.astype(str).to_numpy()
+        records = list(zip(tickers[col_idx], dates[row_idx], values[row_idx, col_idx].tolist()))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily_close (ticker, date, close) VALUES (?, ?, ?)",
+                records,
+            )
+        return len(records)
+
+    def delete_tickers(self, tickers: list[str]) -> None:
+        if not tickers:
+            return
+        marks = ",".join("?" * len(tickers))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM daily_close WHERE ticker IN ({marks})", list(tickers))
+
+    def read_closes(self, tickers: list[str], start: date | None = None) -> pd.DataFrame:
+        """Wide close frame (DatetimeIndex x ticker) for the requested tickers."""
+        if not tickers:
+            return pd.DataFrame()
+        marks = ",".join("?" * len(tickers))
+        sql = f"SELECT date, ticker, close FROM daily_close WHERE ticker IN ({marks})"
+        params: list = list(tickers)
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(start.isoformat())
+        with closing(self._connect()) as conn:
+            long = pd.read_sql_query(sql, conn, params=params)
+        if long.empty:
+            return pd.DataFrame()
+        wide = long.pivot(index="date", columns="ticker", values="close")
+        wide.index = pd.to_datetime(wide.index)
+        wide.index.name = "Date"
+        wide.columns.name = None
+        return wide.sort_index()
+
+    # --- MF NAV history ---
+
+    def upsert_navs(self, rows) -> int:
+        """Append (code, date, nav) points; re-published NAVs for a date overwrite."""
+        records = [(str(code), d.isoformat(), float(nav)) for code, d, nav in rows]
+        if not records:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO nav_history (code, date, nav) VALUES (?, ?, ?)",
+                records,
+            )
+        return len(records)
+
+    def nav_heads(self, codes: list[str]) -> dict[str, list[tuple[date, float]]]:
+        """Two most recent (date, nav) points per code, newest first."""
+        if not codes:
+            return {}
+        marks = ",".join("?" * len(codes))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT code, date, nav FROM (
+                    SELECT code, date, nav,
+                           ROW_NUMBER() OVER (PARTITION BY code ORDER BY date DESC) AS rn
+                    FROM nav_history WHERE code IN ({marks})
+                ) WHERE rn <= 2 ORDER BY code, date DESC
+                """,
+                list(codes),
+            ).fetchall()
+        heads: dict[str, list[tuple[date, float]]] = {}
+        for code, d, nav in rows:
+            heads.setdefault(code, []).append((date.fromisoformat(d), nav))
+        return heads
+
+    def read_navs(self, codes: list[str], start: date | None = None) -> pd.DataFrame:
+        """Wide NAV frame (DatetimeIndex x code) for the requested codes."""
+        if not codes:
+            return pd.DataFrame()
+        marks = ",".join("?" * len(codes))
+        sql = f"SELECT date, code, nav FROM nav_history WHERE code IN ({marks})"
+        params: list = list(codes)
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(start.isoformat())
+        with closing(self._connect()) as conn:
+            long = pd.read_sql_query(sql, conn, params=params)
+        if long.empty:
+            return pd.DataFrame()
+        wide = long.pivot(index="date", columns="code", values="nav")
+        wide.index = pd.to_datetime(wide.index)
+        wide.index.name = "Date"
+        wide.columns.name = None
+        return wide.sort_index()
@@ -0,0 +1,262 @@
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Iterable
+
+import requests
+import yfinance as yf
+from requests.adapters import HTTPAdapter
+
+# ---------- MARKET-DATA PROVIDERS ----------
+# Every upstream call made by market_data.py / amfi.py goes through one of
+# these primitives, so the whole data layer can be recorded once and then
+# replayed offline (optionally with injected latency) for tests and benchmarks.
+#
+#   download(tickers, **kw)   -> yf.download(...)
+#   history(ticker, **kw)     -> yf.Ticker(ticker).history(...)
+#   get_json(url, timeout)    -> HTTP GET, parsed JSON (raises on HTTP errors)
+#   get_lines(url, timeout)   -> HTTP GET, body as text lines (raises on HTTP errors)
+#
+# Selected with MARKET_DATA_PROVIDER=live|record|replay (default live) and
+# MARKET_DATA_RECORDINGS=<dir>; REPLAY_LATENCY_MS adds a fixed delay per call.
+
+DEFAULT_RECORDINGS_DIR = Path(__file__).resolve().parent / "data" / "recordings"
+HTTP_POOL_SIZE = 8
+
+
+class MarketDataProvider(ABC):
+    """Interface for upstream market-data access."""
+
+    name = "base"
+
+    @abstractmethod
+    def download(self, tickers: list[str], **kwargs) -> Any: ...
+
+    @abstractmethod
+    def history(self, ticker: str, **kwargs) -> Any: ...
+
+    @abstractmethod
+    def get_json(self, url: str, timeout: float) -> Any: ...
+
+    @abstractmethod
+    def get_lines(self, url: str, timeout: float) -> Iterable[str]: ...
+
+
+class LiveProvider(MarketDataProvider):
+    """yfinance for prices/FX/indices, a pooled requests.Session for AMFI/mfapi."""
+
+    name = "live"
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        self._pool_size = pool_size
+        self._session: requests.Session | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def download(self, tickers: list[str], **kwargs) -> Any:
+        return yf.download(tickers=tickers, **kwargs)
+
+    def history(self, ticker: str, **kwargs) -> Any:
+        return yf.Ticker(ticker).history(**kwargs)
+
+    def get_json(self, url: str, timeout: float) -> Any:
+        response = self.session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def get_lines(self, url: str, timeout: float) -> Iterable[str]:
+        with self.session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                yield line
+
+
+# Arguments that move with the clock without changing what kind of data comes back
+_LOOSE_IGNORED = frozenset({"start", "end", "timeout"})
+
+
+def _call_key(method: str, args: tuple, kwargs: dict) -> str:
+    """Stable file key for one call; URL timeouts don't affect the response."""
+    kwargs = {k: v for k, v in kwargs.items() if k != "timeout"}
+    raw = repr((method, args, sorted(kwargs.items())))
+    return f"{method}-{hashlib.sha1(raw.encode()).hexdigest()[:16]}"
+
+
+def _loose_key(method: str, args: tuple, kwargs: dict) -> str:
+    """Key ignoring date-range kwargs, used when an exact replay match is missing.
+
+    interval, period and the other shape arguments stay in, so a daily-close
+    sync is never answered with a recording of 1m bars.
+    """
+    kwargs = {k: v for k, v in kwargs.items() if k not in _LOOSE_IGNORED}
+    raw = repr((method, args, sorted(kwargs.items())))
+    return f"{method}-loose-{hashlib.sha1(raw.encode()).hexdigest()[:16]}"
+
+
+class RecordingProvider(MarketDataProvider):
+    """Pass-through to another provider that pickles every response (or error) to disk."""
+
+    name = "record"
+
+    def __init__(self, inner: MarketDataProvider, directory: Path = DEFAULT_RECORDINGS_DIR):
+        self.inner = inner
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _record(self, method: str, args: tuple, kwargs: dict) -> Any:
+        entry = {"method": method, "args": args, "kwargs": kwargs}
+        try:
+            result = getattr(self.inner, method)(*args, **kwargs)
+            if method == "get_lines":
+                result = list(result)
+            entry["result"] = result
+        except Exception as exc:
+            entry["error"] = exc
+            result = None
+        try:
+            payload = pickle.dumps(entry)
+        except Exception:
+            if "error" not in entry:
+                # A good result that can't be pickled is still returned, just not recorded
+                return result
+            # Some HTTP errors hold unpicklable response objects
+            entry["error"] = RuntimeError(f"{type(entry['error']).__name__}: {entry['error']}")
+            payload = pickle.dumps(entry)
+        for key in (_call_key(method, args, kwargs), _loose_key(method, args, kwargs)):
+            tmp = self.directory / f".{key}.tmp-{threading.get_ident()}"
+            tmp.write_bytes(payload)
+            tmp.replace(self.directory / f"{key}.pkl")
+        if "error" in entry:
+            raise entry["error"]
+        return result
+
+    def download(self, tickers: list[str], **kwargs) -> Any:
+        return self._record("download", (tuple(tickers),), kwargs)
+
+    def history(self, ticker: str, **kwargs) -> Any:
+        return self._record("history", (ticker,), kwargs)
+
+    def get_json(self, url: str, timeout: float) -> Any:
+        return self._record("get_json", (url,), {"timeout": timeout})
+
+    def get_lines(self, url: str, timeout: float) -> Iterable[str]:
+        return self._record("get_lines", (url,), {"timeout": timeout})
+
+
+class ReplayError(LookupError):
+    """No recording exists for a replayed call."""
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recordings made by RecordingProvider, with optional latency injection.
+
+    `latency` is seconds added to every call; `jitter` adds up to that many
+    extra seconds at random (seeded, so runs are reproducible). Calls without
+    an exact recording fall back to the latest recording of the same call
+    with any start / end dates unless `strict` is set.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_RECORDINGS_DIR,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        strict: bool = False,
+        seed: int = 0,
+    ):
+        self.directory = Path(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.strict = strict
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._cache: dict[str, dict] = {}
+
+    def _load(self, key: str) -> dict | None:
+        if key not in self._cache:
+            path = self.directory / f"{key}.pkl"
+            if not path.exists():
+                return None
+            self._cache[key] = pickle.loads(path.read_bytes())
+        return self._cache[key]
+
+    def _replay(self, method: str, args: tuple, kwargs: dict) -> Any:
+        delay = self.latency
+        if self.jitter:
+            with self._rng_lock:
+                delay += self._rng.uniform(0.0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        entry = self._load(_call_key(method, args, kwargs))
+        if entry is None and not self.strict:
+            entry = self._load(_loose_key(method, args, kwargs))
+        if entry is None:
+            raise ReplayError(f"no recording for {method}{args}")
+        if "error" in entry:
+            raise entry["error"]
+        result = entry["result"]
+        # Hand out copies so callers can't mutate the cached recording
+        return result.copy() if hasattr(result, "copy") else result
+
+    def download(self, tickers: list[str], **kwargs) -> Any:
+        return self._replay("download", (tuple(tickers),), kwargs)
+
+    def history(self, ticker: str, **kwargs) -> Any:
+        return self._replay("history", (ticker,), kwargs)
+
+    def get_json(self, url: str, timeout: float) -> Any:
+        return self._replay("get_json", (url,), {"timeout": timeout})
+
+    def get_lines(self, url: str, timeout: float) -> Iterable[str]:
+        return iter(self._replay("get_lines", (url,), {"timeout": timeout}))
+
+
+# ---------- ACTIVE PROVIDER ----------
+
+_provider: MarketDataProvider | None = None
+_provider_lock = threading.Lock()
+
+
+def provider_from_env() -> MarketDataProvider:
+    mode = os.environ.get("MARKET_DATA_PROVIDER", "live").lower()
+    directory = Path(os.environ.get("MARKET_DATA_RECORDINGS", DEFAULT_RECORDINGS_DIR))
+    if mode == "record":
+        return RecordingProvider(LiveProvider(), directory)
+    if mode == "replay":
+        latency = float(os.environ.get("REPLAY_LATENCY_MS", "0")) / 1000.0
+        return ReplayProvider(directory, latency=latency)
+    return LiveProvider()
+
+
+def get_provider() -> MarketDataProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_from_env()
+        return _provider
+
+
+def set_provider(provider: MarketDataProvider | None) -> MarketDataProvider | None:
+    """Swap the process-wide provider (None resets to the environment default).
+    Returns the previous one so callers can restore it."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+        return previous
@@ -0,0 +1,345 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Hashable, Mapping
+
+from perf import span
+
+# ---------- BACKGROUND MARKET-DATA REFRESHER ----------
+# One instance per process (the dashboard creates it via st.cache_resource).
+# Each source is refreshed by its own daemon thread on its own interval, and
+# every successful refresh publishes a new immutable MarketSnapshot. Page runs
+# only ever read the current snapshot, so they never wait on yfinance or AMFI.
+# An interval may be a schedule (see sessions.py) returning seconds, or None
+# to freeze the source; schedules are re-checked at least every
+# SCHEDULE_RECHECK_S, so a session opening is picked up within that time.
+
+SCHEDULE_RECHECK_S = 60.0
+
+
+@dataclass(frozen=True)
+class RefreshSource:
+    name: str
+    fetch: Callable[[], Any]
+    # Seconds between refresh starts, or a schedule returning them (None: frozen)
+    interval: float | Callable[[], float | None]
+    default: Any = None        # served until the first successful fetch
+    # Hard limit: a page run that finds the value older than this refreshes it
+    # synchronously (see revalidate_expired); None never blocks
+    max_age: float | None = None
+
+
+@dataclass(frozen=True)
+class Aged:
+    """A cached value plus when it was fetched (None: never, i.e. a default)."""
+    value: Any
+    fetched_at: float | None = None
+
+    @property
+    def age(self) -> float | None:
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Read-only view of the latest value per source.
+
+    Values are shared with the refresher and with other sessions: treat
+    DataFrames/Series as read-only and `.copy()` before mutating.
+    """
+    values: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    updated_at: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    # Wall time of the last fetch per source, successful or not (milliseconds)
+    fetch_ms: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    version: int = 0
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+    def age(self, name: str) -> float | None:
+        """Seconds since `name` was last refreshed, or None if it never was."""
+        ts = self.updated_at.get(name)
+        return None if ts is None else time.time() - ts
+
+    def aged(self, name: str) -> Aged:
+        return Aged(self.values[name], self.updated_at.get(name))
+
+
+_UNCHANGED = object()
+
+
+def _is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    empty = getattr(value, "empty", None)
+    if isinstance(empty, bool):
+        return empty
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+class MarketDataRefresher:
+    def __init__(self, sources: list[RefreshSource]):
+        self._sources = {s.name: s for s in sources}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._first_pass = {name: threading.Event() for name in self._sources}
+        # One fetch per source at a time, whether from its thread or a page run
+        self._fetch_locks = {name: threading.Lock() for name in self._sources}
+        self._attempted_at: dict[str, float] = {}
+        self._threads: list[threading.Thread] = []
+        self._snapshot = MarketSnapshot(
+            values=MappingProxyType({s.name: s.default for s in sources}),
+        )
+
+    def start(self) -> "MarketDataRefresher":
+        if self._threads:
+            return self
+        for source in self._sources.values():
+            thread = threading.Thread(
+                target=self._run, args=(source,), name=f"refresh-{source.name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> MarketSnapshot:
+        return self._snapshot
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Block until every source has completed its first fetch attempt.
+
+        Only the very first page view of a fresh process can wait here; after
+        that all events are set and this returns immediately.
+        """
+        deadline = time.monotonic() + timeout
+        for event in self._first_pass.values():
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def refresh_now(self, name: str) -> None:
+        """Synchronous refresh of one source (used by tooling, not page runs)."""
+        self._refresh(self._sources[name])
+
+    def revalidate_expired(self) -> list[str]:
+        """Synchronously refresh sources whose value is past their max_age.
+
+        Normally a no-op: the threads keep every source well inside its
+        max_age. It only blocks when a source has fallen behind (its thread
+        stuck, or upstream failing), and then at most once per interval, so an
+        outage costs one slow page run per interval rather than every run.
+        """
+        refreshed = []
+        for source in self._sources.values():
+            if self._expired(source):
+                with self._fetch_locks[source.name]:
+                    if not self._expired(source):
+                        continue
+                    self._refresh_locked(source)
+                refreshed.append(source.name)
+        return refreshed
+
+    def interval(self, name: str) -> float | None:
+        """Current refresh interval of a source in seconds; None while it is frozen."""
+        interval = self._sources[name].interval
+        return interval() if callable(interval) else interval
+
+    def frozen(self, name: str) -> bool:
+        return self.interval(name) is None
+
+    def _expired(self, source: RefreshSource) -> bool:
+        # A frozen source is as fresh as it can be, however old its value
+        interval = self.interval(source.name)
+        if source.max_age is None or interval is None:
+            return False
+        age = self._snapshot.age(source.name)
+        attempted = self._attempted_at.get(source.name)
+        due = attempted is None or time.time() - attempted >= interval
+        return age is not None and age > source.max_age and due
+
+    def _run(self, source: RefreshSource) -> None:
+        # Always fetch once, so a fresh process has data even for a frozen source
+        started = time.monotonic()
+        self._refresh(source)
+        self._first_pass[source.name].set()
+        while not self._stop.is_set():
+            interval = self.interval(source.name)
+            if interval is None:
+                self._stop.wait(SCHEDULE_RECHECK_S)
+                continue
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                self._stop.wait(min(remaining, SCHEDULE_RECHECK_S))
+                continue
+            started = time.monotonic()
+            self._refresh(source)
+
+    def _refresh(self, source: RefreshSource) -> None:
+        with self._fetch_locks[source.name]:
+            self._refresh_locked(source)
+
+    def _refresh_locked(self, source: RefreshSource) -> None:
+        self._attempted_at[source.name] = time.time()
+        started = time.perf_counter()
+        try:
+            value = source.fetch()
+        except Exception:
+            value = _UNCHANGED
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        # An empty result means upstream failed; keep serving the last good value
+        if value is not _UNCHANGED and _is_empty(value) and not _is_empty(self._snapshot.values.get(source.name)):
+            value = _UNCHANGED
+        self._publish(source.name, elapsed_ms, value)
+
+    def _publish(self, name: str, fetch_ms: float, value: Any = _UNCHANGED) -> None:
+        with self._lock:
+            current = self._snapshot
+            values, updated_at = current.values, current.updated_at
+            if value is not _UNCHANGED:
+                values = dict(values)
+                values[name] = value
+                updated_at = dict(updated_at)
+                updated_at[name] = time.time()
+            timings = dict(current.fetch_ms)
+            timings[name] = fetch_ms
+            self._snapshot = MarketSnapshot(
+                values=MappingProxyType(values),
+                updated_at=MappingProxyType(updated_at),
+                fetch_ms=MappingProxyType(timings),
+                version=current.version + (value is not _UNCHANGED),
+            )
+
+
+# ---------- STALE-WHILE-REVALIDATE LOADERS ----------
+# For loaders a page run calls directly instead of reading the snapshot. A call
+# returns the last good value at once. Past `fresh_for` it also starts a single
+# background refetch; only past `max_age` does the caller wait for one. A
+# failed or empty refetch keeps the last good value, and refetches are tried at
+# most once per `fresh_for`. Results come back as Aged so pages can show how
+# old they are. Caches are process-wide and keyed by the function's qualified
+# name, so they survive Streamlit re-executing the script that defines them.
+# Each cache keeps the SWR_MAX_ENTRIES most recently read argument tuples;
+# callers pass dated ranges and changing ticker lists, so older keys are
+# evicted rather than kept for the life of the process.
+
+SWR_MAX_ENTRIES = 16
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "attempted_at", "refreshing", "lock")
+
+    def __init__(self):
+        self.value: Any = None
+        self.fetched_at: float | None = None
+        self.attempted_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+
+class StaleWhileRevalidate:
+    def __init__(self, fresh_for: float, max_age: float, max_entries: int = SWR_MAX_ENTRIES):
+        self.fresh_for = fresh_for
+        self.max_age = max(max_age, fresh_for)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+
+    def get(self, fn: Callable, args: tuple, kwargs: dict) -> tuple[Aged, str]:
+        """(value, "hit" | "stale" | "miss"); "miss" means the caller waited for a fetch."""
+        key = (args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        arrived = time.time()
+        if entry.fetched_at is not None:
+            age = arrived - entry.fetched_at
+            if age < self.fresh_for:
+                return Aged(entry.value, entry.fetched_at), "hit"
+            due = arrived - entry.attempted_at >= self.fresh_for
+            if age < self.max_age or not due:
+                if due:
+                    self._revalidate_async(entry, fn, args, kwargs)
+                return Aged(entry.value, entry.fetched_at), "stale"
+        # Nothing usable yet, or expired: one caller fetches, the others wait for its result
+        with entry.lock:
+            expired = entry.fetched_at is None or time.time() - entry.fetched_at >= self.max_age
+            if expired and (entry.fetched_at is None or entry.attempted_at < arrived):
+                self._fetch(entry, fn, args, kwargs)
+            return Aged(entry.value, entry.fetched_at), "miss"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _revalidate_async(self, entry: _Entry, fn: Callable, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+
+        def run():
+            try:
+                with entry.lock:
+                    self._fetch(entry, fn, args, kwargs)
+            except Exception:
+                pass
+            finally:
+                entry.refreshing = False
+
+        threading.Thread(target=run, name=f"swr-{fn.__name__}", daemon=True).start()
+
+    @staticmethod
+    def _fetch(entry: _Entry, fn: Callable, args: tuple, kwargs: dict) -> None:
+        entry.attempted_at = time.time()
+        try:
+            value = fn(*args, **kwargs)
+        except Exception:
+            if entry.fetched_at is None:
+                raise
+            return
+        if entry.fetched_at is not None and _is_empty(value) and not _is_empty(entry.value):
+            return
+        entry.value, entry.fetched_at = value, time.time()
+
+
+_SWR_CACHES: dict[str, StaleWhileRevalidate] = {}
+_SWR_LOCK = threading.Lock()
+
+
+def stale_while_revalidate(fresh_for: float, max_age: float):
+    """Decorator: cache per argument tuple and return Aged results (see above).
+
+    Arguments must be hashable. The wrapper records a span tagged
+    cache=hit|stale|miss and exposes `.clear()`.
+    """
+    def deco(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        with _SWR_LOCK:
+            cache = _SWR_CACHES.get(name)
+            if cache is None or (cache.fresh_for, cache.max_age) != (fresh_for, max(max_age, fresh_for)):
+                cache = _SWR_CACHES[name] = StaleWhileRevalidate(fresh_for, max_age)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> Aged:
+            with span(fn.__name__) as s:
+                result, outcome = cache.get(fn, args, kwargs)
+                s.attrs["cache"] = outcome
+                return result
+
+        wrapper.clear = cache.clear
+        return wrapper
+    return deco
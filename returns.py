@@ -0,0 +1,173 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from fx import FxMatrix
+from perf import timed
+
+# ---------- MONEY-WEIGHTED RETURNS (XIRR) ----------
+# Annualized internal rate of return of each holding line, owner and the whole
+# portfolio, from the transaction ledger's dated cash flows plus today's value
+# as a final inflow. Absolute returns ignore timing, which flatters or
+# punishes lots bought years apart (ELSS instalments); XIRR does not.
+#
+# All series are solved together. Cash flows stay ragged (one flat array with
+# a series index per flow) and every iteration evaluates NPV and its
+# derivative for all series with two np.bincount calls. The unknown is
+# x = log(1 + rate): Newton steps in x, kept inside a per-series bracket and
+# replaced by bisection whenever they would leave it.
+
+DAYS_PER_YEAR = 365.0
+# Book currency per ledger Kind
+KIND_CURRENCY = {"US": "AED", "MF": "INR"}
+# Rates searched: -99.99% to +10,000% a year
+XIRR_X_BOUNDS = (np.log(1e-4), np.log(101.0))
+XIRR_TOL = 1e-10
+XIRR_MAX_ITER = 100
+# exp() argument cap, well below float64 overflow
+_EXP_CAP = 700.0
+
+PORTFOLIO_LABEL = "Portfolio"
+
+
+def _npv(x: np.ndarray, series: np.ndarray, years: np.ndarray, amounts: np.ndarray, n: int):
+    """NPV and d(NPV)/dx per series at x (one value per series)."""
+    weighted = amounts * np.exp(np.clip(-x[series] * years, -_EXP_CAP, _EXP_CAP))
+    return (
+        np.bincount(series, weights=weighted, minlength=n),
+        np.bincount(series, weights=-years * weighted, minlength=n),
+    )
+
+
+@timed()
+def xirr(series: np.ndarray, years: np.ndarray, amounts: np.ndarray, n_series: int | None = None) -> np.ndarray:
+    """Annualized IRR per series for ragged cash flows.
+
+    Flow k belongs to series[k], happens at years[k] (any common origin) and
+    has signed amount amounts[k] (negative = money invested). Series whose
+    flows never change sign get NaN.
+    """
+    series = np.asarray(series, dtype=np.intp)
+    years = np.asarray(years, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    n = int(n_series if n_series is not None else (series.max() + 1 if len(series) else 0))
+
+    lo, hi = np.full(n, XIRR_X_BOUNDS[0]), np.full(n, XIRR_X_BOUNDS[1])
+    f_lo, _ = _npv(lo, series, years, amounts, n)
+    f_hi, _ = _npv(hi, series, years, amounts, n)
+    solvable = np.sign(f_lo) * np.sign(f_hi) < 0
+
+    x = np.where(solvable, np.log(1.1), 0.0)
+    active = solvable.copy()
+    for _ in range(XIRR_MAX_ITER):
+        if not active.any():
+            break
+        f, df = _npv(x, series, years, amounts, n)
+        # Shrink the bracket around the root
+        below = active & (np.sign(f) == np.sign(f_lo))
+        lo, f_lo = np.where(below, x, lo), np.where(below, f, f_lo)
+        hi = np.where(active & ~below, x, hi)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = x - f / df
+        finite = np.isfinite(newton)
+        # Exact root, a vanishing Newton step or a collapsed bracket: keep the point
+        converged = (f == 0.0) | (finite & (np.abs(newton - x) < XIRR_TOL)) | (hi - lo < XIRR_TOL)
+        inside = finite & (newton > lo) & (newton < hi)
+        x_next = np.where(inside, newton, 0.5 * (lo + hi))
+        x_next = np.where(converged, np.where(finite, newton, x), x_next)
+
+        x = np.where(active, x_next, x)
+        active &= ~converged
+
+    rates = np.expm1(x)
+    rates[~solvable] = np.nan
+    return rates
+
+
+def ledger_lines(tx: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """(lines, line id per transaction row) with lines in order of first appearance."""
+    keys = tx[["Kind", "Owner", "Symbol", "Name"]].astype(str)
+    line_id = keys.groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+    return keys.drop_duplicates(ignore_index=True), line_id
+
+
+@timed()
+def returns_table(tx: pd.DataFrame, prices: dict[str, float], fx: FxMatrix, as_of: date) -> pd.DataFrame:
+    """Invested, value, absolute return and XIRR (INR) per portfolio, owner and holding line.
+
+    prices maps a symbol to today's price per unit in its book currency (AED
+    for US tickers, INR for AMFI codes). Cash flows are the ledger's BUY
+    (out), SELL and DIVIDEND (in) amounts; an open line's units x price is a
+    final inflow on as_of. Each flow is converted to INR at the rate of its
+    own date and the final value at spot, so the XIRR of a US line includes
+    the rupee's move against the dirham. Open lines without a price are left
+    out of every row.
+    """
+    lines, line_id = ledger_lines(tx)
+    n_lines = len(lines)
+    tx_type = tx["Type"].astype(str).str.upper().to_numpy()
+    amount = tx["Amount"].fillna(0.0).to_numpy(dtype=float)
+    units = tx["Units"].fillna(0.0).to_numpy(dtype=float)
+
+    currency = lines["Kind"].map(KIND_CURRENCY).fillna("INR").to_numpy()
+    tx_dates = tx["Date"].to_numpy(dtype="datetime64[ns]")
+    flow = np.select([tx_type == "BUY", np.isin(tx_type, ["SELL", "DIVIDEND"])], [-amount, amount], 0.0)
+    flow_inr = fx.convert(flow, currency[line_id], "INR", on=tx_dates)
+    invested = np.bincount(line_id, weights=np.where(tx_type == "BUY", -flow_inr, 0.0), minlength=n_lines)
+    received = np.bincount(line_id, weights=np.where(flow > 0, flow_inr, 0.0), minlength=n_lines)
+
+    held = np.bincount(line_id, weights=np.select([tx_type == "BUY", tx_type == "SELL"], [units, -units], 0.0),
+                       minlength=n_lines)
+    held[np.abs(held) < 1e-9] = 0.0
+    price = lines["Symbol"].map(prices).to_numpy(dtype=float)
+    value = fx.convert(np.where(held > 0, held * price, 0.0), currency, "INR")
+    priced = ~np.isnan(value)
+
+    owners, owner_code = np.unique(lines["Owner"].to_numpy(), return_inverse=True)
+    n_owners = len(owners)
+    n_series = n_lines + n_owners + 1
+
+    # Every flow (and terminal value) counted once per level: its line, its owner, the portfolio
+    flow_line = np.concatenate([line_id, np.flatnonzero(held > 0)])
+    flow_years = np.concatenate([
+        (tx_dates - np.datetime64(as_of, "ns")) / np.timedelta64(1, "D")
+        / DAYS_PER_YEAR,
+        np.zeros(int((held > 0).sum())),
+    ])
+    flow_amount = np.concatenate([flow_inr, value[held > 0]])
+    keep = priced[flow_line]
+    flow_line, flow_years, flow_amount = flow_line[keep], flow_years[keep], flow_amount[keep]
+    rates = xirr(
+        np.concatenate([flow_line, n_lines + owner_code[flow_line], np.full(len(flow_line), n_series - 1)]),
+        np.tile(flow_years, 3),
+        np.tile(flow_amount, 3),
+        n_series,
+    )
+
+    def level_sums(per_line: np.ndarray) -> np.ndarray:
+        """Holding rows as given; owner and portfolio rows summed over priced lines."""
+        counted = np.where(priced, per_line, 0.0)
+        by_owner = np.bincount(owner_code, weights=counted, minlength=n_owners)
+        return np.concatenate([per_line, by_owner, [counted.sum()]])
+
+    table = pd.DataFrame({
+        "Level": ["Holding"] * n_lines + ["Owner"] * n_owners + [PORTFOLIO_LABEL],
+        "Name": list(lines["Name"]) + list(owners) + [PORTFOLIO_LABEL],
+        "Owner": list(lines["Owner"]) + list(owners) + [""],
+        "InvestedINR": level_sums(invested),
+        "ReceivedINR": level_sums(received),
+        "ValueINR": level_sums(value),
+        "XIRRPct": rates * 100.0,
+    })
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["ReturnPct"] = np.where(
+            table["InvestedINR"] > 0,
+            (table["ValueINR"] + table["ReceivedINR"] - table["InvestedINR"]) / table["InvestedINR"] * 100.0,
+            np.nan,
+        )
+    order = {"Holding": 2, "Owner": 1, PORTFOLIO_LABEL: 0}
+    table = table.sort_values(["Level", "ValueINR"], key=lambda s: s.map(order) if s.name == "Level" else -s,
+                              kind="stable")
+    return table.reset_index(drop=True)
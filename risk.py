@@ -0,0 +1,291 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from perf import span, timed
+
+# ---------- ROLLING RISK ----------
+# Rolling volatility, beta against the Nasdaq 100, drawdown and the pairwise
+# correlation of the holdings' daily returns, over closes from the local store.
+#
+# For the last RISK_WINDOW daily returns the engine keeps, per pair of symbols
+# (i, j), four sums over the days both traded: the count and the sums of r_i,
+# r_i^2 and r_i * r_j. A new bar adds its row of returns and subtracts the row
+# leaving the window (one outer product each, O(symbols^2)), so history is
+# never rescanned. Pairwise counts keep late listings exact, like pandas'
+# pairwise corr(). The sums are re-added from the ring each time it wraps, so
+# add / subtract rounding cannot accumulate.
+#
+# Drawdown is measured against the high of the last DRAWDOWN_WINDOW closes,
+# kept in a second ring. The live intraday price is applied as a provisional
+# bar on copies of both, which leaves the state untouched and costs about a
+# millisecond, so the tab can follow every price tick.
+
+RISK_BENCHMARK = "^NDX"
+RISK_WINDOW = 63            # daily returns (~3 months)
+DRAWDOWN_WINDOW = 252       # closes (~1 year high)
+RISK_MIN_BARS = 20          # fewer overlapping returns than this -> NaN
+TRADING_DAYS = 252
+
+
+@dataclass(frozen=True)
+class RiskSnapshot:
+    """Risk per symbol (benchmark included) plus the daily return covariance / correlation."""
+    stats: pd.DataFrame     # index symbol: VolPct, Beta, DrawdownPct, MaxDrawdownPct, Bars
+    cov: pd.DataFrame       # daily, pairwise-complete
+    corr: pd.DataFrame
+    as_of: pd.Timestamp | None
+    provisional: bool       # includes the live intraday price as today's bar
+
+
+def _moments(count, sx, sxx, sxy) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(cov, var of i over the days j traded, count) with NaN below RISK_MIN_BARS."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dof = count - 1.0
+        cov = (sxy - sx * sx.T / count) / dof
+        var = (sxx - sx * sx / count) / dof
+    short = count < RISK_MIN_BARS
+    cov[short] = np.nan
+    var[short] = np.nan
+    return cov, np.maximum(var, 0.0), count
+
+
+def _drawdowns(closes: np.ndarray, last: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(current, worst) drawdown per column of a closes window, as fractions (<= 0).
+
+    last is the latest close per column (the window's last row may have gaps).
+    """
+    if not len(closes):
+        return np.full(len(last), np.nan), np.full(len(last), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        peak = np.fmax.accumulate(closes, axis=0)
+        worst = np.fmin.reduce(closes / peak - 1.0, axis=0)
+        current = last / peak[-1] - 1.0
+    return current, worst
+
+
+class RollingRisk:
+    """Windowed return sums and a closes window for a fixed symbol list, advanced one bar at a time."""
+
+    def __init__(self, symbols: list[str], window: int = RISK_WINDOW, drawdown_window: int = DRAWDOWN_WINDOW):
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self._index = pd.Index(self.symbols, name="Symbol")
+        self.window = window
+        self._ring = np.zeros((window, n))
+        self._ring_ok = np.zeros((window, n), dtype=bool)
+        self._filled = self._head = 0
+        self._sums = tuple(np.zeros((n, n)) for _ in range(4))    # count, r_i, r_i^2, r_i * r_j
+        self._closes = np.full((drawdown_window, n), np.nan)
+        self._closes_filled = self._closes_head = 0
+        self._last = np.full(n, np.nan)     # last close seen per symbol
+        self.last_date: pd.Timestamp | None = None
+        self.last_row: np.ndarray | None = None
+
+    @classmethod
+    def from_history(cls, closes: pd.DataFrame, window: int = RISK_WINDOW,
+                     drawdown_window: int = DRAWDOWN_WINDOW) -> "RollingRisk":
+        """State after every bar of closes (date x symbol), built with matrix products."""
+        risk = cls(list(closes.columns), window, drawdown_window)
+        prices = closes.to_numpy(dtype=float)
+        if not len(prices):
+            return risk
+        filled = pd.DataFrame(prices).ffill().to_numpy()
+        prev = np.vstack([np.full((1, prices.shape[1]), np.nan), filled[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices / prev - 1.0
+        ok = np.isfinite(returns)
+        keep = ok.any(axis=1)
+        returns, ok = returns[keep][-window:], ok[keep][-window:]
+        risk._filled = len(returns)
+        risk._head = risk._filled % window
+        risk._ring[:risk._filled], risk._ring_ok[:risk._filled] = returns, ok
+        risk._resum()
+
+        tail = prices[-drawdown_window:]
+        risk._closes_filled = len(tail)
+        risk._closes_head = len(tail) % drawdown_window
+        risk._closes[:len(tail)] = tail
+        risk._last = filled[-1]
+        risk.last_date, risk.last_row = closes.index[-1], prices[-1].copy()
+        return risk
+
+    def _returns(self, closes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = closes / self._last - 1.0
+        return returns, np.isfinite(returns)
+
+    @staticmethod
+    def _accumulate(sums: tuple, returns: np.ndarray, ok: np.ndarray, sign: float) -> None:
+        count, sx, sxx, sxy = sums
+        z = np.where(ok, returns, 0.0)
+        m = ok.astype(float)
+        count += sign * np.outer(m, m)
+        sx += sign * np.outer(z, m)
+        sxx += sign * np.outer(z * z, m)
+        sxy += sign * np.outer(z, z)
+
+    def _resum(self) -> None:
+        ok = self._ring_ok[:self._filled]
+        z = np.where(ok, self._ring[:self._filled], 0.0)
+        m = ok.astype(float)
+        self._sums = (m.T @ m, z.T @ m, (z * z).T @ m, z.T @ z)
+
+    def push(self, day: pd.Timestamp, closes: np.ndarray) -> None:
+        """Advance by one completed bar (closes in symbol order, NaN = no trade)."""
+        closes = np.asarray(closes, dtype=float)
+        returns, ok = self._returns(closes)
+        if ok.any():
+            if self._filled == self.window:
+                self._accumulate(self._sums, self._ring[self._head], self._ring_ok[self._head], -1.0)
+            else:
+                self._filled += 1
+            self._ring[self._head], self._ring_ok[self._head] = returns, ok
+            self._accumulate(self._sums, returns, ok, 1.0)
+            self._head = (self._head + 1) % self.window
+            if self._head == 0:
+                self._resum()
+
+        size = len(self._closes)
+        self._closes[self._closes_head] = closes
+        self._closes_head = (self._closes_head + 1) % size
+        self._closes_filled = min(self._closes_filled + 1, size)
+        self._last = np.where(np.isfinite(closes), closes, self._last)
+        self.last_date, self.last_row = day, closes.copy()
+
+    def _closes_window(self) -> np.ndarray:
+        """Closes window in date order."""
+        if self._closes_filled < len(self._closes):
+            return self._closes[:self._closes_filled]
+        return np.roll(self._closes, -self._closes_head, axis=0)
+
+    def snapshot(self, tick: np.ndarray | None = None, benchmark: str = RISK_BENCHMARK) -> RiskSnapshot:
+        """Statistics for the current window, plus tick (live prices) as a provisional bar if given."""
+        sums, closes, last = self._sums, self._closes_window(), self._last
+        provisional = tick is not None and np.isfinite(tick).any()
+        if provisional:
+            tick = np.asarray(tick, dtype=float)
+            returns, ok = self._returns(tick)
+            sums = tuple(s.copy() for s in sums)
+            if ok.any():
+                if self._filled == self.window:
+                    self._accumulate(sums, self._ring[self._head], self._ring_ok[self._head], -1.0)
+                self._accumulate(sums, returns, ok, 1.0)
+            closes = np.vstack([closes[1:] if self._closes_filled == len(self._closes) else closes, tick])
+            last = np.where(np.isfinite(tick), tick, last)
+
+        cov, var, count = _moments(*sums)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.sqrt(var * var.T)
+        vol = np.sqrt(np.diag(cov) * TRADING_DAYS) * 100.0
+        beta = np.full(len(self.symbols), np.nan)
+        if benchmark in self.symbols:
+            b = self.symbols.index(benchmark)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                beta = cov[:, b] / var[b, :]
+        current, worst = _drawdowns(closes, last)
+
+        stats = pd.DataFrame({
+            "VolPct": vol,
+            "Beta": beta,
+            "DrawdownPct": current * 100.0,
+            "MaxDrawdownPct": worst * 100.0,
+            "Bars": np.diag(count).astype(int),
+        }, index=self._index)
+        return RiskSnapshot(
+            stats,
+            pd.DataFrame(cov, index=self._index, columns=self._index),
+            pd.DataFrame(corr, index=self._index, columns=self._index),
+            self.last_date,
+            provisional,
+        )
+
+
+class RiskEngine:
+    """Process-wide RollingRisk that only ever consumes the bars it has not seen.
+
+    A changed symbol list, or a last consumed bar whose closes were restated
+    (late final close, split / dividend re-adjustment), rebuilds from history.
+    The sync span is tagged cache=hit (no new bar), patch (bars pushed) or
+    miss (rebuilt).
+    """
+
+    def __init__(self, window: int = RISK_WINDOW, drawdown_window: int = DRAWDOWN_WINDOW):
+        self._window = window
+        self._drawdown_window = drawdown_window
+        self._lock = threading.Lock()
+        self._risk: RollingRisk | None = None
+
+    def _sync(self, closes: pd.DataFrame) -> None:
+        with span("risk_sync") as s:
+            risk = self._risk
+            if risk is not None and risk.symbols == list(closes.columns) and risk.last_date in closes.index:
+                seen = closes.loc[risk.last_date].to_numpy(dtype=float)
+                if np.allclose(seen, risk.last_row, rtol=1e-9, atol=0.0, equal_nan=True):
+                    new = closes[closes.index > risk.last_date]
+                    for day, row in zip(new.index, new.to_numpy(dtype=float)):
+                        risk.push(day, row)
+                    s.attrs["cache"] = "patch" if len(new) else "hit"
+                    return
+            self._risk = RollingRisk.from_history(closes, self._window, self._drawdown_window)
+            s.attrs["cache"] = "miss"
+
+    @timed()
+    def snapshot(self, closes: pd.DataFrame, tick: pd.Series | None = None) -> RiskSnapshot:
+        """Risk over completed daily closes (date x symbol), with tick (live price per symbol) on top."""
+        with self._lock:
+            self._sync(closes)
+            live = None if tick is None else tick.reindex(self._risk.symbols).to_numpy(dtype=float)
+            return self._risk.snapshot(live)
+
+
+_engine: RiskEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine() -> RiskEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RiskEngine()
+        return _engine
+
+
+@timed()
+def risk_table(snapshot: RiskSnapshot, weights: pd.Series, benchmark: str = RISK_BENCHMARK) -> pd.DataFrame:
+    """Portfolio row, holdings by weight, then the benchmark.
+
+    weights is current value per symbol. The portfolio row holds today's
+    weights fixed over the window: volatility from w' Cov w and beta as the
+    weighted mean of the holdings' betas.
+    """
+    stats = snapshot.stats
+    weights = weights[weights > 0].reindex(stats.index.drop(benchmark, errors="ignore")).dropna()
+    weights = weights / weights.sum() if weights.sum() > 0 else weights
+
+    covered = weights[stats.loc[weights.index, "VolPct"].notna()]
+    w = (covered / covered.sum()).to_numpy() if covered.sum() > 0 else covered.to_numpy()
+    cov = snapshot.cov.fillna(0.0)
+    var_p = float(w @ cov.loc[covered.index, covered.index].to_numpy() @ w) if len(w) else np.nan
+    portfolio = {
+        "Symbol": "Portfolio",
+        "WeightPct": 100.0 if len(w) else np.nan,
+        "VolPct": np.sqrt(max(var_p, 0.0) * TRADING_DAYS) * 100.0 if len(w) else np.nan,
+        "Beta": float(np.nansum(w * stats.loc[covered.index, "Beta"].to_numpy())) if len(w) else np.nan,
+    }
+    if benchmark in cov.columns and len(w):
+        var_b = snapshot.cov.at[benchmark, benchmark]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            portfolio["CorrBenchmark"] = float(w @ cov.loc[covered.index, benchmark].to_numpy()) / np.sqrt(var_p * var_b)
+
+    holdings = stats.loc[weights.index].assign(WeightPct=weights * 100.0).reset_index()
+    if benchmark in snapshot.corr.columns:
+        holdings["CorrBenchmark"] = snapshot.corr.loc[weights.index, benchmark].to_numpy()
+    holdings = holdings.sort_values("WeightPct", ascending=False, kind="stable")
+    rows = [pd.DataFrame([portfolio]), holdings]
+    if benchmark in stats.index:
+        rows.append(stats.loc[[benchmark]].reset_index())
+    columns = ["Symbol", "WeightPct", "VolPct", "Beta", "CorrBenchmark", "DrawdownPct", "MaxDrawdownPct"]
+    return pd.concat(rows, ignore_index=True).reindex(columns=columns)
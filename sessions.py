@@ -0,0 +1,132 @@
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
+# ---------- MARKET SESSIONS ----------
+# Clock-based phases for the markets the dashboard reads. Exchange holidays
+# are not modelled: on a holiday the sources keep their open-session interval,
+# which costs requests but never freezes a market that is actually trading.
+
+US_TZ = ZoneInfo("America/New_York")
+IST = ZoneInfo("Asia/Kolkata")
+
+US_PRE_MARKET = "Pre-Market"
+US_LIVE = "Live Market"
+US_POST_MARKET = "Post Market"
+US_CLOSED = "Closed"
+
+US_PRE_OPEN = time(4, 0)
+US_OPEN = time(9, 30)
+US_CLOSE = time(16, 0)
+US_POST_CLOSE = time(20, 0)
+
+NSE_OPEN = time(9, 15)
+NSE_CLOSE = time(15, 30)
+
+# AMFI's NAVAll.txt is refreshed through the evening IST on business days
+# (late schemes trickle in past midnight)
+AMFI_PUBLISH_START = time(18, 0)
+AMFI_PUBLISH_END = time(2, 0)
+
+# Spot FX trades from Sunday 17:00 to Friday 17:00 New York time
+FX_WEEK_BOUNDARY = time(17, 0)
+
+
+def _now(tz: ZoneInfo, now: datetime | None) -> datetime:
+    return datetime.now(tz) if now is None else now.astimezone(tz)
+
+
+def us_phase(now: datetime | None = None) -> str:
+    """US equity session: Pre-Market, Live Market, Post Market or Closed."""
+    now_us = _now(US_TZ, now)
+    if now_us.weekday() >= 5:
+        return US_CLOSED
+    t = now_us.time()
+    if US_PRE_OPEN <= t < US_OPEN:
+        return US_PRE_MARKET
+    if US_OPEN <= t < US_CLOSE:
+        return US_LIVE
+    if US_CLOSE <= t < US_POST_CLOSE:
+        return US_POST_MARKET
+    return US_CLOSED
+
+
+def nse_open(now: datetime | None = None) -> bool:
+    now_in = _now(IST, now)
+    return now_in.weekday() < 5 and NSE_OPEN <= now_in.time() < NSE_CLOSE
+
+
+def fx_open(now: datetime | None = None) -> bool:
+    now_us = _now(US_TZ, now)
+    weekday, t = now_us.weekday(), now_us.time()
+    if weekday == 5:
+        return False
+    if weekday == 4:
+        return t < FX_WEEK_BOUNDARY
+    if weekday == 6:
+        return t >= FX_WEEK_BOUNDARY
+    return True
+
+
+def amfi_publishing(now: datetime | None = None) -> bool:
+    """Inside the evening window (IST) in which a business day's NAVs appear."""
+    now_in = _now(IST, now)
+    weekday, t = now_in.weekday(), now_in.time()
+    if t >= AMFI_PUBLISH_START:
+        return weekday < 5
+    if t < AMFI_PUBLISH_END:
+        # Early hours belong to the previous evening's window
+        return (weekday - 1) % 7 < 5
+    return False
+
+
+def amfi_business_day(now: datetime | None = None) -> bool:
+    return _now(IST, now).weekday() < 5
+
+
+# ---------- REFRESH SCHEDULES ----------
+# Each schedule maps "now" to a source's refresh interval in seconds, or to
+# None to freeze it (no upstream calls) while nothing it reads can change.
+# Used as RefreshSource.interval; the refresher re-evaluates them as it goes.
+
+
+def intraday_interval(now: datetime | None = None) -> float | None:
+    """Holdings last prices (1m bars, pre/post included)."""
+    phase = us_phase(now)
+    if phase == US_LIVE:
+        return 60.0
+    if phase in (US_PRE_MARKET, US_POST_MARKET):
+        return 120.0
+    return None
+
+
+def stream_interval(now: datetime | None = None) -> float | None:
+    """Streaming price feed (streaming.py): polls only while the US market is live."""
+    return 5.0 if us_phase(now) == US_LIVE else None
+
+
+def indices_interval(now: datetime | None = None) -> float | None:
+    """Nifty 50 follows the NSE session, Nasdaq 100 / QQQ the US one."""
+    if nse_open(now) or us_phase(now) == US_LIVE:
+        return 60.0
+    if us_phase(now) != US_CLOSED:
+        return 120.0
+    return None
+
+
+def fx_interval(now: datetime | None = None) -> float | None:
+    # Rides on the shared quote book while US quotes refresh; slower on its own
+    if not fx_open(now):
+        return None
+    return 60.0 if us_phase(now) != US_CLOSED else 900.0
+
+
+def closes_interval(now: datetime | None = None) -> float | None:
+    """Daily closes: today's bar moves during the session and settles by the end of post-market."""
+    return 300.0 if us_phase(now) != US_CLOSED else None
+
+
+def mf_nav_interval(now: datetime | None = None) -> float | None:
+    if amfi_publishing(now):
+        return 900.0
+    # Occasional late revisions during business days; nothing at weekends
+    return 3 * 3600.0 if amfi_business_day(now) else None
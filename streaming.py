@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, Mapping
+
+import numpy as np
+import pandas as pd
+
+from market_data import fetch_minute_closes
+from perf import span
+from refresher import SCHEDULE_RECHECK_S
+
+# ---------- STREAMING PRICES ----------
+# A feed adapter pushes ticks (symbol -> last price) into a process-wide
+# QuoteTable from its own daemon thread. Every push that changes something
+# bumps the table's version and stamps the changed symbols with it, so a
+# reader asks for "everything since version v" and gets only what moved.
+#
+# PositionStream holds the US positions as flat arrays plus running totals
+# per owner. A tick batch recomputes only the rows of the symbols it carries
+# (same formulas as portfolio.build_positions_from_prices) and adds the
+# difference to the totals, so one tick costs O(rows it touches), not a
+# rebuild of the positions frame.
+#
+# Adapters: PollingFeed (one bulk 1m download per interval, yfinance today)
+# and ReplayFeed (recorded 1m bars, one row per interval; the stand-in for a
+# push socket in tests and benchmarks). A socket adapter only has to call
+# QuoteTable.push from its receive loop.
+
+# off (default) | poll | replay (recorded bars, see providers.py)
+PRICE_STREAM = os.environ.get("PRICE_STREAM", "off").lower()
+# Seconds between replayed bars
+STREAM_REPLAY_S = 1.0
+# Window polled per request: only the last few minutes of 1m bars, enough to
+# cover the bars since the previous poll (or a few missed polls), not the
+# whole session the refresher's intraday download already carries
+STREAM_POLL_WINDOW = timedelta(minutes=5)
+
+TOTAL_FIELDS = ("value", "purchase", "day_pl", "total_pl")
+
+
+class QuoteTable:
+    """Latest price per symbol, versioned per change; shared across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices: dict[str, float] = {}
+        self._stamps: dict[str, int] = {}    # symbol -> version of its last change
+        self.version = 0
+        self.updated_at: float | None = None
+
+    def push(self, ticks: Mapping[str, float]) -> int:
+        """Apply a batch of ticks; returns how many symbols changed.
+
+        Repeated prices and non-positive / NaN prices are ignored, so a poll
+        that returns the same bars costs the readers nothing.
+        """
+        with self._lock:
+            changed = {}
+            for symbol, price in ticks.items():
+                price = float(price)
+                if price > 0 and self._prices.get(symbol) != price:
+                    changed[symbol] = price
+            if not changed:
+                return 0
+            self.version += 1
+            self._prices.update(changed)
+            self._stamps.update(dict.fromkeys(changed, self.version))
+            self.updated_at = time.time()
+            return len(changed)
+
+    def changed_since(self, version: int) -> tuple[int, dict[str, float]]:
+        """(current version, symbols changed after version with their latest price)."""
+        with self._lock:
+            if version >= self.version:
+                return self.version, {}
+            return self.version, {s: self._prices[s] for s, v in self._stamps.items() if v > version}
+
+
+class FeedAdapter(ABC):
+    """Pushes ticks into a QuoteTable from a daemon thread; subclasses implement poll().
+
+    interval is seconds between polls or a schedule returning them (None
+    pauses the feed, as for RefreshSource).
+    """
+    name = "feed"
+
+    def __init__(self, interval: float | Callable[[], float | None]):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def current_interval(self) -> float | None:
+        return self.interval() if callable(self.interval) else self.interval
+
+    def active(self) -> bool:
+        return self.current_interval() is not None
+
+    @abstractmethod
+    def poll(self) -> Mapping[str, float]:
+        """Ticks (symbol -> last price) since the previous poll; may repeat unchanged prices."""
+        ...
+
+    def start(self, table: QuoteTable) -> "FeedAdapter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(table,), name=f"feed-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, table: QuoteTable) -> None:
+        while not self._stop.is_set():
+            interval = self.current_interval()
+            if interval is None:
+                # Paused: re-check the schedule as often as RefreshSource does
+                self._stop.wait(SCHEDULE_RECHECK_S)
+                continue
+            started = time.monotonic()
+            try:
+                ticks = self.poll()
+            except Exception:
+                ticks = {}
+            table.push(ticks)
+            self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def _last_prices(closes: pd.DataFrame) -> dict[str, float]:
+    if closes.empty:
+        return {}
+    last = closes.ffill().iloc[-1].dropna()
+    return last[last > 0].astype(float).to_dict()
+
+
+class PollingFeed(FeedAdapter):
+    """One bulk 1m download for all symbols per interval."""
+    name = "poll"
+
+    def __init__(self, symbols: Callable[[], list[str]], interval: float | Callable[[], float | None]):
+        super().__init__(interval)
+        self._symbols = symbols
+
+    def poll(self) -> Mapping[str, float]:
+        symbols = self._symbols()
+        if not symbols:
+            return {}
+        return _last_prices(fetch_minute_closes(symbols, start=datetime.now(timezone.utc) - STREAM_POLL_WINDOW))
+
+
+class ReplayFeed(FeedAdapter):
+    """Replays a frame of 1m closes (bar time x symbol) one bar per interval, looping at the end."""
+    name = "replay"
+
+    def __init__(self, frames: Callable[[], pd.DataFrame], interval: float = STREAM_REPLAY_S):
+        super().__init__(interval)
+        self._frames = frames
+        self._bars: Iterator[dict[str, float]] | None = None
+
+    def _replay(self) -> Iterator[dict[str, float]]:
+        closes = self._frames()
+        if closes.empty:
+            return
+        # Forward-filled, so every bar carries each symbol's price as of that minute
+        filled = closes.ffill()
+        symbols = [str(c) for c in filled.columns]
+        for row in filled.to_numpy(dtype=float):
+            yield {s: p for s, p in zip(symbols, row) if p > 0}
+
+    def poll(self) -> Mapping[str, float]:
+        if self._bars is None:
+            self._bars = self._replay()
+        bar = next(self._bars, None)
+        if bar is None:
+            self._bars = self._replay()
+            bar = next(self._bars, {})
+        return bar
+
+
+class PositionStream:
+    """US positions as flat arrays plus running totals per owner, patched per tick batch.
+
+    Built from a positions frame (POSITION_COLUMNS) and the previous close of
+    each row; totals follow build_positions_from_prices row for row.
+    """
+
+    def __init__(self, positions: pd.DataFrame, prev_close: np.ndarray, usd_to_aed: float):
+        self.rate = float(usd_to_aed)
+        tickers = positions["Ticker"].astype(str).to_numpy()
+        self._rows = pd.Series(np.arange(len(tickers))).groupby(tickers).indices
+        codes, owners = pd.factorize(positions["Owner"].astype(str))
+        self.owners = list(owners)
+        self._owner = codes
+        self._units = positions["Units"].to_numpy(dtype=float)
+        self._purchase = positions["PurchaseAED"].to_numpy(dtype=float)
+        self._prev = np.nan_to_num(np.asarray(prev_close, dtype=float))
+        # value, purchase, day P&L, total P&L per row
+        self._rows_totals = positions[["ValueAED", "PurchaseAED", "DayPLAED", "TotalPLAED"]].to_numpy(
+            dtype=float, copy=True
+        )
+        self._totals = np.zeros((len(self.owners), len(TOTAL_FIELDS)))
+        np.add.at(self._totals, self._owner, self._rows_totals)
+
+    def apply(self, ticks: Mapping[str, float]) -> int:
+        """Reprice the rows of the ticked symbols; returns how many rows changed."""
+        hits = [(self._rows[s], p) for s, p in ticks.items() if s in self._rows]
+        if not hits:
+            return 0
+        rows = np.concatenate([r for r, _ in hits])
+        price = np.concatenate([np.full(len(r), p) for r, p in hits])
+        prev = self._prev[rows]
+        value = price * self.rate * self._units[rows]
+        purchase = self._purchase[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            day_pl = np.where(prev > 0, value * (price / prev - 1.0), 0.0)
+        new = np.column_stack([value, purchase, day_pl, value - purchase])
+        np.add.at(self._totals, self._owner[rows], new - self._rows_totals[rows])
+        self._rows_totals[rows] = new
+        return len(rows)
+
+    def totals(self, owner: str | None = None) -> dict[str, float]:
+        """value / purchase / day_pl / total_pl in AED for one owner, or all of them."""
+        if owner is None:
+            sums = self._totals.sum(axis=0)
+        elif owner in self.owners:
+            sums = self._totals[self.owners.index(owner)]
+        else:
+            sums = np.zeros(len(TOTAL_FIELDS))
+        return dict(zip(TOTAL_FIELDS, (float(v) for v in sums)))
+
+
+class PriceStream:
+    """A feed, the quote table it fills and the position book its ticks are applied to."""
+
+    def __init__(self, feed: FeedAdapter):
+        self.feed = feed
+        self.table = QuoteTable()
+        self._lock = threading.Lock()
+        self._book: PositionStream | None = None
+        self._key = None
+        self._seen = 0
+
+    def start(self) -> "PriceStream":
+        self.feed.start(self.table)
+        return self
+
+    @property
+    def live(self) -> bool:
+        """Feed running and at least one tick received."""
+        return self.feed.active() and self.table.version > 0
+
+    def totals(self, key, build: Callable[[], PositionStream], owners: tuple) -> dict:
+        """{owner (None = all): totals} with every tick since the last call applied.
+
+        The book is rebuilt from build() when key (the live data version and
+        holdings in use) changes, and then caught up on every price in the table.
+        """
+        with self._lock:
+            with span("stream_apply") as s:
+                if key != self._key or self._book is None:
+                    self._book, self._key, self._seen = build(), key, 0
+                    s.attrs["cache"] = "miss"
+                version, ticks = self.table.changed_since(self._seen)
+                rows = self._book.apply(ticks)
+                self._seen = version
+                s.attrs.setdefault("cache", "patch" if rows else "hit")
+                s.attrs["rows"] = rows
+            return {owner: self._book.totals(owner) for owner in owners}